@@ -1,44 +1,169 @@
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# Bounds on the number of values which detect_peaks_batch compares at once while assuming that none of them are peaks.
+MIN_BATCH_CHUNK_SIZE = 16
+MAX_BATCH_CHUNK_SIZE = 4096
 
 
 class PeakDetection:
+    """
+    Smoothed z-score peak detection. A value is marked as a peak when it is more than threshold standard deviations above
+    the mean of the previous window filtered values, where the filtered value of a peak only has an influence of influence.
+    The mean and standard deviation are updated with a sliding window version of Welford's algorithm over a ring buffer
+    of the last window filtered values, so every new value costs O(1) time and the detector uses O(window) memory.
+    """
+
     def __init__(self, window, threshold, influence):
-        self.y = []
-        self.length = len(self.y)
+        self.length = 0
         self.window = window
         self.threshold = threshold
         self.influence = influence
+        # Ring buffer of the filtered values the current mean and standard deviation are computed over.
+        self.filtered_window = np.zeros(window)
+        self.window_position = 0
+        self.avg = 0.0
+        self.m2 = 0.0
+        # The filtered value of the previous sample only enters the window once the next sample has been compared.
+        self.previous_filtered = 0.0
+
+    def get_state(self):
+        # Return the state of the detector so that detection can be resumed later through from_state.
+        return {
+            "window": self.window,
+            "threshold": self.threshold,
+            "influence": self.influence,
+            "length": self.length,
+            "filtered_window": self.filtered_window.tolist(),
+            "window_position": self.window_position,
+            "avg": self.avg,
+            "m2": self.m2,
+            "previous_filtered": self.previous_filtered,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        detector = cls(state["window"], state["threshold"], state["influence"])
+        detector.length = state["length"]
+        detector.filtered_window = np.array(state["filtered_window"], dtype=float)
+        detector.window_position = state["window_position"]
+        detector.avg = state["avg"]
+        detector.m2 = state["m2"]
+        detector.previous_filtered = state["previous_filtered"]
+        return detector
+
+    def ordered_window(self):
+        # The filtered values within the window from oldest to newest.
+        return np.concatenate((self.filtered_window[self.window_position :], self.filtered_window[: self.window_position]))
+
+    def is_near_boundary(self, value, avg, std):
+        # Whether value is so close to being a peak that the rounding errors of avg and std could decide whether it is one.
+        return abs(value - avg - self.threshold * std) <= 1e-9 * (abs(value) + abs(avg) + self.threshold * std + 1)
+
+    def reset_statistics(self):
+        # Recompute the mean and sum of squared differences from the ring buffer to avoid accumulating rounding errors.
+        self.avg = float(np.mean(self.filtered_window))
+        self.m2 = float(np.sum(np.square(self.filtered_window - self.avg)))
+
+    def slide_window(self, new_filtered):
+        # Replace the oldest filtered value within the window by new_filtered and update the mean and sum of squared differences.
+        old_filtered = self.filtered_window[self.window_position]
+        self.filtered_window[self.window_position] = new_filtered
+        self.window_position = (self.window_position + 1) % self.window
+        if self.window_position == 0:
+            self.reset_statistics()
+            return
+        new_avg = self.avg + (new_filtered - old_filtered) / self.window
+        self.m2 += (new_filtered - old_filtered) * (new_filtered - new_avg + old_filtered - self.avg)
+        self.avg = new_avg
 
     def detect_peaks(self, new_value):
-        self.y.append(new_value)
-        i = len(self.y) - 1
-        self.length = len(self.y)
+        i = self.length
+        self.length += 1
         if i < self.window:
+            self.filtered_window[i] = new_value
             return 0
         elif i == self.window:
-            self.signals = [0] * len(self.y)
-            self.filteredY = np.array(self.y).tolist()
-            self.avgFilter = [0] * len(self.y)
-            self.stdFilter = [0] * len(self.y)
-            self.avgFilter[self.window] = np.mean(self.y[0 : self.window]).tolist()
-            self.stdFilter[self.window] = np.std(self.y[0 : self.window]).tolist()
+            self.reset_statistics()
+            self.previous_filtered = new_value
             return 0
 
-        if self.y[i] > self.avgFilter[i - 1] and (
-            (self.y[i] - self.avgFilter[i - 1])
-            > (self.threshold * self.stdFilter[i - 1])
-        ):
-            self.signals.append(1)
-            self.filteredY.append(
-                self.influence * self.y[i]
-                + (1 - self.influence) * self.filteredY[i - 1]
-            )
-            self.avgFilter.append(np.mean(self.filteredY[(i - self.window) : i]))
-            self.stdFilter.append(np.std(self.filteredY[(i - self.window) : i]))
+        # Rounding errors of the sliding updates matter most when the window is (nearly) constant, so recompute it exactly.
+        if self.m2 <= 1e-9 * self.window * (1 + self.avg * self.avg):
+            self.reset_statistics()
+        avg = self.avg
+        std = np.sqrt(max(self.m2, 0.0) / self.window)
+        # Values which tie with the threshold are compared with the mean and standard deviation as np.mean and np.std compute them over the window.
+        if self.is_near_boundary(new_value, avg, std):
+            window_values = self.ordered_window()
+            avg, std = np.mean(window_values), np.std(window_values)
+        if new_value > avg and (new_value - avg) > (self.threshold * std):
+            signal = 1
+            new_filtered = self.influence * new_value + (1 - self.influence) * self.previous_filtered
         else:
-            self.signals.append(0)
-            self.filteredY.append(self.y[i])
-            self.avgFilter.append(np.mean(self.filteredY[(i - self.window) : i]))
-            self.stdFilter.append(np.std(self.filteredY[(i - self.window) : i]))
+            signal = 0
+            new_filtered = new_value
+        self.slide_window(self.previous_filtered)
+        self.previous_filtered = new_filtered
+        return signal
+
+    def detect_peaks_batch(self, values):
+        """
+        Run detect_peaks over every value within values and return a NumPy array of the signals. Values are compared a chunk
+        at a time under the assumption that none of them is a peak, in which case the filtered values are the values
+        themselves and the mean and standard deviation of every window can be computed at once. Everything up to and
+        including the first peak of a chunk is then final and the next chunk starts right after that peak. Chunks start
+        small after a peak, as peaks tend to be clustered, and double in size while no peak is found. The detector state is
+        updated as if detect_peaks had been called for every value.
+        """
+        values = np.asarray(values, dtype=float)
+        signals = np.zeros(len(values), dtype=int)
+        position = 0
+        # The first window + 1 values only fill up the window.
+        while position < len(values) and self.length <= self.window:
+            signals[position] = self.detect_peaks(values[position])
+            position += 1
+        if position == len(values):
+            return signals
+
+        chunk_size = MIN_BATCH_CHUNK_SIZE
+        while position < len(values):
+            chunk = values[position : position + chunk_size]
+            # The filtered values in order, starting with the window used to compare the first value of the chunk.
+            filtered_values = np.concatenate(
+                (self.filtered_window[self.window_position :], self.filtered_window[: self.window_position], [self.previous_filtered], chunk)
+            )
+            windows = as_strided(
+                filtered_values, (len(chunk), self.window), (filtered_values.strides[0], filtered_values.strides[0]), writeable=False
+            )
+            # The mean and standard deviation of every window with plain ufuncs, which avoids the per call overhead of np.mean and np.std.
+            window_avg = np.add.reduce(windows, axis=1) / self.window
+            deviations = windows - window_avg[:, None]
+            window_std = np.sqrt(np.einsum("ij,ij->i", deviations, deviations) / self.window)
+            margins = chunk - window_avg - self.threshold * window_std
+            is_peak = (chunk > window_avg) & (margins > 0)
+            # Values which tie with the threshold are compared exactly as detect_peaks compares them.
+            near_boundary = np.abs(margins) <= 1e-9 * (np.abs(chunk) + np.abs(window_avg) + self.threshold * window_std + 1)
+            for near_index in np.flatnonzero(near_boundary):
+                exact_avg, exact_std = np.mean(windows[near_index]), np.std(windows[near_index])
+                is_peak[near_index] = chunk[near_index] > exact_avg and (chunk[near_index] - exact_avg) > (self.threshold * exact_std)
+            peaks = np.flatnonzero(is_peak)
+
+            if len(peaks) > 0:
+                peak = peaks[0]
+                signals[position + peak] = 1
+                processed_count = peak + 1
+                # filtered_values[self.window + peak] is the filtered value of the value before the peak.
+                self.previous_filtered = self.influence * chunk[peak] + (1 - self.influence) * filtered_values[self.window + peak]
+                chunk_size = MIN_BATCH_CHUNK_SIZE
+            else:
+                processed_count = len(chunk)
+                self.previous_filtered = chunk[-1]
+                chunk_size = min(chunk_size * 2, MAX_BATCH_CHUNK_SIZE)
+            self.filtered_window = filtered_values[processed_count : processed_count + self.window].copy()
+            self.window_position = 0
+            self.length += processed_count
+            position += processed_count
 
-        return self.signals[i]
+        self.reset_statistics()
+        return signals
@@ -0,0 +1,108 @@
+# Standard Library
+import asyncio
+import functools
+import itertools
+
+HTTP_STATUS_TOO_MANY_REQUESTS = 429
+HTTP_STATUS_SERVICE_UNAVAILABLE = 503
+
+
+class AdmissionRejected(Exception):
+    # Raised when a request is not admitted. status_code is the HTTP status which should be returned to the client.
+    def __init__(self, status_code, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    This class bounds the number of requests which query Elasticsearch at the same time to max_running, and the number of
+    requests of each endpoint to its limit within endpoint_limits. Requests which can not run right away wait in a queue
+    which is ordered by priority, lower values first, so cheap requests over short time ranges are not stuck behind heavy
+    historical ones. A request is rejected with 429 if max_queued requests are already waiting and with 503 if it has
+    waited for queue_timeout seconds, so the service sheds load instead of piling up requests.
+    """
+
+    def __init__(self, max_running, endpoint_limits, queue_timeout, max_queued):
+        self.max_running = max_running
+        self.endpoint_limits = endpoint_limits
+        self.queue_timeout = queue_timeout
+        self.max_queued = max_queued
+        self.running = 0
+        self.endpoint_running = dict()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.endpoint_stats = dict()
+
+    def can_run(self, endpoint):
+        return self.running < self.max_running and self.endpoint_running.get(endpoint, 0) < self.endpoint_limits.get(endpoint, self.max_running)
+
+    def start(self, endpoint):
+        self.running += 1
+        self.endpoint_running[endpoint] = self.endpoint_running.get(endpoint, 0) + 1
+        self.count(endpoint, "admitted")
+
+    def count(self, endpoint, outcome):
+        if endpoint not in self.endpoint_stats:
+            self.endpoint_stats[endpoint] = {"admitted": 0, "rejected": 0, "timed_out": 0}
+        self.endpoint_stats[endpoint][outcome] += 1
+
+    async def acquire(self, endpoint, priority):
+        if not self.waiting and self.can_run(endpoint):
+            self.start(endpoint)
+            return
+        if len(self.waiting) >= self.max_queued:
+            self.count(endpoint, "rejected")
+            raise AdmissionRejected(HTTP_STATUS_TOO_MANY_REQUESTS, "Too many requests are waiting to query Elasticsearch.")
+        admitted = asyncio.get_event_loop().create_future()
+        self.waiting.append((priority, next(self.sequence), endpoint, admitted))
+        self.dispatch()
+        try:
+            await asyncio.wait_for(admitted, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.count(endpoint, "timed_out")
+            self.dispatch()
+            raise AdmissionRejected(HTTP_STATUS_SERVICE_UNAVAILABLE, f"Timed out after {self.queue_timeout} seconds waiting to query Elasticsearch.")
+        except BaseException:
+            # The caller was cancelled after it had already been admitted.
+            if admitted.done() and not admitted.cancelled():
+                self.release(endpoint)
+            raise
+
+    def release(self, endpoint):
+        self.running -= 1
+        self.endpoint_running[endpoint] -= 1
+        self.dispatch()
+
+    def dispatch(self):
+        # Admit the waiting requests in order of priority, skipping those whose endpoint is at its limit.
+        still_waiting = []
+        for waiting_request in sorted(self.waiting):
+            _, _, endpoint, admitted = waiting_request
+            if admitted.done():
+                continue
+            if self.can_run(endpoint):
+                self.start(endpoint)
+                admitted.set_result(None)
+            else:
+                still_waiting.append(waiting_request)
+        self.waiting = still_waiting
+
+    def limit(self, endpoint, priority_function):
+        # Decorator for coroutine functions which must be admitted before they run. priority_function maps the arguments of a call to its priority.
+        def decorator(function):
+            @functools.wraps(function)
+            async def limited_function(*args):
+                await self.acquire(endpoint, priority_function(*args))
+                try:
+                    return await function(*args)
+                finally:
+                    self.release(endpoint)
+
+            return limited_function
+
+        return decorator
+
+    def stats(self):
+        return {"running": self.running, "waiting": len(self.waiting), "endpoints": self.endpoint_stats}
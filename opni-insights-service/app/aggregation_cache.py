@@ -0,0 +1,153 @@
+# Standard Library
+import asyncio
+import bisect
+import logging
+import sys
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    # Approximate number of bytes used by a partial aggregate made up of dictionaries, lists, tuples, strings and numbers.
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+def split_range(start_ts, end_ts, max_length):
+    # Split the range between start_ts and end_ts inclusive into consecutive (gte, lte) ranges at every multiple of max_length, so no bucket of a length which divides max_length is split.
+    split_points = list(range((start_ts // max_length + 1) * max_length, end_ts + 1, max_length))
+    return list(zip([start_ts] + split_points, [split_point - 1 for split_point in split_points] + [end_ts]))
+
+
+class AggregationCache:
+    """
+    This class caches partial aggregates of the logs index by kind of query and time bucket. Buckets which ended more than
+    settle_delay_ms ago are treated as immutable. Each range of them fetched from Elasticsearch is kept as a segment which
+    holds the partial aggregates of its buckets with logs, so buckets without logs take no memory and the settled ranges
+    missing from the cache are found by walking the segments which overlap a request. Segments are kept in an LRU which
+    is bounded by max_bytes, and segments which end more than horizon_ms ago are dropped, as only ranges starting within
+    the horizon should be answered from the cache. Buckets which are still receiving logs, and the partial buckets at the
+    edges of a requested range, are always fetched from Elasticsearch.
+    """
+
+    def __init__(self, settle_delay_ms, max_bytes, horizon_ms):
+        self.settle_delay_ms = settle_delay_ms
+        self.max_bytes = max_bytes
+        self.horizon_ms = horizon_ms
+        # (kind, segment start) to (segment end, partial aggregates by bucket start, size) in least recently used order.
+        self.entries = OrderedDict()
+        # Sorted segment starts of every kind.
+        self.segment_starts = dict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_cacheable(self, start_ts, now_ms=None):
+        # Whether a range starting at start_ts is within the horizon, so answering it from the cache needs a bounded number of buckets.
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return start_ts >= now_ms - self.horizon_ms
+
+    def remove(self, kind, segment_start):
+        _, _, segment_size = self.entries.pop((kind, segment_start))
+        self.current_bytes -= segment_size
+        segment_starts = self.segment_starts[kind]
+        del segment_starts[bisect.bisect_left(segment_starts, segment_start)]
+
+    def put(self, kind, segment_start, segment_end, buckets):
+        # Store the partial aggregates of every bucket with logs from segment_start until segment_end, replacing the segments it overlaps.
+        segment_size = estimate_size(buckets)
+        if segment_size > self.max_bytes:
+            return
+        segment_starts = self.segment_starts.setdefault(kind, [])
+        index = bisect.bisect_left(segment_starts, segment_start)
+        if index > 0 and self.entries[(kind, segment_starts[index - 1])][0] > segment_start:
+            index -= 1
+        while index < len(segment_starts) and segment_starts[index] < segment_end:
+            self.remove(kind, segment_starts[index])
+        self.entries[(kind, segment_start)] = (segment_end, buckets, segment_size)
+        segment_starts.insert(index, segment_start)
+        self.current_bytes += segment_size
+        # Evict the least recently used segments until the cache fits within its memory budget again.
+        while self.current_bytes > self.max_bytes:
+            (evicted_kind, evicted_start), _ = next(iter(self.entries.items()))
+            self.remove(evicted_kind, evicted_start)
+            self.evictions += 1
+
+    def drop_before(self, kind, horizon_start):
+        # Drop the segments of kind which end before horizon_start.
+        segment_starts = self.segment_starts.get(kind, [])
+        while segment_starts and self.entries[(kind, segment_starts[0])][0] <= horizon_start:
+            self.remove(kind, segment_starts[0])
+
+    def segments(self, kind, start_ts, end_ts):
+        # The (segment start, segment end, buckets) of the segments of kind which overlap the range from start_ts until end_ts exclusive, in order.
+        segment_starts = self.segment_starts.get(kind, [])
+        index = max(0, bisect.bisect_right(segment_starts, start_ts) - 1)
+        overlapping_segments = []
+        for segment_start in segment_starts[index:]:
+            if segment_start >= end_ts:
+                break
+            segment_end, buckets, _ = self.entries[(kind, segment_start)]
+            if segment_end > start_ts:
+                self.entries.move_to_end((kind, segment_start))
+                overlapping_segments.append((segment_start, segment_end, buckets))
+        return overlapping_segments
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    async def get_buckets(self, kind, start_ts, end_ts, bucket_ms, fetch_buckets, max_fetch_buckets):
+        """
+        Return a dictionary of bucket start to partial aggregate for every bucket with logs between start_ts and end_ts
+        inclusive. fetch_buckets(gte, lte) must return the partial aggregates of every bucket_ms long bucket with logs
+        between gte and lte inclusive. The settled buckets missing from the cache are fetched at most max_fetch_buckets
+        buckets at a time, so that no request exceeds the bucket limit of Elasticsearch, and stored. The edges of the range
+        which are not cacheable are fetched concurrently with them.
+        """
+        now_ms = int(time.time() * 1000)
+        horizon_start = -(-(now_ms - self.horizon_ms) // bucket_ms) * bucket_ms
+        cache_start = max(-(-start_ts // bucket_ms) * bucket_ms, horizon_start)
+        end_full_bucket = ((end_ts + 1) // bucket_ms) * bucket_ms
+        settled_end = max(cache_start, min(end_full_bucket, ((now_ms - self.settle_delay_ms) // bucket_ms) * bucket_ms))
+        max_fetch_ms = max_fetch_buckets * bucket_ms
+        self.drop_before(kind, horizon_start)
+
+        buckets = dict()
+        missing_ranges = []
+        position = cache_start
+        for segment_start, segment_end, segment_buckets in self.segments(kind, cache_start, settled_end):
+            if segment_start > position:
+                missing_ranges.extend(split_range(position, segment_start - 1, max_fetch_ms))
+            self.hits += 1
+            buckets.update(
+                (bucket_start, partial) for bucket_start, partial in segment_buckets.items() if cache_start <= bucket_start < settled_end
+            )
+            position = max(position, segment_end)
+        if position < settled_end:
+            missing_ranges.extend(split_range(position, settled_end - 1, max_fetch_ms))
+        self.misses += len(missing_ranges)
+        # The partial bucket at the start of the range, or all of the range before the horizon, and the buckets which are not settled yet.
+        edge_ranges = split_range(start_ts, min(cache_start - 1, end_ts), max_fetch_ms) if start_ts < cache_start else []
+        if settled_end <= end_ts:
+            edge_ranges.append((max(start_ts, settled_end), end_ts))
+
+        fetched_results = await asyncio.gather(*(fetch_buckets(gte, lte) for gte, lte in missing_ranges + edge_ranges))
+        for (gte, lte), fetched_buckets in zip(missing_ranges, fetched_results):
+            self.put(kind, gte, lte + 1, fetched_buckets)
+        for fetched_buckets in fetched_results:
+            buckets.update(fetched_buckets)
+        logging.debug(f"Fetched {len(missing_ranges)} uncached ranges and {len(edge_ranges)} edges for {kind}.")
+        return buckets
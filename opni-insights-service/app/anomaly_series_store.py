@@ -0,0 +1,169 @@
+# Standard Library
+import asyncio
+import time
+from collections import OrderedDict
+
+import numpy as np
+from aggregation_cache import split_range
+
+MILLISECONDS_MINUTE = 60000
+
+
+class MinuteSeriesStore:
+    """
+    This class keeps the number of logs marked as Anomaly per minute in compact NumPy arrays. Minutes which ended more than
+    settle_delay_ms ago are fetched once and kept until they fall outside of retention_ms, while the partial minutes at the
+    edges of a requested range and the minutes which are still receiving logs are always fetched from Elasticsearch. It
+    also keeps the peak detector state of recent /peaks requests so that a request over a window which extends a previous
+    one with the same start only has to run the detector over the new minutes.
+    """
+
+    def __init__(self, settle_delay_ms, retention_ms, max_detector_states=64):
+        self.settle_delay_ms = settle_delay_ms
+        self.retention_ms = retention_ms
+        self.first_minute = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.known = np.zeros(0, dtype=bool)
+        self.max_detector_states = max_detector_states
+        self.detector_states = OrderedDict()
+
+    def stats(self):
+        return {"minutes": int(np.count_nonzero(self.known)), "bytes": int(self.counts.nbytes + self.known.nbytes), "detector_states": len(self.detector_states)}
+
+    def retention_start(self, now_ms=None):
+        # Start of the first minute which is kept.
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return -(-(now_ms - self.retention_ms) // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+
+    def covers(self, start_ts, now_ms=None):
+        # Whether a range starting at start_ts is within the retention horizon, so its series can be kept in the store.
+        return start_ts >= self.retention_start(now_ms)
+
+    def settled_end(self, now_ms=None):
+        # Start of the first minute which is not settled yet.
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return ((now_ms - self.settle_delay_ms) // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+
+    def store(self, minute_starts, minute_counts):
+        # Store the counts of settled minutes, growing the arrays as needed and dropping minutes older than the retention horizon.
+        if len(minute_starts) == 0:
+            return
+        retention_start = self.retention_start()
+        if len(self.counts) == 0:
+            self.first_minute = int(minute_starts.min())
+        new_first_minute = max(min(self.first_minute, int(minute_starts.min())), retention_start)
+        new_last_minute = max(self.first_minute + (len(self.counts) - 1) * MILLISECONDS_MINUTE, int(minute_starts.max()))
+        if new_first_minute != self.first_minute or new_last_minute >= self.first_minute + len(self.counts) * MILLISECONDS_MINUTE:
+            length = max(0, (new_last_minute - new_first_minute) // MILLISECONDS_MINUTE + 1)
+            counts = np.zeros(length, dtype=np.int64)
+            known = np.zeros(length, dtype=bool)
+            # Copy over the part of the existing arrays which is still within the retention horizon.
+            old_minutes = self.first_minute + np.arange(len(self.counts), dtype=np.int64) * MILLISECONDS_MINUTE
+            kept = old_minutes >= new_first_minute
+            kept_indexes = (old_minutes[kept] - new_first_minute) // MILLISECONDS_MINUTE
+            counts[kept_indexes] = self.counts[kept]
+            known[kept_indexes] = self.known[kept]
+            self.first_minute, self.counts, self.known = new_first_minute, counts, known
+        within_retention = minute_starts >= self.first_minute
+        indexes = (minute_starts[within_retention] - self.first_minute) // MILLISECONDS_MINUTE
+        self.counts[indexes] = minute_counts[within_retention]
+        self.known[indexes] = True
+
+    async def get_series(self, start_ts, end_ts, fetch_minute_counts, max_fetch_minutes):
+        """
+        Return NumPy arrays of the minute starts and the number of anomalies within each minute for every log between start_ts
+        and end_ts inclusive. Like the date_histogram aggregation, the series starts at the first and ends at the last
+        minute with anomalies. fetch_minute_counts(gte, lte) must return a dictionary of minute start to the number of
+        anomalies within that minute for every minute with anomalies between gte and lte inclusive, and is called for at
+        most max_fetch_minutes minutes at a time. The arrays are sized by the range, so it must start within the retention
+        horizon, and it is cut off at the present as there are no logs after it.
+        """
+        now_ms = int(time.time() * 1000)
+        if not self.covers(start_ts, now_ms):
+            raise ValueError(f"The range starting at {start_ts} starts before the retention horizon of the anomaly series.")
+        end_ts = min(end_ts, now_ms)
+        if end_ts < start_ts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        first_minute = (start_ts // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+        first_full_minute = -(-start_ts // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+        end_full_minute = ((end_ts + 1) // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+        settled_end = min(end_full_minute, self.settled_end(now_ms))
+        minute_starts = np.arange(first_minute, end_ts + 1, MILLISECONDS_MINUTE, dtype=np.int64)
+        minute_counts = np.zeros(len(minute_starts), dtype=np.int64)
+
+        # Fill in the settled minutes which are already stored and find the ones which are missing.
+        settled = (minute_starts >= first_full_minute) & (minute_starts < settled_end)
+        store_indexes = (minute_starts - self.first_minute) // MILLISECONDS_MINUTE
+        in_store = settled & (store_indexes >= 0) & (store_indexes < len(self.counts))
+        in_store[in_store] = self.known[store_indexes[in_store]]
+        minute_counts[in_store] = self.counts[store_indexes[in_store]]
+        missing = settled & ~in_store
+
+        # Group the missing minutes and the minutes which are never stored into contiguous ranges, which are fetched concurrently in chunks of at most max_fetch_minutes minutes.
+        fetched = ~in_store
+        run_breaks = np.flatnonzero(np.diff(fetched.astype(np.int8)))
+        run_bounds = np.concatenate(([0], run_breaks + 1, [len(fetched)]))
+        fetch_ranges = []
+        for run_start, run_end in zip(run_bounds[:-1], run_bounds[1:]):
+            if fetched[run_start]:
+                fetch_ranges.extend(
+                    split_range(
+                        max(start_ts, int(minute_starts[run_start])),
+                        min(end_ts, int(minute_starts[run_end - 1]) + MILLISECONDS_MINUTE - 1),
+                        max_fetch_minutes * MILLISECONDS_MINUTE,
+                    )
+                )
+        fetched_results = await asyncio.gather(*(fetch_minute_counts(gte, lte) for gte, lte in fetch_ranges))
+        for fetched_counts in fetched_results:
+            if not fetched_counts:
+                continue
+            fetched_minutes = np.fromiter(fetched_counts.keys(), dtype=np.int64, count=len(fetched_counts))
+            minute_counts[(fetched_minutes - first_minute) // MILLISECONDS_MINUTE] = np.fromiter(fetched_counts.values(), dtype=np.int64, count=len(fetched_counts))
+        self.store(minute_starts[missing], minute_counts[missing])
+
+        anomaly_minutes = np.flatnonzero(minute_counts)
+        if len(anomaly_minutes) == 0:
+            return minute_starts[:0], minute_counts[:0]
+        return minute_starts[anomaly_minutes[0] : anomaly_minutes[-1] + 1], minute_counts[anomaly_minutes[0] : anomaly_minutes[-1] + 1]
+
+    def detect_peaks(self, detector, start_ts, end_ts, minute_starts, anomaly_counts):
+        """
+        Run detector over anomaly_counts and return the minute starts which are peaks. The detector state reached at the end
+        of the settled minutes is kept by start_ts, so a later request which starts at the same timestamp resumes from that
+        state and only runs the detector over the minutes after it. detector must be a new PeakDetection.
+        """
+        if len(minute_starts) == 0:
+            return minute_starts
+        series_start = int(minute_starts[0])
+        end_full_minute = ((end_ts + 1) // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+        state_key = (start_ts, series_start, detector.window, detector.threshold, detector.influence)
+        settled_count = int(np.searchsorted(minute_starts, min(end_full_minute, self.settled_end())))
+        processed_count = 0
+        peak_minutes = minute_starts[:0]
+        saved_state = self.detector_states.get(state_key)
+        if saved_state is not None:
+            next_minute, detector_state, saved_peak_minutes = saved_state
+            # The saved state can't be used when end_ts falls within the minutes it has processed, as the last minute is partial.
+            if next_minute > end_full_minute:
+                signals = detector.detect_peaks_batch(anomaly_counts)
+                return minute_starts[signals == 1]
+            self.detector_states.move_to_end(state_key)
+            # Detection only depends on earlier minutes, so the peaks found by an earlier request are final.
+            if next_minute > minute_starts[-1]:
+                return saved_peak_minutes[saved_peak_minutes <= minute_starts[-1]]
+            detector = detector.from_state(detector_state)
+            processed_count = (next_minute - series_start) // MILLISECONDS_MINUTE
+            peak_minutes = saved_peak_minutes
+
+        if settled_count > processed_count:
+            signals = detector.detect_peaks_batch(anomaly_counts[processed_count:settled_count])
+            peak_minutes = np.concatenate((peak_minutes, minute_starts[processed_count:settled_count][signals == 1]))
+            processed_count = settled_count
+            self.detector_states[state_key] = (series_start + processed_count * MILLISECONDS_MINUTE, detector.get_state(), peak_minutes)
+            self.detector_states.move_to_end(state_key)
+            while len(self.detector_states) > self.max_detector_states:
+                self.detector_states.popitem(last=False)
+        # The minutes which are not settled yet are run on a copy of the detector so that its saved state remains final.
+        tail_detector = detector.from_state(detector.get_state())
+        signals = tail_detector.detect_peaks_batch(anomaly_counts[processed_count:])
+        return np.concatenate((peak_minutes, minute_starts[processed_count:][signals == 1]))
@@ -0,0 +1,106 @@
+# Standard Library
+import zlib
+
+# Third Party
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Media types whose content is compressed already, such as logs exported with compress=true.
+COMPRESSED_MEDIA_TYPES = ("application/gzip", "application/zip", "application/x-brotli")
+
+
+def choose_encoding(accept_encoding):
+    # Return br or gzip, whichever has the highest quality within the Accept-Encoding header, preferring br on a tie, or None if neither is accepted. br is only chosen if brotli is installed.
+    qualities = dict()
+    for coding_preference in accept_encoding.split(","):
+        coding, _, parameters = coding_preference.partition(";")
+        quality = 1.0
+        parameter_name, _, parameter_value = parameters.partition("=")
+        if parameter_name.strip().lower() == "q":
+            try:
+                quality = float(parameter_value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    quality, _, encoding = max((qualities.get(encoding, qualities.get("*", 0.0)), preference, encoding) for preference, encoding in ((1, "br"), (0, "gzip")) if encoding != "br" or brotli)
+    return encoding if quality > 0 else None
+
+
+class ChunkCompressor:
+    # Compresses the chunks of a response body into a single gzip or brotli stream. Every chunk but the last is flushed, so a streamed response reaches the client chunk by chunk.
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            self.compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk, last):
+        if self.encoding == "br":
+            return self.compressor.process(chunk) + (self.compressor.finish() if last else self.compressor.flush())
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    This ASGI middleware compresses response bodies of at least minimum_size bytes with brotli or gzip, whichever the
+    client prefers through its Accept-Encoding header, falling back to gzip if brotli is not installed. Responses which
+    already have a Content-Encoding, whose media type is compressed already or which are smaller than minimum_size are
+    sent unchanged. Streamed responses are compressed as they are sent and are always compressed, as their size is not
+    known up front.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start_message is not None:
+                response_start, start_message = start_message, None
+                headers = MutableHeaders(raw=list(response_start["headers"]))
+                if (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith(COMPRESSED_MEDIA_TYPES)
+                    or (len(body) < self.minimum_size and not more_body)
+                ):
+                    await send(response_start)
+                    await send(message)
+                    return
+                compressor = ChunkCompressor(encoding, self.gzip_level, self.brotli_quality)
+                body = compressor.compress(body, not more_body)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(dict(response_start, headers=headers.raw))
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+            elif compressor is not None:
+                await send({"type": "http.response.body", "body": compressor.compress(body, not more_body), "more_body": more_body})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,14 +1,36 @@
 # Standard Library
 import asyncio
+import base64
+import copy
+import fcntl
+import functools
+import hashlib
+import heapq
+import hmac
+import json
 import logging
 import os
+import re
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-import pandas as pd
+import numpy as np
 
 # Third Party
+from admission_control import AdmissionController
+from aggregation_cache import AggregationCache
+from anomaly_series_store import MinuteSeriesStore
 from elasticsearch import AsyncElasticsearch
+from index_router import IndexRouter
 from kubernetes import client, config
+from live_counters import LiveCounters, subscribe_live_counters
+from msearch_batcher import MsearchBatcher
+from opni_nats import NatsWrapper
 from PeakDetecion import PeakDetection
+from request_coalescer import RequestCoalescer
+from workload_informer import ResourceInformer
+from workload_topology import TopologySnapshotReader, WorkloadTopology
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(message)s")
 
@@ -16,10 +38,22 @@ config.load_incluster_config()
 configuration = client.Configuration()
 core_api_instance = client.CoreV1Api()
 app_api_instance = client.AppsV1Api()
+batch_api_instance = client.BatchV1Api()
 
 ES_ENDPOINT = os.environ["ES_ENDPOINT"]
 ES_USERNAME = os.environ["ES_USERNAME"]
 ES_PASSWORD = os.environ["ES_PASSWORD"]
+# If ES_BATCH_WINDOW_MS is above 0, searches issued within ES_BATCH_WINDOW_MS of each other are sent as one _msearch request of at most ES_BATCH_MAX_SEARCHES
+# searches. Every search of a batch waits for the slowest one, so this is off by default.
+ES_BATCH_WINDOW_MS = float(os.getenv("ES_BATCH_WINDOW_MS", "0"))
+ES_BATCH_MAX_SEARCHES = int(os.getenv("ES_BATCH_MAX_SEARCHES", "50"))
+# Number of seconds after which a request to Elasticsearch is abandoned.
+ES_REQUEST_TIMEOUT_SECONDS = float(os.getenv("ES_REQUEST_TIMEOUT_SECONDS", "30"))
+# Largest number of buckets a single search may return. This should match the search.max_buckets setting of the Elasticsearch cluster.
+ES_MAX_BUCKETS = int(os.getenv("ES_MAX_BUCKETS", "10000"))
+# If true, aggregations by time bucket are split into a query of the whole buckets within the range, which is sent with request_cache so that repeated
+# requests are answered from the shard request cache of Elasticsearch, and queries of the partial buckets at the edges of the range, which are sent without it.
+ES_ALIGNED_REQUEST_CACHE = os.getenv("ES_ALIGNED_REQUEST_CACHE", "false").lower() == "true"
 es_instance = AsyncElasticsearch(
     [ES_ENDPOINT],
     port=9200,
@@ -27,17 +61,110 @@ es_instance = AsyncElasticsearch(
     http_auth=(ES_USERNAME, ES_PASSWORD),
     verify_certs=False,
     use_ssl=True,
+    timeout=ES_REQUEST_TIMEOUT_SECONDS,
 )
+if ES_BATCH_WINDOW_MS > 0:
+    es_instance = MsearchBatcher(es_instance, ES_BATCH_WINDOW_MS, ES_BATCH_MAX_SEARCHES)
 
 WINDOW = int(os.getenv("WINDOW", "10"))
 THRESHOLD = float(os.getenv("THRESHOLD", "2.5"))
 INFLUENCE = float(os.getenv("INFLUENCE", "0.5"))
 AOI_MINUTES_THRESHOLD = int(os.getenv("AOI_MINUTES_THRESHOLD", "10"))
+# Number of buckets fetched per page of a composite aggregation.
+AGGREGATION_PAGE_SIZE = int(os.getenv("AGGREGATION_PAGE_SIZE", "1000"))
+# If set (e.g. to kubernetes.namespace_name.keyword), composite aggregations are split into one partition per value of this field which are fetched concurrently.
+# The values beyond the AGGREGATION_MAX_PARTITIONS most frequent ones share a single partition.
+AGGREGATION_PARTITION_FIELD = os.getenv("AGGREGATION_PARTITION_FIELD", "")
+AGGREGATION_PARTITION_CONCURRENCY = int(os.getenv("AGGREGATION_PARTITION_CONCURRENCY", "4"))
+AGGREGATION_MAX_PARTITIONS = int(os.getenv("AGGREGATION_MAX_PARTITIONS", "10000"))
+# Partial aggregates of time buckets which ended more than AGGREGATION_CACHE_SETTLE_SECONDS ago are cached, up to AGGREGATION_CACHE_MAX_MB. Only ranges which
+# start within the last AGGREGATION_CACHE_HORIZON_HOURS are answered from the cache, longer and older ranges are aggregated by Elasticsearch at once.
+AGGREGATION_CACHE_ENABLED = os.getenv("AGGREGATION_CACHE_ENABLED", "true").lower() == "true"
+AGGREGATION_CACHE_SETTLE_SECONDS = int(os.getenv("AGGREGATION_CACHE_SETTLE_SECONDS", "300"))
+AGGREGATION_CACHE_MAX_MB = int(os.getenv("AGGREGATION_CACHE_MAX_MB", "256"))
+AGGREGATION_CACHE_HORIZON_HOURS = int(os.getenv("AGGREGATION_CACHE_HORIZON_HOURS", "24"))
+# Size of the time buckets in which the pod and control plane breakdown is cached.
+INSIGHTS_CACHE_BUCKET_MINUTES = int(os.getenv("INSIGHTS_CACHE_BUCKET_MINUTES", "60"))
+# The overall_insights endpoint coarsens the granularity level so a response never has more than OVERALL_MAX_BUCKETS buckets.
+# With granularity_level=auto, the granularity level is chosen to give about OVERALL_AUTO_BUCKETS buckets.
+OVERALL_MAX_BUCKETS = int(os.getenv("OVERALL_MAX_BUCKETS", "1000"))
+OVERALL_AUTO_BUCKETS = int(os.getenv("OVERALL_AUTO_BUCKETS", "100"))
+# Number of days of anomalies per minute kept in memory for the peaks and areas_of_interest endpoints.
+ANOMALY_SERIES_RETENTION_DAYS = int(os.getenv("ANOMALY_SERIES_RETENTION_DAYS", "30"))
 MILLISECONDS_MINUTE = 60000
+# Either "watch" to keep track of workloads through Kubernetes watch events or "poll" to list all pods every minute.
+WORKLOAD_MONITOR_MODE = os.getenv("WORKLOAD_MONITOR_MODE", "watch")
+WORKLOAD_RESYNC_SECONDS = int(os.getenv("WORKLOAD_RESYNC_SECONDS", "600"))
+# Pods which have not been seen for this many days are removed from the workload topology. This should match the retention period of the logs index.
+WORKLOAD_RETENTION_DAYS = int(os.getenv("WORKLOAD_RETENTION_DAYS", "30"))
+# If set, the workload topology is saved to a SQLite snapshot at this path every WORKLOAD_SNAPSHOT_SECONDS and loaded from it on startup.
+WORKLOAD_SNAPSHOT_PATH = os.getenv("WORKLOAD_SNAPSHOT_PATH", "")
+WORKLOAD_SNAPSHOT_SECONDS = int(os.getenv("WORKLOAD_SNAPSHOT_SECONDS", "60"))
+# If true, only the worker process which holds the lock on WORKLOAD_SNAPSHOT_PATH keeps track of workloads. The other workers read the topology from its snapshot, which they check for updates every WORKLOAD_SNAPSHOT_REFRESH_SECONDS.
+WORKLOAD_TOPOLOGY_SHARED = os.getenv("WORKLOAD_TOPOLOGY_SHARED", "false").lower() == "true"
+WORKLOAD_SNAPSHOT_REFRESH_SECONDS = int(os.getenv("WORKLOAD_SNAPSHOT_REFRESH_SECONDS", "5"))
+# Default and maximum number of logs returned per page by the logs endpoints and how long the point in time reader of a cursor is kept open between pages.
+LOGS_PAGE_SIZE = int(os.getenv("LOGS_PAGE_SIZE", "100"))
+LOGS_MAX_PAGE_SIZE = int(os.getenv("LOGS_MAX_PAGE_SIZE", "1000"))
+LOGS_PIT_KEEP_ALIVE = os.getenv("LOGS_PIT_KEEP_ALIVE", "1m")
+# Key with which the cursors of the logs endpoints are signed. Every replica of the service must use the same key, so it defaults to one derived from the Elasticsearch credentials which they share.
+LOGS_CURSOR_KEY = os.getenv("LOGS_CURSOR_KEY", "") or hashlib.sha256(f"{ES_USERNAME}:{ES_PASSWORD}".encode()).hexdigest()
+# Number of logs fetched per Elasticsearch request by the logs_export endpoint.
+LOGS_EXPORT_PAGE_SIZE = int(os.getenv("LOGS_EXPORT_PAGE_SIZE", "5000"))
+# Index or alias which holds the logs. If LOGS_INDEX_PATTERN is set to a wildcard expression matching the time partitioned indices of the logs, such as
+# logs-*, queries are only sent to the indices which hold logs within their time range. The time range of each index is refreshed every
+# LOGS_INDEX_REFRESH_SECONDS, and indices which received logs within LOGS_INDEX_ACTIVE_SECONDS of a refresh are treated as still receiving logs.
+LOGS_INDEX = os.getenv("LOGS_INDEX", "logs")
+LOGS_INDEX_PATTERN = os.getenv("LOGS_INDEX_PATTERN", "")
+LOGS_INDEX_REFRESH_SECONDS = int(os.getenv("LOGS_INDEX_REFRESH_SECONDS", "300"))
+LOGS_INDEX_ACTIVE_SECONDS = int(os.getenv("LOGS_INDEX_ACTIVE_SECONDS", "3600"))
+# Response bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are compressed with brotli at RESPONSE_BROTLI_QUALITY or gzip at RESPONSE_GZIP_LEVEL, whichever the client accepts.
+RESPONSE_COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION_ENABLED", "true").lower() == "true"
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+# If true, the inferred log results published to the NATS subjects in LIVE_COUNTERS_NATS_SUBJECTS are counted as they arrive and the insights_breakdown,
+# overall_insights and anomalies_breakdown endpoints answer ranges within the last LIVE_COUNTERS_WINDOW_MINUTES minutes from those counts. NATS_SERVER_URL must be set.
+LIVE_COUNTERS_ENABLED = os.getenv("LIVE_COUNTERS_ENABLED", "false").lower() == "true"
+LIVE_COUNTERS_WINDOW_MINUTES = int(os.getenv("LIVE_COUNTERS_WINDOW_MINUTES", "60"))
+LIVE_COUNTERS_NATS_SUBJECTS = os.getenv("LIVE_COUNTERS_NATS_SUBJECTS", "model_inferenced_logs")
 
 
-historic_workload_data = dict()
-historic_workload_pod_dict = dict()
+aggregation_cache = AggregationCache(AGGREGATION_CACHE_SETTLE_SECONDS * 1000, AGGREGATION_CACHE_MAX_MB * 1024 * 1024, AGGREGATION_CACHE_HORIZON_HOURS * 60 * MILLISECONDS_MINUTE)
+# At most ADMISSION_MAX_RUNNING requests query Elasticsearch at the same time, and at most the limit given in ADMISSION_ENDPOINT_LIMITS
+# (e.g. overall_insights=4,logs_export=2) per endpoint. Other requests wait, shortest time range first, for up to
+# ADMISSION_QUEUE_TIMEOUT_SECONDS before 503 is returned, and 429 is returned once ADMISSION_MAX_QUEUED requests are waiting.
+ADMISSION_MAX_RUNNING = int(os.getenv("ADMISSION_MAX_RUNNING", "16"))
+ADMISSION_ENDPOINT_LIMITS = os.getenv("ADMISSION_ENDPOINT_LIMITS", "overall_insights=4,logs_export=2")
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+ADMISSION_MAX_QUEUED = int(os.getenv("ADMISSION_MAX_QUEUED", "100"))
+admission_controller = AdmissionController(
+    ADMISSION_MAX_RUNNING,
+    {endpoint: int(limit) for endpoint, limit in (endpoint_limit.split("=") for endpoint_limit in ADMISSION_ENDPOINT_LIMITS.split(",") if endpoint_limit)},
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ADMISSION_MAX_QUEUED,
+)
+# Concurrent identical requests to the insights endpoints share a single execution.
+request_coalescer = RequestCoalescer()
+anomaly_series_store = MinuteSeriesStore(AGGREGATION_CACHE_SETTLE_SECONDS * 1000, ANOMALY_SERIES_RETENTION_DAYS * 24 * 60 * MILLISECONDS_MINUTE)
+live_counters = LiveCounters(LIVE_COUNTERS_WINDOW_MINUTES)
+index_router = IndexRouter(LOGS_INDEX_PATTERN, LOGS_INDEX_ACTIVE_SECONDS * 1000) if LOGS_INDEX_PATTERN else None
+interval_units_ms = {"ms": 1, "s": 1000, "m": MILLISECONDS_MINUTE, "h": 60 * MILLISECONDS_MINUTE, "d": 24 * 60 * MILLISECONDS_MINUTE}
+# Granularity levels which the overall_insights endpoint coarsens to, from finest to coarsest.
+overall_granularity_levels = ["1s", "5s", "10s", "30s", "1m", "5m", "10m", "15m", "30m", "1h", "3h", "6h", "12h", "1d", "7d"]
+# Anomaly levels which the insights breakdown can be sorted by.
+insights_sort_levels = ["Normal", "Suspicious", "Anomaly"]
+# Query parameters required by each type of logs query, besides anomaly_level.
+logs_query_required_parameters = {
+    "pod": ["namespace_name", "pod_name"],
+    "namespace": ["namespace_name"],
+    "workload": ["namespace_name", "workload_type", "workload_name"],
+    "control_plane": ["control_plane_component"],
+}
+
+workload_topology = WorkloadTopology()
+# The topology which requests are answered from. This is workload_topology unless another worker process keeps track of workloads.
+topology_view = workload_topology
 workload_types = {
     "ReplicaSet",
     "StatefulSet",
@@ -47,30 +174,99 @@ workload_types = {
     "CustomResource",
     "Independent",
 }
+# Workload types which can own a pod or another workload and the functions used to list them.
+owner_list_functions = {
+    "Deployment": app_api_instance.list_deployment_for_all_namespaces,
+    "StatefulSet": app_api_instance.list_stateful_set_for_all_namespaces,
+    "ReplicaSet": app_api_instance.list_replica_set_for_all_namespaces,
+    "DaemonSet": app_api_instance.list_daemon_set_for_all_namespaces,
+    "Job": batch_api_instance.list_job_for_all_namespaces,
+}
+# All blocking Kubernetes client calls are made from this executor so that they never block the event loop.
+kubernetes_executor = ThreadPoolExecutor(max_workers=len(owner_list_functions) + 2, thread_name_prefix="kubernetes")
+
+def get_topology_stats():
+    return topology_view.stats()
+
+def get_logs_index(start_ts, end_ts):
+    # Index expression of the indices which may hold logs between start_ts and end_ts.
+    return index_router.resolve(start_ts, end_ts) if index_router else LOGS_INDEX
+
+async def refresh_logs_indices():
+    # Keep the time range of every index matching LOGS_INDEX_PATTERN up to date. Until the first refresh succeeds, every matching index is queried.
+    while True:
+        try:
+            await index_router.refresh(es_instance)
+        except Exception as e:
+            logging.error(f"Unable to refresh the time ranges of the logs indices. {e}")
+        await asyncio.sleep(LOGS_INDEX_REFRESH_SECONDS)
+
+class ServiceNatsWrapper(NatsWrapper):
+    # uvicorn shuts the service down on SIGINT and SIGTERM, so the signal handlers of NatsWrapper, which would replace those of uvicorn, are not added.
+    def add_signal_handler(self):
+        pass
+
+async def count_live_logs(nats_wrapper=None):
+    """
+    Connect to NATS and count the inferred log results with live_counters. The NATS client reconnects on its own once it
+    has connected, but logs published while it is disconnected are missed, so live_counters is stopped while the client
+    is disconnected and started again once it has reconnected. Until then requests are answered from Elasticsearch.
+    """
+    nats_wrapper = nats_wrapper or ServiceNatsWrapper()
+    nats_subjects = [nats_subject for nats_subject in LIVE_COUNTERS_NATS_SUBJECTS.split(",") if nats_subject]
+    subscribed = False
+    while True:
+        try:
+            if not subscribed:
+                await nats_wrapper.connect()
+                await subscribe_live_counters(nats_wrapper, live_counters, nats_subjects)
+                subscribed = True
+                logging.info(f"Counting the inferred logs published to {', '.join(nats_subjects)}.")
+            elif not nats_wrapper.nc.is_connected and live_counters.counted_since is not None:
+                live_counters.stop()
+                logging.warning("Disconnected from NATS, answering requests from Elasticsearch until reconnected.")
+            elif nats_wrapper.nc.is_connected and live_counters.counted_since is None:
+                live_counters.start()
+        except Exception as e:
+            logging.error(f"Unable to subscribe to the inferred logs. {e}")
+            await asyncio.sleep(5)
+        await asyncio.sleep(1)
 
 class BackgroundFunction:
     def __init__(self):
-        pass
+        self.owner_index = dict()
+        self.informers = []
+        self.monitoring = False
+
+    def build_kind_index(self, items):
+        # Map (namespace, name) to the metadata object of every workload within items.
+        return {(workload.metadata.namespace, workload.metadata.name): workload.metadata for workload in items}
 
-    def get_next_owner_reference_metadata(self, all_workload_data, owner_name):
+    def build_owner_index(self):
         """
-        This function is called by get_workload_name and takes in a list of metadata objects of a particular workload type
-        (deployment, statefulset, replicaset or daemonset) and a string for the owner name. It will then go through
-        the list of metadata objects, until it comes across the object which matches the owner name and then returns that
-        metadata object. If no metadata object is found, return None which will cause the while loop in get_workload_name
-        to break.
+        This function lists each of the workload types which can own a pod (deployment, statefulset, replicaset, daemonset
+        and job) once and returns a dictionary which maps each kind to a dictionary of (namespace, name) to the metadata
+        object of that workload. It is built once per monitoring cycle so that resolving the owner of every pod only
+        requires dictionary lookups instead of a full cluster list call for every owner reference.
         """
-        for data_idx in range(len(all_workload_data)):
-            if all_workload_data[data_idx].metadata.name == owner_name:
-                return all_workload_data[data_idx].metadata
+        owner_index = dict()
+        for kind, list_function in owner_list_functions.items():
+            owner_index[kind] = self.build_kind_index(list_function().items)
+        return owner_index
 
-    def get_workload_name(self, pod_metadata):
+    def get_workload_name(self, pod_metadata, owner_index):
         """
         This function gets the name of the workload by looping through owner references until it reaches a workload which
         does not have an owner reference. When it reaches that workload, it then is able to retrieve the name of that workload.
+        Each owner reference is resolved through owner_index which is built by build_owner_index. If the owner is not found
+        within owner_index, pod_metadata becomes None which will cause the while loop to break. The name is returned together
+        with whether the owner chain was fully resolved, which it is not if an owner of a kind kept within owner_index, such
+        as a ReplicaSet whose event has not arrived yet, could not be found.
         """
 
         owner_name = None
+        resolved = True
+        namespace_name = pod_metadata.namespace if pod_metadata else None
         # While loop that will keep on looping until it comes across an object which does not have an owner reference.
         while pod_metadata and pod_metadata.owner_references:
             owner_references = pod_metadata.owner_references
@@ -78,100 +274,244 @@ class BackgroundFunction:
                 break
             owner_kind = owner_references[0].kind
             owner_name = owner_references[0].name
-            # Depending on the kind of owner_reference, fetch the appropriate breakdown type and obtain the updated pod_metadata.
-            if owner_kind == "Deployment":
-                all_deployments = (
-                    app_api_instance.list_deployment_for_all_namespaces().items
-                )
-                pod_metadata = self.get_next_owner_reference_metadata(
-                    all_deployments, owner_name
-                )
-            elif owner_kind == "StatefulSet":
-                all_stateful_sets = (
-                    app_api_instance.list_stateful_set_for_all_namespaces().items
-                )
-                pod_metadata = self.get_next_owner_reference_metadata(
-                    all_stateful_sets, owner_name
-                )
-            elif owner_kind == "ReplicaSet":
-                all_replica_sets = (
-                    app_api_instance.list_replica_set_for_all_namespaces().items
-                )
-                pod_metadata = self.get_next_owner_reference_metadata(
-                    all_replica_sets, owner_name
-                )
-            elif owner_kind == "DaemonSet":
-                all_daemon_sets = (
-                    app_api_instance.list_daemon_set_for_all_namespaces().items
-                )
-                pod_metadata = self.get_next_owner_reference_metadata(
-                    all_daemon_sets, owner_name
-                )
-            else:
+            # Owners of any other kind (CronJob, custom resources, ...) are not present within owner_index which ends the loop.
+            pod_metadata = owner_index.get(owner_kind, {}).get((namespace_name, owner_name))
+            resolved = pod_metadata is not None or owner_kind not in owner_list_functions
+
+        return owner_name, resolved
+
+    def record_pod(self, pod_metadata, owner_index, topology):
+        # Determine the workload of a pod and record it within topology.
+        pod_name = pod_metadata.name
+        namespace_name = pod_metadata.namespace
+        owner_references = pod_metadata.owner_references
+        kind = "CustomResource"
+        workload_name = pod_metadata.name
+        # Determine the kind of breakdown of the pod and update the workload name as well to the name of the owner reference.
+        if owner_references and len(owner_references) > 0:
+            if owner_references[0].kind in workload_types:
+                kind = owner_references[0].kind
+            workload_name = owner_references[0].name
+        else:
+            kind = "Independent"
+        original_workload_name, resolved = self.get_workload_name(pod_metadata, owner_index)
+        if original_workload_name:
+            workload_name = original_workload_name
+        # A pod whose owners are only partially known keeps the workload it was recorded with, which a later event or resync may resolve further.
+        topology.record_pod(namespace_name, pod_name, kind, workload_name, keep_workload=not resolved)
+
+    def build_topology(self, pod_items, owner_index, topology=None):
+        """
+        This function is run within kubernetes_executor. It records pod_items onto topology, a copy of workload_topology
+        which is taken here unless the caller has taken it already, from which the pods which have not been seen within
+        WORKLOAD_RETENTION_DAYS are evicted, and which is then swapped in on the event loop through swap_topology, so
+        requests never observe a partially rebuilt topology and the event loop is not blocked while it is being rebuilt.
+        """
+        if topology is None:
+            topology = workload_topology.copy()
+        for pod_spec in pod_items:
+            self.record_pod(pod_spec.metadata, owner_index, topology)
+        evicted_count = topology.evict(time.time() - WORKLOAD_RETENTION_DAYS * 24 * 60 * 60)
+        if evicted_count:
+            logging.info(f"Evicted {evicted_count} pods which have not been seen within {WORKLOAD_RETENTION_DAYS} days from the workload topology.")
+        return topology
+
+    def swap_topology(self, topology):
+        workload_topology.swap(topology)
+
+    async def copy_watched_state(self):
+        # Copies of workload_topology and of the owner index taken on the event loop, which is the only place they are modified while workloads are watched.
+        return workload_topology.copy(), {kind: dict(kind_index) for kind, kind_index in self.owner_index.items()}
+
+    def swap_watched_topology(self, topology):
+        # Owner events handled on the event loop since the copy was taken may have resolved pods within workload_topology, so they are resolved again within topology before it is swapped in.
+        for kind, kind_index in self.owner_index.items():
+            for owner_metadata in kind_index.values():
+                self.resolve_owned_pods(kind, owner_metadata, topology)
+        self.swap_topology(topology)
+
+    def load_topology_snapshot(self):
+        # Load the workload topology saved by a previous run of the service so workloads are known before the first request is served.
+        if not WORKLOAD_SNAPSHOT_PATH or not os.path.exists(WORKLOAD_SNAPSHOT_PATH):
+            return
+        try:
+            start_time = time.monotonic()
+            pod_count = workload_topology.load_snapshot(WORKLOAD_SNAPSHOT_PATH)
+            logging.info(f"Loaded {pod_count} pods from the workload topology snapshot in {time.monotonic() - start_time:.3f} seconds.")
+        except Exception as e:
+            logging.error(f"Unable to load workload topology snapshot. {e}")
+
+    def save_topology_snapshot(self):
+        try:
+            WorkloadTopology.write_snapshot(WORKLOAD_SNAPSHOT_PATH, workload_topology.snapshot_state())
+        except Exception as e:
+            logging.error(f"Unable to save workload topology snapshot. {e}")
+
+    async def checkpoint_topology(self):
+        # Save the workload topology every WORKLOAD_SNAPSHOT_SECONDS. The state is copied on the event loop, so it is consistent, and written within kubernetes_executor.
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(WORKLOAD_SNAPSHOT_SECONDS)
+            try:
+                snapshot_state = workload_topology.snapshot_state()
+                await loop.run_in_executor(kubernetes_executor, WorkloadTopology.write_snapshot, WORKLOAD_SNAPSHOT_PATH, snapshot_state)
+            except Exception as e:
+                logging.error(f"Unable to save workload topology snapshot. {e}")
+
+    def start_monitoring(self):
+        # Start keeping track of workloads within this process, starting from the last snapshot if there is one.
+        self.monitoring = True
+        if WORKLOAD_SNAPSHOT_PATH:
+            self.load_topology_snapshot()
+            asyncio.create_task(self.checkpoint_topology())
+        if WORKLOAD_MONITOR_MODE == "poll":
+            asyncio.create_task(self.monitor_workloads())
+        else:
+            asyncio.create_task(self.watch_workloads())
+
+    async def share_workloads(self):
+        """
+        This function is used when the service runs as several worker processes. The worker which acquires an exclusive lock
+        next to WORKLOAD_SNAPSHOT_PATH keeps track of workloads and saves the topology to the snapshot. Every other worker
+        answers requests from that snapshot through a TopologySnapshotReader and keeps trying to acquire the lock, so a new
+        worker takes over if the current one exits.
+        """
+        global topology_view
+        snapshot_reader = TopologySnapshotReader(WORKLOAD_SNAPSHOT_PATH)
+        topology_view = snapshot_reader
+        lock_file = open(WORKLOAD_SNAPSHOT_PATH + ".lock", "a")
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
                 break
+            except BlockingIOError:
+                try:
+                    snapshot_reader.refresh()
+                except Exception as e:
+                    logging.error(f"Unable to read workload topology snapshot. {e}")
+                await asyncio.sleep(WORKLOAD_SNAPSHOT_REFRESH_SECONDS)
+        # The lock is held for as long as this process runs.
+        self.lock_file = lock_file
+        logging.info(f"Worker process {os.getpid()} is now keeping track of workloads.")
+        self.start_monitoring()
+        topology_view = workload_topology
+        snapshot_reader.close()
 
-        return owner_name
+    def refresh_topology(self):
+        # Build the owner index once per cycle so the number of Kubernetes API calls does not grow with the number of pods.
+        owner_index = self.build_owner_index()
+        all_pods = core_api_instance.list_pod_for_all_namespaces(watch=False)
+        return self.build_topology(all_pods.items, owner_index)
 
     async def monitor_workloads(self):
-        # This function will call the Kubernetes API every minute to keep track of workloads over time and update historic_workload_data dictionary.
+        # This function will call the Kubernetes API every minute to keep track of workloads over time and update workload_topology.
+        loop = asyncio.get_event_loop()
         while True:
             try:
-                all_pods = core_api_instance.list_pod_for_all_namespaces(watch=False)
-                all_pods_items = all_pods.items
-                for pod_spec in all_pods_items:
-                    # For each pod object. obtain the name, metadata and owner references.
-                    pod_metadata = pod_spec.metadata
-                    pod_name = pod_metadata.name
-                    namespace_name = pod_metadata.namespace
-                    owner_references = pod_metadata.owner_references
-                    kind = "CustomResource"
-                    workload_name = pod_metadata.name
-                    # Determine the kind of breakdown of the pod and update the workload name as well to the name of the owner reference.
-                    if owner_references and len(owner_references) > 0:
-                        if owner_references[0].kind in workload_types:
-                            kind = owner_references[0].kind
-                        workload_name = owner_references[0].name
-                    else:
-                        kind = "Independent"
-                    original_workload_name = self.get_workload_name(pod_metadata)
-                    if original_workload_name:
-                        workload_name = original_workload_name
-                    if not namespace_name in historic_workload_data:
-                        historic_workload_data[namespace_name] = {
-                            "ReplicaSet": {},
-                            "StatefulSet": {},
-                            "Deployment": {},
-                            "Job": {},
-                            "DaemonSet": {},
-                            "CustomResource": {},
-                            "Independent": {},
-                        }
-                        historic_workload_pod_dict[namespace_name] = historic_workload_data[namespace_name]
-                    if not workload_name in historic_workload_pod_dict[namespace_name][kind]:
-                        historic_workload_pod_dict[namespace_name][kind][workload_name] = []
-                    if not pod_name in historic_workload_data[namespace_name][kind][workload_name]:
-                        historic_workload_pod_dict[namespace_name][kind][workload_name].append(pod_name)
-                    if not pod_name in historic_workload_data[namespace_name][kind]:
-                        historic_workload_data[namespace_name][kind][
-                            pod_name
-                        ] = workload_name
-
+                topology = await loop.run_in_executor(kubernetes_executor, self.refresh_topology)
+                self.swap_topology(topology)
             except Exception as e:
                 logging.error(f"Unable to access Kubernetes pod endpoint. {e}")
             await asyncio.sleep(60)
 
-async def get_logs(start_ts, end_ts, query_parameters, scroll_id):
-    """
-    This function takes a start_ts, end_ts, a dictionary called query_parameters and a scroll_id. The contents of query_parameters
-    depends on which endpoint a Get request was submitted to. type of data is being filtered for though the
-
-    100 logs marked as Suspicious or Anomoly and additional attributes such as the timestamp, anomaly_level,
-    whether or not it is a control plane log, pod name and namespace name based on the page number specified. If the scroll_id
-    is None, fetch the first 100 logs during the specified time interval and also provide the scroll_id as a returned argument.
-    If a scroll_id is provided, fetch the next 100 logs from the reference of the scroll_id and return the new scroll_id upon
-    returning the logs_dict dictionary.
-    """
-    logs_dict = {"Logs": []}
+    def handle_event(self, kind, event_type, resource_object):
+        # Called on the event loop for every watch event received by a ResourceInformer. Deleted pods are kept within the historic data.
+        metadata = resource_object.metadata
+        if kind == "Pod":
+            if event_type in {"ADDED", "MODIFIED"}:
+                self.record_pod(metadata, self.owner_index, workload_topology)
+        elif event_type == "DELETED":
+            self.owner_index.get(kind, {}).pop((metadata.namespace, metadata.name), None)
+        else:
+            self.owner_index.setdefault(kind, {})[(metadata.namespace, metadata.name)] = metadata
+            self.resolve_owned_pods(kind, metadata, workload_topology)
+
+    def resolve_owned_pods(self, kind, owner_metadata, topology):
+        # Move the pods which were recorded with this owner as their workload, because it was not known yet, to the workload at the top of its owner chain.
+        pod_names = topology.workload_pods.get((owner_metadata.namespace, kind, owner_metadata.name))
+        if not pod_names or not owner_metadata.owner_references:
+            return
+        workload_name, resolved = self.get_workload_name(owner_metadata, self.owner_index)
+        if not resolved:
+            return
+        for pod_name in list(pod_names):
+            topology.record_pod(owner_metadata.namespace, pod_name, kind, workload_name, seen_at=topology.pod_last_seen[(owner_metadata.namespace, pod_name)])
+
+    async def watch_workloads(self):
+        """
+        This function keeps workload_topology up to date through Kubernetes watch events instead of listing every pod
+        each minute. Each resource type is watched by a ResourceInformer running within kubernetes_executor. The state
+        derived from a full LIST is built within the informer thread and swapped in on the event loop, and every watch
+        event is handed back to the event loop, so workload_topology and the owner index are only ever modified from
+        the event loop. Pods are only watched once the owner index has been populated.
+        """
+        loop = asyncio.get_event_loop()
+
+        def on_sync(kind, items):
+            if kind == "Pod":
+                # The topology and the owner index are copied on the event loop, after the events already handed to it, and the topology is built from those copies within this thread.
+                topology, owner_index = asyncio.run_coroutine_threadsafe(self.copy_watched_state(), loop).result()
+                loop.call_soon_threadsafe(self.swap_watched_topology, self.build_topology(items, owner_index, topology))
+            else:
+                loop.call_soon_threadsafe(self.owner_index.__setitem__, kind, self.build_kind_index(items))
+
+        def on_event(kind, event_type, resource_object):
+            loop.call_soon_threadsafe(self.handle_event, kind, event_type, resource_object)
+
+        owner_informers = [
+            ResourceInformer(kind, list_function, on_sync, on_event, WORKLOAD_RESYNC_SECONDS)
+            for kind, list_function in owner_list_functions.items()
+        ]
+        self.informers.extend(owner_informers)
+        for informer in owner_informers:
+            loop.run_in_executor(kubernetes_executor, informer.run)
+        while not all(informer.synced.is_set() for informer in owner_informers):
+            await asyncio.sleep(1)
+        pod_informer = ResourceInformer("Pod", core_api_instance.list_pod_for_all_namespaces, on_sync, on_event, WORKLOAD_RESYNC_SECONDS)
+        self.informers.append(pod_informer)
+        loop.run_in_executor(kubernetes_executor, pod_informer.run)
+
+def get_time_range(start_ts, end_ts, *args):
+    # Priority of a request for admission control. Requests over shorter time ranges are cheaper and are admitted first.
+    return end_ts - start_ts
+
+class InvalidLogsCursor(Exception):
+    # Raised for a cursor which was not handed out by the logs endpoints, has been modified or belongs to another query.
+    pass
+
+def sign_logs_cursor(payload):
+    return hmac.new(LOGS_CURSOR_KEY.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+def encode_logs_cursor(cursor_state):
+    # Encode the state needed to fetch the next page of logs into an opaque token which is handed to the client, signed so that it can't be modified.
+    payload = base64.urlsafe_b64encode(json.dumps(cursor_state, separators=(",", ":")).encode()).decode()
+    return f"{payload}.{sign_logs_cursor(payload)}"
+
+def decode_logs_cursor(cursor):
+    # Return the state of a cursor made by encode_logs_cursor. InvalidLogsCursor is raised for anything else, such as a scroll_id of Elasticsearch.
+    payload, _, signature = cursor.rpartition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), sign_logs_cursor(payload).encode()):
+        raise InvalidLogsCursor("The cursor is not valid.")
+    return json.loads(base64.urlsafe_b64decode(payload.encode()))
+
+def get_query_signature(start_ts, end_ts, query_parameters):
+    # The signature is computed from the request rather than the query so a cursor stays valid when new pods of a workload are seen.
+    return hashlib.sha1(json.dumps([start_ts, end_ts, query_parameters], sort_keys=True).encode()).hexdigest()
+
+def validate_logs_query_parameters(query_parameters):
+    # Return a description of what is wrong with the query_parameters of a logs query, or None if its type is known and every parameter it requires is provided.
+    if query_parameters.get("type") not in logs_query_required_parameters:
+        return f"type must be one of {', '.join(logs_query_required_parameters)}."
+    missing_parameters = [parameter for parameter in ["anomaly_level"] + logs_query_required_parameters[query_parameters["type"]] if query_parameters.get(parameter) is None]
+    if missing_parameters:
+        return f"{', '.join(missing_parameters)} must be provided for {query_parameters['type']} logs."
+    return None
+
+def get_logs_query_body(start_ts, end_ts, query_parameters):
+    # Build the query for the logs of an anomaly level between start_ts and end_ts which match the query_parameters of one of the logs endpoints. None is returned if the type is unknown or a required parameter is missing.
+    if query_parameters.get("type") not in logs_query_required_parameters:
+        logging.error(f"Unknown type of logs query {query_parameters.get('type')}.")
+        return None
     try:
         query_body = {
             "query": {
@@ -190,82 +530,159 @@ async def get_logs(start_ts, end_ts, query_parameters, scroll_id):
             ],
             "sort": [{"timestamp": {"order": "asc"}}],
         }
-        # Separate query for counting the total number of logs within the time interval.
-        count_query_body = {
-            "query": {
-                "bool": {
-                    "filter": [
-                        {"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}],
-                    "must": [{"match": {"anomaly_level": query_parameters["anomaly_level"]}}],
-                },
-            },
-        }
     except Exception as e:
         logging.error("anomaly_level not provided in query_parameters dictionary")
-        return logs_dict
+        return None
 
     # If the logs_pod endpoint is hit, extract the pod_name and namespace_name from the query_parameters dictionary.
     if query_parameters["type"] == "pod":
         try:
             query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
             query_body["query"]["bool"]["must"].append({"match": {"kubernetes.pod_name.keyword": query_parameters["pod_name"]}})
-            count_query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
-            count_query_body["query"]["bool"]["must"].append({"match": {"kubernetes.pod_name.keyword": query_parameters["pod_name"]}})
         except Exception as e:
             logging.error(f"Proper arguments not provided to query_parameters. {e}")
-            return logs_dict
+            return None
 
     # If the logs_namespace endpoint is hit, extract namespace_name from the query_parameters dictionary.
     elif query_parameters["type"] == "namespace":
         try:
             query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
-            count_query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
         except Exception as e:
             logging.error(f"Proper arguments not provided to query_parameters. {e}")
-            return logs_dict
+            return None
 
     # If the logs_workload endpoint is hit, extract namespace_name, workload_type and workload_name from query_parameters dictionary.
     elif query_parameters["type"] == "workload":
         try:
-            workload_pod_names = historic_workload_pod_dict[query_parameters["namespace_name"]][query_parameters["workload_type"]][query_parameters["workload_name"]]
-            should_query = {"bool": {"should": []}}
-            for pod_name in workload_pod_names:
-                should_query["bool"]["should"].append({"match": {"kubernetes.pod_name.keyword": pod_name}})
+            workload_pod_names = topology_view.get_workload_pods(query_parameters["namespace_name"], query_parameters["workload_type"], query_parameters["workload_name"])
             query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
-            count_query_body["query"]["bool"]["must"].append({"match": {"kubernetes.namespace_name.keyword": query_parameters["namespace_name"]}})
-            query_body["query"]["bool"]["must"].append(should_query)
-            count_query_body["query"]["bool"]["must"].append(should_query)
+            query_body["query"]["bool"]["filter"].append({"terms": {"kubernetes.pod_name.keyword": sorted(workload_pod_names)}})
         except Exception as e:
             logging.error(f"Unable to get logs by workload. {e}")
-            return logs_dict
+            return None
 
     # If the logs_control_plane endpoint is hit, extract the control_plane_component from the query_parameters dictionary.
     elif query_parameters["type"] == "control_plane":
         try:
             query_body["query"]["bool"]["must"].append({"match": {"kubernetes_component.keyword": query_parameters["control_plane_component"]}})
             query_body["_source"].append("kubernetes_component")
-            count_query_body["query"]["bool"]["must"].append({"match": {"kubernetes_component.keyword": query_parameters["control_plane_component"]}})
         except Exception as e:
             logging.error(f"Proper arguments not provided to query_parameters. {e}")
-            return logs_dict
+            return None
+
+    return query_body
+
+@admission_controller.limit("logs", get_time_range)
+async def get_logs(start_ts, end_ts, query_parameters, cursor, page_size=LOGS_PAGE_SIZE):
+    """
+    This function takes a start_ts, end_ts, a dictionary called query_parameters, a cursor and a page_size. The contents of
+    query_parameters depends on which endpoint a Get request was submitted to. It fetches page_size logs of the requested
+    anomaly level with additional attributes such as the timestamp, anomaly_level, whether or not it is a control plane log,
+    pod name and namespace name. If the cursor is None, a point in time reader is opened on the logs index and the first page
+    is fetched together with the total number of matching logs. If a cursor is provided, the next page is fetched with
+    search_after from the same point in time. The returned logs_dict contains the cursor of the next page, which is None once
+    the last page has been returned, and the total number of logs which is carried within the cursor so it is counted once.
+    InvalidLogsCursor is raised if the cursor was not handed out for the same query.
+    """
+    logs_dict = {"Logs": []}
+    query_body = get_logs_query_body(start_ts, end_ts, query_parameters)
+    if query_body is None:
+        return logs_dict
 
-    scroll_value = "1m"
-    # If scroll_id is provided, then use it to fetch the next 100 logs and return that in addition to the updated scroll_id as part of the logs_dict dictionary.
+    page_size = max(1, min(page_size, LOGS_MAX_PAGE_SIZE))
+    query_signature = get_query_signature(start_ts, end_ts, query_parameters)
+    if cursor:
+        cursor_state = decode_logs_cursor(cursor)
+        if cursor_state["signature"] != query_signature:
+            raise InvalidLogsCursor("The cursor was not created for the requested query.")
+    pit_id = None
+    # If a cursor is provided, then continue from the point in time and sort values of the last log of the previous page.
     try:
-        if scroll_id:
-            current_page = await es_instance.scroll(scroll_id=scroll_id, scroll=scroll_value)
+        if cursor:
+            pit_id = cursor_state["pit_id"]
+            query_body["search_after"] = cursor_state["search_after"]
+            query_body["track_total_hits"] = False
         else:
-            current_page = await es_instance.search(index="logs",body=query_body, scroll=scroll_value, size=100)
-        logs_dict["total_logs_count"] = (await es_instance.count(index="logs",body=count_query_body))['count']
+            pit_id = (await es_instance.open_point_in_time(index=get_logs_index(start_ts, end_ts), keep_alive=LOGS_PIT_KEEP_ALIVE))["id"]
+            query_body["track_total_hits"] = True
+        query_body["pit"] = {"id": pit_id, "keep_alive": LOGS_PIT_KEEP_ALIVE}
+        current_page = await es_instance.search(body=query_body, size=page_size)
+        # Elasticsearch may hand back a new id for the point in time, which must be used for the following page.
+        pit_id = current_page.get("pit_id", pit_id)
         result_hits = current_page["hits"]["hits"]
-        logs_dict["scroll_id"] = current_page["_scroll_id"]
+        logs_dict["total_logs_count"] = cursor_state["total_logs_count"] if cursor else current_page["hits"]["total"]["value"]
         for each_hit in result_hits:
             logs_dict["Logs"].append(each_hit["_source"])
+        if len(result_hits) == page_size:
+            logs_dict["cursor"] = encode_logs_cursor(
+                {"pit_id": pit_id, "search_after": result_hits[-1]["sort"], "total_logs_count": logs_dict["total_logs_count"], "signature": query_signature}
+            )
+        else:
+            logs_dict["cursor"] = None
+            await close_point_in_time(pit_id)
+        # Kept for clients which still read the scroll_id of the next page.
+        logs_dict["scroll_id"] = logs_dict["cursor"]
         return logs_dict
     except Exception as e:
         logging.error(f"Unable to access Elasticsearch logs index. {e}")
+        # A point in time reader opened for the first page is closed, as its cursor is never handed out.
+        if pit_id and not cursor:
+            await close_point_in_time(pit_id)
         return logs_dict
 
+async def close_point_in_time(pit_id):
+    # Release the point in time reader once the last page has been fetched instead of waiting for its keep alive to expire.
+    try:
+        await es_instance.close_point_in_time(body={"id": pit_id})
+    except Exception as e:
+        logging.warning(f"Unable to close point in time reader. {e}")
+
+async def iterate_logs(index, query_body, page_size=LOGS_EXPORT_PAGE_SIZE):
+    """
+    This function is an async generator which yields every page of hits of query_body from a point in time reader of the
+    logs indices given by index. The request for the next page is sent before the current page is yielded, so Elasticsearch reads the next
+    page while the current one is being consumed, and at most two pages are held in memory at a time.
+    """
+    pit_id = (await es_instance.open_point_in_time(index=index, keep_alive=LOGS_PIT_KEEP_ALIVE))["id"]
+    page_query_body = dict(query_body, track_total_hits=False, pit={"id": pit_id, "keep_alive": LOGS_PIT_KEEP_ALIVE})
+    next_page = asyncio.ensure_future(es_instance.search(body=page_query_body, size=page_size))
+    try:
+        while next_page is not None:
+            current_page = await next_page
+            next_page = None
+            result_hits = current_page["hits"]["hits"]
+            pit_id = current_page.get("pit_id", pit_id)
+            if len(result_hits) == page_size:
+                page_query_body = dict(page_query_body, search_after=result_hits[-1]["sort"], pit={"id": pit_id, "keep_alive": LOGS_PIT_KEEP_ALIVE})
+                next_page = asyncio.ensure_future(es_instance.search(body=page_query_body, size=page_size))
+            yield result_hits
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+        await close_point_in_time(pit_id)
+
+async def export_logs(start_ts, end_ts, query_body, compress=False):
+    """
+    This function is an async generator which yields every log matching query_body, as built by get_logs_query_body,
+    between start_ts and end_ts as newline delimited JSON, one chunk per page of logs. If compress is True, the chunks make
+    up a single gzip stream. As the chunks are only generated as fast as they are sent, memory use does not grow with the
+    number of exported logs. An error after the first chunk is raised again, so the response is aborted instead of ending
+    as if every log had been exported.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    try:
+        async for result_hits in iterate_logs(get_logs_index(start_ts, end_ts), query_body):
+            chunk = "".join(json.dumps(each_hit["_source"]) + "\n" for each_hit in result_hits).encode()
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    except Exception as e:
+        logging.error(f"Unable to export logs from Elasticsearch logs index. {e}")
+        raise
+    if compressor:
+        yield compressor.flush()
+
 def get_workload_breakdown(pod_breakdown_data):
     # Get the breakdown of normal, suspicious and anomalous logs by workload.
     workload_breakdown_dict = {
@@ -278,6 +695,8 @@ def get_workload_breakdown(pod_breakdown_data):
         "Independent": {},
     }
     workload_namespace_dict = dict()
+    # Look up the workloads of every pod at once, which is a few queries instead of one per pod when the topology is read from a snapshot.
+    pod_workloads = topology_view.get_workloads([(pod_spec["Namespace"], pod_spec["Name"]) for pod_spec in pod_breakdown_data["Pods"]])
 
     for pod_spec in pod_breakdown_data["Pods"]:
         pod_name, pod_insights, pod_ns = (
@@ -286,16 +705,7 @@ def get_workload_breakdown(pod_breakdown_data):
             pod_spec["Namespace"],
         )
         # For each pod object fetch the workload if the data is available.
-        workload_name = ""
-        kind = ""
-        if pod_ns in historic_workload_data:
-            for workload_type in historic_workload_data[pod_ns]:
-                if pod_name in historic_workload_data[pod_ns][workload_type]:
-                    workload_name = historic_workload_data[pod_ns][workload_type][
-                        pod_name
-                    ]
-                    kind = workload_type
-                    break
+        kind, workload_name = pod_workloads.get((pod_ns, pod_name), ("", ""))
         if workload_name and kind:
             if not workload_name in workload_namespace_dict:
                 workload_namespace_dict[workload_name] = pod_ns
@@ -325,48 +735,101 @@ def get_workload_breakdown(pod_breakdown_data):
             )
     return workload_breakdown_dict
 
-def get_pod_breakdown(pod_aggregation_data):
-    # Get the breakdown of normal, suspicious and anomalous logs by pod.
+async def get_pod_breakdown(pod_aggregation_batches):
+    # Get the breakdown of normal, suspicious and anomalous logs by pod, folding each batch of buckets as soon as it has been fetched.
+    # Errors while fetching the batches are raised to the caller, as a breakdown of only some of the pods would be wrong.
     pod_breakdown_dict = {"Pods": []}
     pod_aggregation_dict = dict()
-    try:
-        for batch in pod_aggregation_data:
-            for each_result in batch:
-                namespace_name, pod_name, anomaly_level = each_result["key"]["namespace_name"], each_result["key"]["pod_name"], each_result["key"]["anomaly_level"]
-                if not namespace_name in pod_aggregation_dict:
-                    pod_aggregation_dict[namespace_name] = dict()
-                if not pod_name in pod_aggregation_dict[namespace_name]:
-                    pod_aggregation_dict[namespace_name][pod_name] = {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
-                pod_aggregation_dict[namespace_name][pod_name][anomaly_level] = each_result["doc_count"]
-
-        for ns_name in pod_aggregation_dict:
-            for pod_name in pod_aggregation_dict[ns_name]:
-                pod_breakdown_dict["Pods"].append({"Name": pod_name, "Namespace": ns_name, "Insights": pod_aggregation_dict[ns_name][pod_name]})
-        return pod_breakdown_dict
-    except Exception as e:
-        logging.error(f"Unable to aggregate pod data. {e}")
-        return pod_breakdown_dict
+    async for batch in pod_aggregation_batches:
+        for each_result in batch:
+            namespace_name, pod_name, anomaly_level = each_result["key"]["namespace_name"], each_result["key"]["pod_name"], each_result["key"]["anomaly_level"]
+            if not namespace_name in pod_aggregation_dict:
+                pod_aggregation_dict[namespace_name] = dict()
+            if not pod_name in pod_aggregation_dict[namespace_name]:
+                pod_aggregation_dict[namespace_name][pod_name] = {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
+            pod_aggregation_dict[namespace_name][pod_name][anomaly_level] = each_result["doc_count"]
+
+    for ns_name in pod_aggregation_dict:
+        for pod_name in pod_aggregation_dict[ns_name]:
+            pod_breakdown_dict["Pods"].append({"Name": pod_name, "Namespace": ns_name, "Insights": pod_aggregation_dict[ns_name][pod_name]})
+    return pod_breakdown_dict
 
-async def get_aggregated_data(query_body):
-    # Given an Elasticsearch query, fetch all results using composite aggregation.
-    all_aggregation_results = []
+async def iterate_aggregated_data(index, query_body, aggregation_results=None, page_size=AGGREGATION_PAGE_SIZE, request_cache=None):
+    """
+    Given an Elasticsearch query of the indices given by index with a composite aggregation named bucket, yield each page of buckets as soon as it has
+    been fetched. query_body is not modified. If the first page of results has already been fetched, it can be passed in as
+    aggregation_results. Errors from Elasticsearch are raised to the caller.
+    """
+    page_query_body = copy.deepcopy(query_body)
+    page_query_body["aggs"]["bucket"]["composite"]["size"] = page_size
     while True:
+        if aggregation_results is None:
+            aggregation_results = await es_instance.search(index=index, body=page_query_body, request_cache=request_cache)
+        bucket_results = aggregation_results["aggregations"]["bucket"]
+        if bucket_results["buckets"]:
+            yield bucket_results["buckets"]
+        # If an after_key is present, use it to fetch the next page of buckets from Elasticsearch. Otherwise, all buckets have been fetched.
+        if not bucket_results["buckets"] or "after_key" not in bucket_results:
+            return
+        page_query_body["aggs"]["bucket"]["composite"]["after"] = bucket_results["after_key"]
+        aggregation_results = None
+
+def get_partition_query_body(query_body, partition_field):
+    # Terms aggregation of all values of partition_field which match the query within query_body.
+    return {
+        "size": 0,
+        "query": query_body["query"],
+        "aggs": {"partitions": {"terms": {"field": partition_field, "size": AGGREGATION_MAX_PARTITIONS}}},
+    }
+
+async def iterate_partitioned_aggregated_data(index, query_body, partition_field, partition_results, concurrency=AGGREGATION_PARTITION_CONCURRENCY):
+    """
+    Split a composite aggregation into one partition for every value of partition_field within partition_results (the
+    results of get_partition_query_body) and fetch at most concurrency partitions at a time. The values beyond the
+    AGGREGATION_MAX_PARTITIONS largest ones, and the documents without partition_field, are fetched as one more partition
+    which excludes every other value, so no bucket is left out. Pages of buckets are yielded in the order in which they
+    arrive. If a partition can not be fetched, the others are cancelled and the error is raised to the caller.
+    """
+    partition_queue = asyncio.Queue(maxsize=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_partition(partition_filter):
+        partition_query_body = copy.deepcopy(query_body)
+        partition_query_body["query"]["bool"]["filter"].append(partition_filter)
+        async with semaphore:
+            async for buckets in iterate_aggregated_data(index, partition_query_body):
+                await partition_queue.put(buckets)
+
+    async def fetch_all_partitions():
+        partition_fetches = []
         try:
-            aggregation_results = (await es_instance.search(index="logs", body=query_body))
-            # If an after_key is present, use it to fetch the next batch of aggregations from Elasticsearch. Otherwise, return all aggregations.
-            if "after_key" in aggregation_results["aggregations"]["bucket"]:
-                after_key = aggregation_results["aggregations"]["bucket"]["after_key"]
-                query_body["aggs"]["bucket"]["composite"]["after"] = after_key
-                all_aggregation_results.append(aggregation_results["aggregations"]["bucket"]["buckets"])
-            else:
-                return all_aggregation_results
+            partition_values = [bucket["key"] for bucket in partition_results["aggregations"]["partitions"]["buckets"]]
+            partition_filters = [{"term": {partition_field: partition_value}} for partition_value in partition_values]
+            partition_filters.append({"bool": {"must_not": [{"terms": {partition_field: partition_values}}]}})
+            partition_fetches = [asyncio.ensure_future(fetch_partition(partition_filter)) for partition_filter in partition_filters]
+            await asyncio.gather(*partition_fetches)
         except Exception as e:
-            logging.error(e)
-            return all_aggregation_results
+            for partition_fetch in partition_fetches:
+                partition_fetch.cancel()
+            await partition_queue.put(e)
+            return
+        await partition_queue.put(None)
 
-async def get_pod_aggregation(start_ts, end_ts):
-    # Get the breakdown of normal, suspicious and anomalous logs by pod and then send over the resulting aggregation to get the pod and workload breakdown.
-    other_query_body = {
+    producer = asyncio.ensure_future(fetch_all_partitions())
+    try:
+        while True:
+            buckets = await partition_queue.get()
+            if buckets is None:
+                return
+            if isinstance(buckets, Exception):
+                raise buckets
+            yield buckets
+    finally:
+        producer.cancel()
+
+def get_pod_query_body(start_ts, end_ts):
+    # Composite aggregation of the number of normal, suspicious and anomalous logs by namespace and pod.
+    return {
         "size": 0,
         "query": {
             "bool": {
@@ -377,25 +840,301 @@ async def get_pod_aggregation(start_ts, end_ts):
         "aggs": {
             "bucket": {
                 "composite": {
-                    "size": 1000,
+                    "size": AGGREGATION_PAGE_SIZE,
                     "sources": [{"namespace_name": {"terms": {"field":"kubernetes.namespace_name.keyword"}}}, {"pod_name": {"terms": {"field": "kubernetes.pod_name.keyword"}}}, {"anomaly_level": {"terms": {"field": "anomaly_level.keyword"}}}],
                 }
             }
         }
     }
+
+def get_control_plane_query_body(start_ts, end_ts):
+    # Aggregation of the number of normal, suspicious and anomalous logs by kubernetes control plane component.
+    return {
+        "size": 0,
+        "query": {
+            "bool": {
+                "filter": [{"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}],
+                "must": [{"match": {"is_control_plane_log": "true"}}],
+            }
+        },
+        "aggs": {
+            "component_name": {
+                "terms": {"field": "kubernetes_component.keyword"},
+                "aggs": {
+                    "anomaly_level": {"terms": {"field": "anomaly_level.keyword"}}
+                },
+            }
+        },
+    }
+
+def parse_interval_ms(interval):
+    # Convert a fixed interval such as 30s, 10m, 1h or 1d to milliseconds. Returns None if the interval can not be parsed.
+    interval_match = re.fullmatch(r"(\d+)(ms|s|m|h|d)", interval)
+    if not interval_match:
+        return None
+    return int(interval_match.group(1)) * interval_units_ms[interval_match.group(2)]
+
+def normalize_interval(interval):
+    # Write a fixed interval with the largest unit which divides it, so equivalent intervals such as 60m and 1h are written the same. Intervals which can not be parsed are returned unchanged.
+    interval_ms = parse_interval_ms(interval)
+    if not interval_ms:
+        return interval
+    unit = next(unit for unit in ("d", "h", "m", "s", "ms") if interval_ms % interval_units_ms[unit] == 0)
+    return f"{interval_ms // interval_units_ms[unit]}{unit}"
+
+async def get_live_buckets(start_ts, end_ts, get_live_minute_buckets, fetch_buckets):
+    """
+    Get the buckets between start_ts and end_ts from live_counters, or None if live_counters does not count every log of
+    the range. get_live_minute_buckets(first_minute, end_minute) returns the buckets of the whole minutes from first_minute
+    until end_minute and fetch_buckets(gte, lte) is used to fetch a partial minute at the start of the range from
+    Elasticsearch, and at its end unless the range reaches the present, since live_counters does count the logs of the
+    current minute so far. Returns a list of (bucket start, bucket) pairs, as the buckets fetched for the partial minutes
+    may have the same start as those of the whole minutes.
+    """
+    covered_start = live_counters.covered_start()
+    if covered_start is None or start_ts < covered_start:
+        return None
+    now_ms = int(time.time() * 1000)
+    first_full_minute = -(-start_ts // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE
+    if end_ts >= now_ms:
+        end_minute = (now_ms // MILLISECONDS_MINUTE + 1) * MILLISECONDS_MINUTE
+    else:
+        end_minute = max(first_full_minute, ((end_ts + 1) // MILLISECONDS_MINUTE) * MILLISECONDS_MINUTE)
+    fetch_ranges = []
+    if start_ts < first_full_minute:
+        fetch_ranges.append((start_ts, min(first_full_minute - 1, end_ts)))
+    if end_minute <= end_ts < now_ms:
+        fetch_ranges.append((end_minute, end_ts))
+    fetched_results = await asyncio.gather(*(fetch_buckets(gte, lte) for gte, lte in fetch_ranges))
+    buckets = list(get_live_minute_buckets(first_full_minute, end_minute).items())
+    for fetched_buckets in fetched_results:
+        buckets.extend(fetched_buckets.items())
+    return buckets
+
+def split_on_bucket_boundaries(start_ts, end_ts, bucket_ms):
+    # Split the range between start_ts and end_ts into (gte, lte, aligned) parts for the partial bucket at its start, the whole buckets of bucket_ms and the partial bucket at its end.
+    first_full_bucket = -(-start_ts // bucket_ms) * bucket_ms
+    end_full_bucket = ((end_ts + 1) // bucket_ms) * bucket_ms
+    if end_full_bucket <= first_full_bucket:
+        return [(start_ts, end_ts, False)]
+    range_parts = []
+    if start_ts < first_full_bucket:
+        range_parts.append((start_ts, first_full_bucket - 1, False))
+    range_parts.append((first_full_bucket, end_full_bucket - 1, True))
+    if end_full_bucket <= end_ts:
+        range_parts.append((end_full_bucket, end_ts, False))
+    return range_parts
+
+async def fetch_aligned_buckets(fetch_buckets, start_ts, end_ts, bucket_ms):
+    """
+    Call fetch_buckets(gte, lte, request_cache), which returns a dictionary of bucket start to partial aggregate for every
+    bucket_ms long bucket with logs between gte and lte, for the range between start_ts and end_ts. If
+    ES_ALIGNED_REQUEST_CACHE is set, the whole buckets are fetched with request_cache set to true, as their bounds only
+    change once per bucket, and the partial buckets at the edges are fetched concurrently with it set to false, so their
+    one-off results are not cached. As no bucket is split between the parts, their buckets are merged without overlap.
+    """
+    if not ES_ALIGNED_REQUEST_CACHE:
+        return await fetch_buckets(start_ts, end_ts, None)
+    fetched_results = await asyncio.gather(
+        *(fetch_buckets(gte, lte, aligned) for gte, lte, aligned in split_on_bucket_boundaries(start_ts, end_ts, bucket_ms))
+    )
+    buckets = dict()
+    for fetched_buckets in fetched_results:
+        buckets.update(fetched_buckets)
+    return buckets
+
+def aligned_request_cache(bucket_ms):
+    # Decorator for functions fetch_buckets(start_ts, end_ts, request_cache) which makes them fetch_buckets(start_ts, end_ts) through fetch_aligned_buckets.
+    def decorator(fetch_buckets):
+        @functools.wraps(fetch_buckets)
+        async def aligned_fetch_buckets(start_ts, end_ts):
+            return await fetch_aligned_buckets(fetch_buckets, start_ts, end_ts, bucket_ms)
+
+        return aligned_fetch_buckets
+
+    return decorator
+
+@aligned_request_cache(INSIGHTS_CACHE_BUCKET_MINUTES * MILLISECONDS_MINUTE)
+async def fetch_insights_buckets(start_ts, end_ts, request_cache=None):
+    """
+    Fetch the number of normal, suspicious and anomalous logs by pod and by control plane component for every
+    INSIGHTS_CACHE_BUCKET_MINUTES long bucket between start_ts and end_ts. Returns a dictionary of bucket start to a
+    dictionary with the counts by (namespace, pod) under Pods and by component under Components.
+    """
+    time_bucket_source = {"date_histogram": {"field": "timestamp", "fixed_interval": f"{INSIGHTS_CACHE_BUCKET_MINUTES}m"}}
+    pod_query_body = get_pod_query_body(start_ts, end_ts)
+    pod_query_body["aggs"]["bucket"]["composite"]["sources"].insert(0, {"time_bucket": time_bucket_source})
+    control_plane_query_body = get_control_plane_query_body(start_ts, end_ts)
+    control_plane_query_body["aggs"] = {"time_bucket": dict(time_bucket_source, aggs=control_plane_query_body["aggs"])}
+    logs_index = get_logs_index(start_ts, end_ts)
+    msearch_header = {} if request_cache is None else {"request_cache": request_cache}
+    pod_results, control_plane_results = (
+        await es_instance.msearch(index=logs_index, body=[msearch_header, pod_query_body, msearch_header, control_plane_query_body])
+    )["responses"]
+    for results in (pod_results, control_plane_results):
+        if "error" in results:
+            raise Exception(results["error"])
+
+    insights_buckets = dict()
+    async for batch in iterate_aggregated_data(logs_index, pod_query_body, pod_results, request_cache=request_cache):
+        for each_result in batch:
+            result_key = each_result["key"]
+            insights_bucket = insights_buckets.setdefault(result_key["time_bucket"], {"Pods": {}, "Components": {}})
+            pod_insights = insights_bucket["Pods"].setdefault((result_key["namespace_name"], result_key["pod_name"]), {})
+            pod_insights[result_key["anomaly_level"]] = each_result["doc_count"]
+    for time_bucket in control_plane_results["aggregations"]["time_bucket"]["buckets"]:
+        for each_component_bucket in time_bucket["component_name"]["buckets"]:
+            insights_bucket = insights_buckets.setdefault(time_bucket["key"], {"Pods": {}, "Components": {}})
+            component_insights = insights_bucket["Components"].setdefault(each_component_bucket["key"], {})
+            for bucket in each_component_bucket["anomaly_level"]["buckets"]:
+                component_insights[bucket["key"]] = bucket["doc_count"]
+    return insights_buckets
+
+async def get_cached_insights(start_ts, end_ts):
+    # Get the pod breakdown and the control plane aggregation results by summing the cached insights buckets between start_ts and end_ts.
+    # Every time bucket of the control plane aggregation holds up to 10 components with up to 3 anomaly levels each.
+    insights_buckets = await aggregation_cache.get_buckets(
+        "insights", start_ts, end_ts, INSIGHTS_CACHE_BUCKET_MINUTES * MILLISECONDS_MINUTE, fetch_insights_buckets, ES_MAX_BUCKETS // 41
+    )
+    return sum_insights_buckets(insights_buckets.values())
+
+def sum_insights_buckets(insights_buckets):
+    # Get the pod breakdown and the control plane aggregation results by summing insights buckets like those of fetch_insights_buckets.
+    pod_aggregation_dict = dict()
+    component_aggregation_dict = dict()
+    for insights_bucket in insights_buckets:
+        for aggregation_dict, bucket_insights in ((pod_aggregation_dict, insights_bucket["Pods"]), (component_aggregation_dict, insights_bucket["Components"])):
+            for name, insights in bucket_insights.items():
+                if not name in aggregation_dict:
+                    aggregation_dict[name] = {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
+                for anomaly_level, anomaly_level_count in insights.items():
+                    aggregation_dict[name][anomaly_level] = aggregation_dict[name].get(anomaly_level, 0) + anomaly_level_count
+
+    # Pods are ordered by namespace and pod name like the results of the composite aggregation.
+    pod_breakdown_dict = {"Pods": []}
+    for (ns_name, pod_name) in sorted(pod_aggregation_dict):
+        pod_breakdown_dict["Pods"].append({"Name": pod_name, "Namespace": ns_name, "Insights": pod_aggregation_dict[(ns_name, pod_name)]})
+    control_plane_results = {"aggregations": {"component_name": {"buckets": [
+        {"key": component_name, "anomaly_level": {"buckets": [{"key": anomaly_level, "doc_count": anomaly_level_count} for anomaly_level, anomaly_level_count in insights.items()]}}
+        for component_name, insights in component_aggregation_dict.items()
+    ]}}}
+    return pod_breakdown_dict, control_plane_results
+
+@request_coalescer.coalesce()
+@admission_controller.limit("insights_breakdown", get_time_range)
+async def get_insights_breakdown(start_ts, end_ts):
+    """
+    This function fetches the breakdown of normal, suspicious and anomalous logs by pod, workload, namespace and control
+    plane component. The first page of the pod composite aggregation and the control plane aggregation are fetched with a
+    single _msearch request and any remaining pod pages are then fetched through iterate_aggregated_data. If
+    AGGREGATION_PARTITION_FIELD is set, the _msearch request fetches the partitions of the pod aggregation instead, which
+    are then fetched concurrently. The workload and namespace breakdowns are rolled up from the pod breakdown instead of
+    being aggregated again by Elasticsearch. If live_counters counts every log of the range, the pod and control plane
+    breakdowns are summed from its counts instead, and otherwise from the cached buckets of get_cached_insights if
+    AGGREGATION_CACHE_ENABLED is set and the range starts within AGGREGATION_CACHE_HORIZON_HOURS.
+    """
     try:
-        pod_aggregation_data = await get_aggregated_data(other_query_body)
-        pod_breakdown_dict = get_pod_breakdown(pod_aggregation_data)
+        insights_buckets = await get_live_buckets(start_ts, end_ts, live_counters.insights_buckets, fetch_insights_buckets)
+    except Exception as e:
+        logging.error(f"Unable to access Elasticsearch data. {e}")
+        return {"Pods": [], "Workloads": {}, "Namespaces": [], "Control Plane": {"Components": []}}
+    if insights_buckets is not None or (AGGREGATION_CACHE_ENABLED and aggregation_cache.is_cacheable(start_ts)):
+        try:
+            if insights_buckets is not None:
+                pod_breakdown_dict, control_plane_results = sum_insights_buckets(insights_bucket for _, insights_bucket in insights_buckets)
+            else:
+                pod_breakdown_dict, control_plane_results = await get_cached_insights(start_ts, end_ts)
+            return {
+                "Pods": pod_breakdown_dict["Pods"],
+                "Workloads": get_workload_breakdown(pod_breakdown_dict),
+                "Namespaces": get_namespace_breakdown(pod_breakdown_dict)["Namespaces"],
+                "Control Plane": get_control_plane_components_breakdown(control_plane_results)
+            }
+        except Exception as e:
+            logging.error(f"Unable to access Elasticsearch data. {e}")
+            return {"Pods": [], "Workloads": {}, "Namespaces": [], "Control Plane": {"Components": []}}
+
+    logs_index = get_logs_index(start_ts, end_ts)
+    pod_query_body = get_pod_query_body(start_ts, end_ts)
+    control_plane_query_body = get_control_plane_query_body(start_ts, end_ts)
+    if AGGREGATION_PARTITION_FIELD:
+        first_query_body = get_partition_query_body(pod_query_body, AGGREGATION_PARTITION_FIELD)
+    else:
+        first_query_body = pod_query_body
+    try:
+        pod_results, control_plane_results = (
+            await es_instance.msearch(index=logs_index, body=[{}, first_query_body, {}, control_plane_query_body])
+        )["responses"]
+    except Exception as e:
+        logging.error(f"Unable to access Elasticsearch data. {e}")
+        return {"Pods": [], "Workloads": {}, "Namespaces": [], "Control Plane": {"Components": []}}
+
+    pod_breakdown_dict, workload_breakdown_dict = {"Pods": []}, {}
+    try:
+        if "error" in pod_results:
+            raise Exception(pod_results["error"])
+        if AGGREGATION_PARTITION_FIELD:
+            pod_aggregation_batches = iterate_partitioned_aggregated_data(logs_index, pod_query_body, AGGREGATION_PARTITION_FIELD, pod_results)
+        else:
+            pod_aggregation_batches = iterate_aggregated_data(logs_index, pod_query_body, pod_results)
+        pod_breakdown_dict = await get_pod_breakdown(pod_aggregation_batches)
         workload_breakdown_dict = get_workload_breakdown(pod_breakdown_dict)
-        return pod_breakdown_dict, workload_breakdown_dict
     except Exception as e:
         logging.error(f"Unable to breakdown pod insights. {e}")
-        return {"Pods": []}, {}
+    namespace_breakdown_dict = get_namespace_breakdown(pod_breakdown_dict)
+    control_plane_breakdown_dict = get_control_plane_components_breakdown(control_plane_results)
 
-async def get_overall_breakdown(start_ts, end_ts, granularity_level):
-    # Get the overall breakdown of normal, suspicious and anomalous logs within start_ts and end_ts broken down by granularity level.
-    overall_breakdown_dict = {"Insights": []}
-    query_body = {
+    return {
+        "Pods": pod_breakdown_dict["Pods"],
+        "Workloads": workload_breakdown_dict,
+        "Namespaces": namespace_breakdown_dict["Namespaces"],
+        "Control Plane": control_plane_breakdown_dict
+    }
+
+def select_insights_breakdown(insights_breakdown, namespace_names=None, sort_by=None, offset=0, limit=None):
+    """
+    Select the part of a result of get_insights_breakdown which the client renders. If namespace_names is given, only the
+    pods, workloads and namespaces within those namespaces are kept. If sort_by is one of insights_sort_levels, the pods,
+    the workloads of each kind, the namespaces and the control plane components are ordered by their number of logs of
+    that level, highest first, and when limit is given only the first offset + limit of each are picked with a heap
+    instead of sorting all of them. Any other sort_by raises ValueError. offset and limit then select a page of the pods,
+    the workloads of each kind and the namespaces, and the number of each before paging is returned under Total.
+    insights_breakdown may be shared between requests and is not modified.
+    """
+    if sort_by is not None and sort_by not in insights_sort_levels:
+        raise ValueError(f"Unable to sort insights by {sort_by}.")
+    offset = max(0, offset)
+    limit = None if limit is None else max(0, limit)
+    paginated = offset > 0 or limit is not None
+
+    def select(entries, namespace_key=None, page=True):
+        if namespace_names is not None and namespace_key:
+            entries = [entry for entry in entries if entry[namespace_key] in namespace_names]
+        total = len(entries)
+        if sort_by:
+            sort_key = lambda entry: entry["Insights"][sort_by]
+            if page and limit is not None:
+                entries = heapq.nlargest(offset + limit, entries, key=sort_key)
+            else:
+                entries = sorted(entries, key=sort_key, reverse=True)
+        if page and paginated:
+            entries = entries[offset:None if limit is None else offset + limit]
+        return entries, total
+
+    pods, total_pods = select(insights_breakdown["Pods"], "Namespace")
+    namespaces, total_namespaces = select(insights_breakdown["Namespaces"], "Name")
+    workloads, total_workloads = dict(), dict()
+    for kind, kind_workloads in insights_breakdown["Workloads"].items():
+        workloads[kind], total_workloads[kind] = select(kind_workloads, "Namespace")
+    components, _ = select(insights_breakdown["Control Plane"]["Components"], page=False)
+    selected_breakdown = {"Pods": pods, "Workloads": workloads, "Namespaces": namespaces, "Control Plane": {"Components": components}}
+    if paginated:
+        selected_breakdown["Total"] = {"Pods": total_pods, "Workloads": total_workloads, "Namespaces": total_namespaces}
+    return selected_breakdown
+
+def get_overall_query_body(start_ts, end_ts, granularity_level):
+    # Date histogram of the number of normal, suspicious and anomalous logs with buckets of granularity_level.
+    return {
         "query": {
             "bool": {
                 "filter": [{"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}]
@@ -408,10 +1147,97 @@ async def get_overall_breakdown(start_ts, end_ts, granularity_level):
             }
         },
     }
+
+def choose_overall_granularity(start_ts, end_ts, granularity_level):
+    """
+    Return the granularity level used for the overall breakdown between start_ts and end_ts. If granularity_level is auto,
+    the finest level of overall_granularity_levels which gives at most OVERALL_AUTO_BUCKETS buckets is chosen. Otherwise
+    granularity_level is kept unless it would give more than OVERALL_MAX_BUCKETS buckets, in which case it is coarsened to
+    the finest level which does not. Ranges too long for every level get a whole number of days.
+    """
+    max_buckets = OVERALL_AUTO_BUCKETS if granularity_level == "auto" else OVERALL_MAX_BUCKETS
+    interval_ms = parse_interval_ms(granularity_level)
+    # Granularity levels which can't be parsed are passed on to Elasticsearch unchanged.
+    if granularity_level != "auto" and (not interval_ms or (end_ts - start_ts) // interval_ms + 1 <= max_buckets):
+        return granularity_level
+    for coarser_level in overall_granularity_levels:
+        coarser_interval_ms = parse_interval_ms(coarser_level)
+        if (end_ts - start_ts) // coarser_interval_ms + 1 <= max_buckets and coarser_interval_ms >= (interval_ms or 0):
+            return coarser_level
+    day_ms = interval_units_ms["d"]
+    return f"{-(-(end_ts - start_ts) // (day_ms * max(1, max_buckets - 1)))}d"
+
+async def fetch_overall_buckets(granularity_level, start_ts, end_ts, request_cache=None):
+    # Fetch the number of logs of each anomaly level for every bucket of granularity_level with logs between start_ts and end_ts.
+    granularity_level_buckets = (
+        await es_instance.search(index=get_logs_index(start_ts, end_ts), body=get_overall_query_body(start_ts, end_ts, granularity_level), size=0, request_cache=request_cache)
+    )["aggregations"]["granularity_results"]["buckets"]
+    return {
+        each_bucket["key"]: {anomaly_level_agg["key"]: anomaly_level_agg["doc_count"] for anomaly_level_agg in each_bucket["anomaly_level"]["buckets"]}
+        for each_bucket in granularity_level_buckets if each_bucket["doc_count"] > 0
+    }
+
+@aligned_request_cache(MILLISECONDS_MINUTE)
+async def fetch_overall_minute_buckets(start_ts, end_ts, request_cache=None):
+    # Fetch the number of logs of each anomaly level for every minute between start_ts and end_ts.
+    return await fetch_overall_buckets("1m", start_ts, end_ts, request_cache)
+
+async def get_cached_overall_buckets(start_ts, end_ts, granularity_level, interval_ms):
+    # Get date_histogram style buckets of granularity_level from the breakdown cached at that granularity level, so each fetch from Elasticsearch is already at the granularity level of the response.
+    # Every bucket holds up to 3 anomaly levels.
+    interval_buckets = await aggregation_cache.get_buckets(
+        f"overall:{interval_ms}",
+        start_ts,
+        end_ts,
+        interval_ms,
+        aligned_request_cache(interval_ms)(functools.partial(fetch_overall_buckets, granularity_level)),
+        ES_MAX_BUCKETS // 4,
+    )
+    return roll_up_overall_buckets(interval_buckets.items(), interval_ms)
+
+def roll_up_overall_buckets(buckets, interval_ms):
+    # Roll up (bucket start, number of logs of each anomaly level) pairs of buckets no longer than interval_ms into date_histogram style buckets of interval_ms.
+    interval_buckets = dict()
+    for bucket_start, anomaly_level_counts in buckets:
+        if not anomaly_level_counts:
+            continue
+        interval_counts = interval_buckets.setdefault(bucket_start // interval_ms * interval_ms, {})
+        for anomaly_level, anomaly_level_count in anomaly_level_counts.items():
+            interval_counts[anomaly_level] = interval_counts.get(anomaly_level, 0) + anomaly_level_count
+    if not interval_buckets:
+        return []
+    # Like the date_histogram aggregation, include the empty buckets between the first and the last bucket.
+    return [
+        {"key": interval_start, "anomaly_level": {"buckets": [{"key": anomaly_level, "doc_count": anomaly_level_count} for anomaly_level, anomaly_level_count in interval_buckets.get(interval_start, {}).items()]}}
+        for interval_start in range(min(interval_buckets), max(interval_buckets) + interval_ms, interval_ms)
+    ]
+
+# Granularity levels which give the same buckets, such as 60m and 1h, are treated as identical requests and answered with the same granularity level.
+@request_coalescer.coalesce(lambda start_ts, end_ts, granularity_level: (start_ts, end_ts, normalize_interval(choose_overall_granularity(start_ts, end_ts, granularity_level))))
+@admission_controller.limit("overall_insights", get_time_range)
+async def get_overall_breakdown(start_ts, end_ts, granularity_level):
+    # Get the overall breakdown of normal, suspicious and anomalous logs within start_ts and end_ts broken down by granularity level, which is coarsened if it would give too many buckets.
+    granularity_level = choose_overall_granularity(start_ts, end_ts, granularity_level)
+    overall_breakdown_dict = {"Insights": [], "granularity_level": granularity_level}
+    interval_ms = parse_interval_ms(granularity_level)
     try:
-        granularity_level_buckets = (
-            await es_instance.search(index="logs", body=query_body)
-        )["aggregations"]["granularity_results"]["buckets"]
+        # Granularity levels which are a whole number of minutes can be rolled up from the live counts by minute, which only cover the last LIVE_COUNTERS_WINDOW_MINUTES minutes,
+        # or answered from the breakdown cached at the granularity level.
+        minute_buckets = None
+        if interval_ms and interval_ms % MILLISECONDS_MINUTE == 0:
+            minute_buckets = await get_live_buckets(start_ts, end_ts, live_counters.overall_minute_buckets, fetch_overall_minute_buckets)
+        if minute_buckets is not None:
+            granularity_level_buckets = roll_up_overall_buckets(minute_buckets, interval_ms)
+        elif AGGREGATION_CACHE_ENABLED and interval_ms and interval_ms % MILLISECONDS_MINUTE == 0 and aggregation_cache.is_cacheable(start_ts):
+            granularity_level_buckets = await get_cached_overall_buckets(start_ts, end_ts, granularity_level, interval_ms)
+        elif ES_ALIGNED_REQUEST_CACHE and interval_ms:
+            granularity_level_buckets = roll_up_overall_buckets(
+                (await fetch_aligned_buckets(functools.partial(fetch_overall_buckets, granularity_level), start_ts, end_ts, interval_ms)).items(), interval_ms
+            )
+        else:
+            granularity_level_buckets = (
+                await es_instance.search(index=get_logs_index(start_ts, end_ts), body=get_overall_query_body(start_ts, end_ts, granularity_level))
+            )["aggregations"]["granularity_results"]["buckets"]
         for each_bucket in granularity_level_buckets:
             granularity_level_insights = {"time_start": each_bucket["key"], "Normal": 0, "Suspicious": 0, "Anomaly": 0}
             for anomaly_level_agg in each_bucket["anomaly_level"]["buckets"]:
@@ -423,10 +1249,9 @@ async def get_overall_breakdown(start_ts, end_ts, granularity_level):
     return overall_breakdown_dict
 
 
-async def get_anomalies_breakdown(start_ts, end_ts):
-    # Get the number of anomalies based on workload and control plane logs.
-    anomaly_breakdown_dict = {"Workload": 0, "Control Plane": 0}
-    query_body = {
+def get_anomalies_query_body(start_ts, end_ts):
+    # Number of logs marked as Anomaly for control plane and workload logs.
+    return {
         "query": {
             "bool": {
                 "must": [{"match": {"anomaly_level": "Anomaly"}}],
@@ -435,9 +1260,37 @@ async def get_anomalies_breakdown(start_ts, end_ts):
         },
         "aggs": {"anomaly_breakdown": {"terms": {"field": "is_control_plane_log"}}},
     }
+
+@aligned_request_cache(MILLISECONDS_MINUTE)
+async def fetch_anomalies_minute_buckets(start_ts, end_ts, request_cache=None):
+    # Fetch the number of anomalies of control plane and workload logs for every minute between start_ts and end_ts.
+    query_body = get_anomalies_query_body(start_ts, end_ts)
+    query_body["aggs"] = {"minutes": {"date_histogram": {"field": "timestamp", "fixed_interval": "1m"}, "aggs": query_body["aggs"]}}
+    minute_buckets = (
+        await es_instance.search(index=get_logs_index(start_ts, end_ts), body=query_body, size=0, request_cache=request_cache)
+    )["aggregations"]["minutes"]["buckets"]
+    return {
+        minute_bucket["key"]: {("Control Plane" if each_bucket["key"] else "Workload"): each_bucket["doc_count"] for each_bucket in minute_bucket["anomaly_breakdown"]["buckets"]}
+        for minute_bucket in minute_buckets if minute_bucket["doc_count"] > 0
+    }
+
+@request_coalescer.coalesce()
+@admission_controller.limit("anomalies_breakdown", get_time_range)
+async def get_anomalies_breakdown(start_ts, end_ts):
+    # Get the number of anomalies based on workload and control plane logs.
+    anomaly_breakdown_dict = {"Workload": 0, "Control Plane": 0}
     try:
+        minute_buckets = await get_live_buckets(start_ts, end_ts, live_counters.anomalies_minute_buckets, fetch_anomalies_minute_buckets)
+        if minute_buckets is None and AGGREGATION_CACHE_ENABLED and aggregation_cache.is_cacheable(start_ts):
+            # Every minute holds the anomalies of workload and control plane logs.
+            minute_buckets = (await aggregation_cache.get_buckets("anomalies", start_ts, end_ts, MILLISECONDS_MINUTE, fetch_anomalies_minute_buckets, ES_MAX_BUCKETS // 3)).items()
+        if minute_buckets is not None:
+            for _, minute_breakdown in minute_buckets:
+                for breakdown_type, anomaly_count in minute_breakdown.items():
+                    anomaly_breakdown_dict[breakdown_type] += anomaly_count
+            return anomaly_breakdown_dict
         anomaly_level_buckets = (
-            await es_instance.search(index="logs", body=query_body)
+            await es_instance.search(index=get_logs_index(start_ts, end_ts), body=get_anomalies_query_body(start_ts, end_ts))
         )["aggregations"]["anomaly_breakdown"]["buckets"]
         for each_bucket in anomaly_level_buckets:
             if each_bucket["key"]:
@@ -450,14 +1303,9 @@ async def get_anomalies_breakdown(start_ts, end_ts):
         return anomaly_breakdown_dict
     return anomaly_breakdown_dict
 
-async def get_peaks(start_ts, end_ts):
-    # This function handles get requests for fetching peaks in number of anomalies predicted within a start and end time interval.
-    logging.info(
-        f"Received request to obtain all peaks with respect to number of anomalies within {start_ts} and {end_ts}"
-    )
-    pd_model = PeakDetection(WINDOW, THRESHOLD, INFLUENCE)
-    peak_timestamps = []
-    query = {
+def get_anomaly_series_query_body(start_ts, end_ts):
+    # Date histogram of the number of logs marked as Anomaly per minute.
+    return {
         "query": {
             "bool": {
                 "must": [{"match": {"anomaly_level.keyword": "Anomaly"}}],
@@ -471,22 +1319,90 @@ async def get_peaks(start_ts, end_ts):
             }
         }
     }
+
+@aligned_request_cache(MILLISECONDS_MINUTE)
+async def fetch_anomaly_minute_counts(start_ts, end_ts, request_cache=None):
+    # Fetch the number of logs marked as Anomaly for every minute between start_ts and end_ts.
+    query_body = get_anomaly_series_query_body(start_ts, end_ts)
+    del query_body["aggs"]["logs_over_time"]["aggs"]
+    minute_buckets = (
+        await es_instance.search(index=get_logs_index(start_ts, end_ts), body=query_body, size=0, request_cache=request_cache)
+    )["aggregations"]["logs_over_time"]["buckets"]
+    return {minute_bucket["key"]: minute_bucket["doc_count"] for minute_bucket in minute_buckets if minute_bucket["doc_count"] > 0}
+
+async def get_anomaly_minute_series(start_ts, end_ts):
+    # Get NumPy arrays of the minute starts and the number of logs marked as Anomaly within each minute, from the first until the last minute with anomalies.
+    # Ranges which start before the retention horizon of the anomaly series are fetched directly, so Elasticsearch only returns the minutes between the first and the last anomaly.
+    if AGGREGATION_CACHE_ENABLED and anomaly_series_store.covers(start_ts):
+        return await anomaly_series_store.get_series(start_ts, end_ts, fetch_anomaly_minute_counts, ES_MAX_BUCKETS)
+    anomaly_minute_buckets = (
+        await es_instance.search(index=get_logs_index(start_ts, end_ts), body=get_anomaly_series_query_body(start_ts, end_ts), size=0)
+    )["aggregations"]["logs_over_time"]["buckets"]
+    timestamps = np.array([bucket["key"] for bucket in anomaly_minute_buckets], dtype=np.int64)
+    anomaly_counts = np.array([bucket["doc_count"] for bucket in anomaly_minute_buckets], dtype=np.int64)
+    return timestamps, anomaly_counts
+
+@request_coalescer.coalesce()
+@admission_controller.limit("peaks", get_time_range)
+async def get_peaks(start_ts, end_ts):
+    # This function handles get requests for fetching peaks in number of anomalies predicted within a start and end time interval.
+    logging.info(
+        f"Received request to obtain all peaks with respect to number of anomalies within {start_ts} and {end_ts}"
+    )
+    pd_model = PeakDetection(WINDOW, THRESHOLD, INFLUENCE)
+    peak_timestamps = []
     try:
-        res = await es_instance.search(index="logs", body=query, size=0)
-        df = pd.DataFrame(res["aggregations"]["logs_over_time"]["buckets"])
-        if len(df) > 0:
-            # anomaly_predicted_count == 2 for 'Anomaly' labeled log messages
-            df["doc_count"] = df["doc_count"] // 2
-            for index, row in df.iterrows():
-                timestamp, anomaly_count = row["key"], row["doc_count"]
-                if pd_model.detect_peaks(anomaly_count):
-                    peak_timestamps.append({"timestamp": timestamp})
+        timestamps, anomaly_counts = await get_anomaly_minute_series(start_ts, end_ts)
+        # anomaly_predicted_count == 2 for 'Anomaly' labeled log messages
+        anomaly_counts = anomaly_counts // 2
+        if AGGREGATION_CACHE_ENABLED:
+            peak_minutes = anomaly_series_store.detect_peaks(pd_model, start_ts, end_ts, timestamps, anomaly_counts)
+        else:
+            peak_minutes = timestamps[pd_model.detect_peaks_batch(anomaly_counts) == 1]
+        peak_timestamps = [{"timestamp": int(timestamp)} for timestamp in peak_minutes]
         return peak_timestamps
     except Exception as e:
         logging.error("Unable to obtain peaks")
         return peak_timestamps
 
 
+def get_areas_of_interest_from_series(timestamps, anomaly_counts):
+    """
+    This function takes NumPy arrays of the minute timestamps and the number of anomalies within each of those minutes. A
+    minute is an area of interest if its number of anomalies is more than 1.3 times the average of the previous 60
+    minutes. Consecutive minutes are merged into a single area of interest and areas of interest which start within
+    AOI_MINUTES_THRESHOLD minutes of the end of the previous area of interest are grouped into a larger area of interest.
+    Both are found with run-length operations over the timestamps of the area of interest minutes.
+    """
+    areas_of_interest = []
+    if len(anomaly_counts) <= 60:
+        return areas_of_interest
+    anomaly_sums = np.concatenate(([0], np.cumsum(anomaly_counts, dtype=float)))
+    moving_avg = (anomaly_sums[60:-1] - anomaly_sums[:-61]) / 60 * 1.3
+    aoi_timestamps = timestamps[60:][anomaly_counts[60:] > moving_avg]
+    if len(aoi_timestamps) == 0:
+        return areas_of_interest
+
+    # Every run of consecutive minutes becomes an area of interest from its first minute until the end of its last minute.
+    run_breaks = np.flatnonzero(np.diff(aoi_timestamps) != MILLISECONDS_MINUTE) + 1
+    run_starts = aoi_timestamps[np.concatenate(([0], run_breaks))]
+    run_ends = aoi_timestamps[np.concatenate((run_breaks - 1, [len(aoi_timestamps) - 1]))] + MILLISECONDS_MINUTE
+    # A new group starts when an area of interest starts more than AOI_MINUTES_THRESHOLD minutes after the end of the previous one.
+    group_breaks = np.flatnonzero((run_starts[1:] - run_ends[:-1]) > (AOI_MINUTES_THRESHOLD * MILLISECONDS_MINUTE)) + 1
+    group_bounds = np.concatenate(([0], group_breaks, [len(run_starts)]))
+    for group_start, group_end in zip(group_bounds[:-1], group_bounds[1:]):
+        areas_of_interest.append({
+            "start_ts": int(run_starts[group_start]),
+            "end_ts": int(run_ends[group_end - 1]),
+            "areas_of_interest": [
+                {"start_ts": int(run_start), "end_ts": int(run_end)}
+                for run_start, run_end in zip(run_starts[group_start:group_end], run_ends[group_start:group_end])
+            ],
+        })
+    return areas_of_interest
+
+@request_coalescer.coalesce()
+@admission_controller.limit("areas_of_interest", get_time_range)
 async def get_areas_of_interest(start_ts, end_ts):
     '''
     This function will fetch all areas of interest between the starting and ending timestamp. It will return a list
@@ -497,117 +1413,38 @@ async def get_areas_of_interest(start_ts, end_ts):
     logging.info(
         f"Received request to obtain all areas of interest between {start_ts} and {end_ts}"
     )
-
-    query = {
-        "query": {
-            "bool": {
-                "must": [{"match": {"anomaly_level.keyword": "Anomaly"}}],
-                "filter": [{"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}],
-            }
-        },
-        "aggs": {
-            "logs_over_time": {
-                "date_histogram": {"field": "timestamp", "calendar_interval": "minute"},
-                "aggs": {"total_normal": {"sum": {"field": "anomaly_predicted_count"}}},
-            }
-        },
-    }
+    areas_of_interest = []
     try:
-        res = await es_instance.search(index="logs", body=query, size=0)
-        df = pd.DataFrame(res["aggregations"]["logs_over_time"]["buckets"])
-        areas_of_interest = []
-        if len(df) > 0:
-            # anomaly_predicted_count == 2 for 'Anomaly' labeled log messages
-            df["doc_count"] = df["doc_count"] / 2
-            df["moving_avg"] = df["doc_count"].rolling(60).mean() * 1.3
-            df["AOI"] = df.doc_count.gt(df.moving_avg.shift())
-            areas_of_interest_df = df[df.AOI == True]
-            areas_of_interest_df["time_diff"] = areas_of_interest_df["key"].diff()
-            current_aoi_start = -1
-            prev_segment_start = -1
-            aoi_start_ts = -1
-            current_interval_areas = []
-            '''
-            Iterate over the areas of interest found and create a larger area of interest time interval which will contain
-            time intervals which are within 10 minutes of the previous area of interest time interval. This reduces
-            the outward number of areas of interest time intervals returned.
-            '''
-            for index, row in areas_of_interest_df.iterrows():
-                if current_aoi_start == -1:
-                    current_aoi_start = row["key"]
-                    aoi_start_ts = row["key"]
-                if not pd.isna(row['time_diff']) and row["time_diff"] != MILLISECONDS_MINUTE:
-                    '''
-                    If the starting timestamp of the next area of interest (row["key"]) is AOI_MINUTES_THRESHOLD (default: 10)
-                    minutes after the ending timestamp of the prior area of interest (prev_segment_start + MILLISECONDS_MINUTE)
-                    then close that area of interest and add it to the areas_of_interest list and start a new list for
-                    the next area of interest group. Otherwise, add that area of interest to the current_interval_areas
-                    list.
-                    '''
-                    if row["key"] - prev_segment_start > ((AOI_MINUTES_THRESHOLD + 1) * MILLISECONDS_MINUTE):
-                        current_interval_areas.append({"start_ts": current_aoi_start, "end_ts": prev_segment_start + MILLISECONDS_MINUTE})
-                        areas_of_interest.append({"start_ts": aoi_start_ts, "end_ts": prev_segment_start + MILLISECONDS_MINUTE,
-                                                 "areas_of_interest": current_interval_areas})
-                        aoi_start_ts = row["key"]
-                        current_interval_areas = []
-                    else:
-                        current_interval_areas.append({"start_ts": current_aoi_start, "end_ts": prev_segment_start + MILLISECONDS_MINUTE})
-                    current_aoi_start = row["key"]
-                prev_segment_start = row["key"]
-
-                if index == len(areas_of_interest_df) - 1:
-                    current_interval_areas.append({"start_ts": current_aoi_start, "end_ts": prev_segment_start + MILLISECONDS_MINUTE})
-                    areas_of_interest.append({"start_ts": aoi_start_ts, "end_ts": prev_segment_start + MILLISECONDS_MINUTE,
-                                             "areas_of_interest": current_interval_areas})
+        timestamps, anomaly_counts = await get_anomaly_minute_series(start_ts, end_ts)
+        # anomaly_predicted_count == 2 for 'Anomaly' labeled log messages
+        anomaly_counts = anomaly_counts / 2
+        areas_of_interest = get_areas_of_interest_from_series(timestamps, anomaly_counts)
         return areas_of_interest
     except Exception as e:
         logging.error("Unable to retrieve areas of interest.")
         return areas_of_interest
 
-async def get_namespace_breakdown(start_ts, end_ts):
-    # Get the breakdown of normal, suspicious and anomalous logs by namespace.
+def get_namespace_breakdown(pod_breakdown_data):
+    # Get the breakdown of normal, suspicious and anomalous logs by namespace by rolling up the breakdown by pod.
     namespace_breakdown_dict = {"Namespaces": []}
+    namespace_aggregation_dict = dict()
+    for pod_spec in pod_breakdown_data["Pods"]:
+        namespace_name = pod_spec["Namespace"]
+        if not namespace_name in namespace_aggregation_dict:
+            namespace_aggregation_dict[namespace_name] = {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
+        for anomaly_level, anomaly_level_count in pod_spec["Insights"].items():
+            namespace_aggregation_dict[namespace_name][anomaly_level] += anomaly_level_count
 
-    query_body = {
-        "size": 0,
-        "query": {
-            "bool": {
-                "must": [{"match": {"is_control_plane_log": "false"}}, {"regexp": {"kubernetes.namespace_name": ".+"}}],
-                "filter": [{"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}],
-            }
-        },
-        "aggs": {
-            "bucket": {
-                "composite": {
-                    "size": 1000,
-                    "sources": [{"namespace_name": {"terms": {"field":"kubernetes.namespace_name.keyword"}}}, {"anomaly_level": {"terms": {"field": "anomaly_level.keyword"}}}],
-                }
-            }
+    for namespace in namespace_aggregation_dict:
+        individual_namespace_dict = {
+            "Name": namespace,
+            "Insights": namespace_aggregation_dict[namespace]
         }
-    }
-    namespace_aggregation_dict = dict()
-    try:
-        namespace_aggregation_results = await get_aggregated_data(query_body)
-        for batch in namespace_aggregation_results:
-            for each_result in batch:
-                namespace_name, anomaly_level = each_result["key"]["namespace_name"], each_result["key"]["anomaly_level"]
-                if not namespace_name in namespace_aggregation_dict:
-                    namespace_aggregation_dict[namespace_name] = {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
-                namespace_aggregation_dict[namespace_name][anomaly_level] = each_result["doc_count"]
-
-        for namespace in namespace_aggregation_dict:
-            individual_namespace_dict = {
-                "Name": namespace,
-                "Insights": namespace_aggregation_dict[namespace]
-            }
-            namespace_breakdown_dict["Namespaces"].append(individual_namespace_dict)
-    except Exception as e:
-        logging.error(f"Unable to access Elasticsearch data. {e}")
-        return namespace_breakdown_dict
+        namespace_breakdown_dict["Namespaces"].append(individual_namespace_dict)
     return namespace_breakdown_dict
 
-async def get_control_plane_components_breakdown(start_ts, end_ts):
-    # Get the breakdown of normal, suspicious and anomolous logs by kubernetes control plane component.
+def get_control_plane_components_breakdown(control_plane_results):
+    # Get the breakdown of normal, suspicious and anomolous logs by kubernetes control plane component from the results of the control plane query.
     kubernetes_components_breakdown_dict = {"Components": []}
     kubernetes_components_storage_dict = dict()
 
@@ -628,28 +1465,8 @@ async def get_control_plane_components_breakdown(start_ts, end_ts):
             "Insights": {"Normal": 0, "Suspicious": 0, "Anomaly": 0}
         }
 
-    query_body = {
-        "size": 0,
-        "query": {
-            "bool": {
-                "filter": [{"range": {"timestamp": {"gte": start_ts, "lte": end_ts}}}],
-                "must": [{"match": {"is_control_plane_log": "true"}}],
-            }
-        },
-        "aggs": {
-            "component_name": {
-                "terms": {"field": "kubernetes_component.keyword"},
-                "aggs": {
-                    "anomaly_level": {"terms": {"field": "anomaly_level.keyword"}}
-                },
-            }
-        },
-    }
-
     try:
-        component_level_buckets = (
-            await es_instance.search(index="logs", body=query_body)
-        )["aggregations"]["component_name"]["buckets"]
+        component_level_buckets = control_plane_results["aggregations"]["component_name"]["buckets"]
         for each_component_bucket in component_level_buckets:
             anomaly_level_buckets = each_component_bucket["anomaly_level"]["buckets"]
             for bucket in anomaly_level_buckets:
@@ -0,0 +1,86 @@
+# Standard Library
+import logging
+import time
+
+
+class IndexRouter:
+    """
+    This class routes queries of a time range to the indices which may hold logs within that range. index_pattern is a
+    wildcard expression matching the time partitioned indices, such as daily indices or the backing indices of a rollover
+    alias, and refresh keeps the earliest and latest timestamp of every matching index. Indices whose latest log is less
+    than active_ms older than the last refresh may still be receiving logs, so only their time ranges, and those of the
+    indices which are new or were empty, are fetched again by each refresh. A query of a range which ended before any index
+    could still be receiving logs is sent to the list of indices which overlap it. Other queries are sent to index_pattern
+    with the indices outside of the range excluded, so indices created since the last refresh are still queried. Either
+    index expression is only used if it is at most max_expression_length characters long, as it is sent within the request
+    line, otherwise the query is sent to index_pattern.
+    """
+
+    def __init__(self, index_pattern, active_ms, max_expression_length=2000, max_searches=100):
+        self.index_pattern = index_pattern
+        self.active_ms = active_ms
+        self.max_expression_length = max_expression_length
+        self.max_searches = max_searches
+        self.index_ranges = dict()
+        # Indices whose time range could not be fetched, which may hold logs of any range.
+        self.unknown_indices = set()
+        self.refreshed_at = None
+
+    async def fetch_index_ranges(self, es_client, indices):
+        # Fetch the earliest and latest timestamp of each of indices, max_searches indices per _msearch request. Empty indices are left out, and the set of indices whose time range could not be fetched is returned with them.
+        index_ranges = dict()
+        unknown_indices = set()
+        for batch_start in range(0, len(indices), self.max_searches):
+            batch_indices = indices[batch_start : batch_start + self.max_searches]
+            searches = []
+            for index in batch_indices:
+                searches.append({"index": index})
+                searches.append({"size": 0, "aggs": {"first_log": {"min": {"field": "timestamp"}}, "last_log": {"max": {"field": "timestamp"}}}})
+            response = await es_client.msearch(body=searches)
+            for index, index_response in zip(batch_indices, response["responses"]):
+                if "error" in index_response:
+                    logging.warning(f"Unable to fetch the time range of the index {index}. {index_response['error']}")
+                    unknown_indices.add(index)
+                    continue
+                if index_response["aggregations"]["first_log"]["value"] is not None:
+                    index_ranges[index] = (int(index_response["aggregations"]["first_log"]["value"]), int(index_response["aggregations"]["last_log"]["value"]))
+        return index_ranges, unknown_indices
+
+    async def refresh(self, es_client):
+        refreshed_at = int(time.time() * 1000)
+        # The field capabilities of the timestamp field list every matching index and only require the read privilege.
+        indices = set((await es_client.field_caps(index=self.index_pattern, fields="timestamp"))["indices"])
+        active_since = (self.refreshed_at or refreshed_at) - self.active_ms
+        # The time ranges of indices which no longer receive logs do not change, so only new, empty and active indices are looked at again.
+        stale_indices = sorted(index for index in indices if index not in self.index_ranges or self.index_ranges[index][1] >= active_since)
+        fetched_ranges, self.unknown_indices = await self.fetch_index_ranges(es_client, stale_indices)
+        index_ranges = {index: index_range for index, index_range in self.index_ranges.items() if index in indices and index not in stale_indices}
+        index_ranges.update(fetched_ranges)
+        self.index_ranges = index_ranges
+        self.refreshed_at = refreshed_at
+        logging.debug(f"Fetched the time ranges of {len(stale_indices)} of the {len(indices)} indices matching {self.index_pattern}.")
+
+    def resolve(self, start_ts, end_ts):
+        # Index expression for a query of the logs between start_ts and end_ts.
+        if self.refreshed_at is None or not self.index_ranges:
+            return self.index_pattern
+        active_since = self.refreshed_at - self.active_ms
+        overlapping_indices = sorted(
+            index for index, (first_log, last_log) in self.index_ranges.items()
+            if first_log <= end_ts and (last_log >= start_ts or last_log >= active_since)
+        )
+        if not overlapping_indices and not self.unknown_indices:
+            # Query a single index, so Elasticsearch still returns empty aggregations instead of searching no index at all.
+            return max(self.index_ranges, key=lambda index: self.index_ranges[index][1])
+        # Indices created or written to since the last refresh only hold logs after active_since.
+        if end_ts < active_since and not self.unknown_indices:
+            included_expression = ",".join(overlapping_indices)
+            if len(included_expression) <= self.max_expression_length:
+                return included_expression
+        excluded_expression = ",".join([self.index_pattern] + [f"-{index}" for index in sorted(set(self.index_ranges) - set(overlapping_indices))])
+        if len(excluded_expression) <= self.max_expression_length:
+            return excluded_expression
+        return self.index_pattern
+
+    def stats(self):
+        return {"indices": len(self.index_ranges), "unknown_indices": len(self.unknown_indices), "refreshed_at": self.refreshed_at}
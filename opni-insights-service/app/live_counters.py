@@ -0,0 +1,223 @@
+# Standard Library
+import json
+import logging
+import time
+
+import numpy as np
+
+MILLISECONDS_MINUTE = 60000
+ANOMALY_LEVELS = ("Normal", "Suspicious", "Anomaly")
+ANOMALY_LEVEL_INDEXES = {anomaly_level: index for index, anomaly_level in enumerate(ANOMALY_LEVELS)}
+
+
+class KeyedRing:
+    """
+    This class holds the number of logs of each anomaly level per key and per minute of a ring of window_minutes minutes
+    in a single (keys, minutes, anomaly levels) NumPy array. Each key gets a row of the array the first time it is seen.
+    When every row is in use, the rows of keys without any logs left within the ring are reused before the array grows.
+    """
+
+    def __init__(self, window_minutes, initial_rows=64):
+        self.rows = dict()
+        self.keys = []
+        self.counts = np.zeros((initial_rows, window_minutes, len(ANOMALY_LEVELS)), dtype=np.uint32)
+
+    def row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            if len(self.keys) == len(self.counts):
+                self.compact()
+            if len(self.keys) == len(self.counts):
+                self.counts = np.concatenate((self.counts, np.zeros_like(self.counts)))
+            row = len(self.keys)
+            self.rows[key] = row
+            self.keys.append(key)
+        return row
+
+    def add(self, key, slot, level):
+        # row may replace the array, so it has to be called before the array is indexed.
+        row = self.row(key)
+        self.counts[row, slot, level] += 1
+
+    def compact(self):
+        # Drop the keys whose rows are all zero and move the remaining rows to the front of the array.
+        used_rows = np.flatnonzero(self.counts[:len(self.keys)].any(axis=(1, 2)))
+        self.counts[:len(used_rows)] = self.counts[used_rows]
+        self.counts[len(used_rows):] = 0
+        self.keys = [self.keys[row] for row in used_rows]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+    def clear(self, slot):
+        self.counts[:, slot, :] = 0
+
+    def totals(self, slots):
+        # Dictionary of key to the number of logs of each anomaly level within the slots, for every key with any logs.
+        key_totals = self.counts[:len(self.keys), slots, :].sum(axis=1, dtype=np.int64)
+        return {
+            self.keys[row]: dict(zip(ANOMALY_LEVELS, key_totals[row].tolist()))
+            for row in np.flatnonzero(key_totals.any(axis=1))
+        }
+
+
+class LiveCounters:
+    """
+    This class counts the logs of the inferred log results published over NATS as they arrive, per minute, for the last
+    window_minutes minutes. The counts are kept by (namespace, pod) for workload logs, by component for control plane
+    logs and by log type, which is Workload, Control Plane or an empty string if the log does not say, in KeyedRing
+    arrays indexed by minute modulo window_minutes. minute_starts holds the minute which each slot currently counts, so
+    a slot is cleared when a log of a newer minute arrives and minutes without any logs read as zero. Every log with a
+    timestamp from the first minute after start until now is counted, so any range of whole minutes within the ring
+    since then can be answered without querying Elasticsearch.
+    """
+
+    def __init__(self, window_minutes):
+        self.window_minutes = window_minutes
+        self.minute_starts = np.full(window_minutes, -1, dtype=np.int64)
+        self.pods = KeyedRing(window_minutes)
+        self.components = KeyedRing(window_minutes)
+        self.log_types = KeyedRing(window_minutes, initial_rows=4)
+        self.counted_since = None
+        self.counted = 0
+        self.dropped = 0
+
+    def start(self, now_ms=None):
+        # Logs published from now on are counted, so only the minutes starting after now are complete.
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        self.counted_since = (now_ms // MILLISECONDS_MINUTE + 1) * MILLISECONDS_MINUTE
+
+    def stop(self):
+        # Logs are being missed, so no minute is complete anymore until start is called again.
+        self.counted_since = None
+
+    def covered_start(self, now_ms=None):
+        # Start of the first minute whose logs are all counted, or None if no logs are being counted.
+        if self.counted_since is None:
+            return None
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        return max(self.counted_since, (now_ms // MILLISECONDS_MINUTE - self.window_minutes + 1) * MILLISECONDS_MINUTE)
+
+    def slot(self, minute_start, now_ms):
+        # Ring slot of the minute, clearing the slot if it still holds an older minute. Returns None for minutes outside of the ring.
+        if minute_start > now_ms or minute_start <= now_ms - self.window_minutes * MILLISECONDS_MINUTE:
+            return None
+        slot = (minute_start // MILLISECONDS_MINUTE) % self.window_minutes
+        if self.minute_starts[slot] != minute_start:
+            if self.minute_starts[slot] > minute_start:
+                return None
+            for ring in (self.pods, self.components, self.log_types):
+                ring.clear(slot)
+            self.minute_starts[slot] = minute_start
+        return slot
+
+    def record(self, timestamp, anomaly_level, log_type, pod_key=None, component=None, now_ms=None):
+        level = ANOMALY_LEVEL_INDEXES.get(anomaly_level)
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        slot = self.slot(timestamp // MILLISECONDS_MINUTE * MILLISECONDS_MINUTE, now_ms) if level is not None else None
+        if slot is None:
+            self.dropped += 1
+            return
+        self.log_types.add(log_type, slot, level)
+        if pod_key:
+            self.pods.add(pod_key, slot, level)
+        if component:
+            self.components.add(component, slot, level)
+        self.counted += 1
+
+    def record_payload(self, payload):
+        # Count every log of a payload of inferred log results. Returns the number of logs in the payload.
+        logs = parse_inferred_logs(payload)
+        now_ms = int(time.time() * 1000)
+        for log in logs:
+            try:
+                timestamp = int(log["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                self.dropped += 1
+                continue
+            kubernetes_metadata = log.get("kubernetes") if isinstance(log.get("kubernetes"), dict) else {}
+            namespace_name = log.get("kubernetes.namespace_name", kubernetes_metadata.get("namespace_name"))
+            pod_name = log.get("kubernetes.pod_name", kubernetes_metadata.get("pod_name"))
+            is_control_plane_log = str(log.get("is_control_plane_log", "")).lower()
+            log_type = {"true": "Control Plane", "false": "Workload"}.get(is_control_plane_log, "")
+            pod_key = (namespace_name, pod_name) if log_type == "Workload" and namespace_name and pod_name else None
+            component = log.get("kubernetes_component") if log_type == "Control Plane" else None
+            self.record(timestamp, log.get("anomaly_level"), log_type, pod_key, component, now_ms)
+        return len(logs)
+
+    def minute_slots(self, first_minute, end_minute):
+        # Minute starts and ring slots of the minutes from first_minute until end_minute which hold any logs.
+        minutes = np.arange(first_minute, end_minute, MILLISECONDS_MINUTE, dtype=np.int64)
+        slots = (minutes // MILLISECONDS_MINUTE) % self.window_minutes
+        held = self.minute_starts[slots] == minutes
+        return minutes[held], slots[held]
+
+    def overall_minute_buckets(self, first_minute, end_minute):
+        # Number of logs of each anomaly level for every minute with logs, like fetch_overall_minute_buckets.
+        minutes, slots = self.minute_slots(first_minute, end_minute)
+        minute_counts = self.log_types.counts[:len(self.log_types.keys), slots, :].sum(axis=0, dtype=np.int64)
+        return {
+            int(minute): {anomaly_level: count for anomaly_level, count in zip(ANOMALY_LEVELS, counts) if count}
+            for minute, counts in zip(minutes.tolist(), minute_counts.tolist()) if any(counts)
+        }
+
+    def anomalies_minute_buckets(self, first_minute, end_minute):
+        # Number of logs marked as Anomaly of workload and control plane logs for every minute with anomalies, like fetch_anomalies_minute_buckets.
+        minutes, slots = self.minute_slots(first_minute, end_minute)
+        anomaly_counts = self.log_types.counts[:len(self.log_types.keys), slots, ANOMALY_LEVEL_INDEXES["Anomaly"]]
+        minute_buckets = dict()
+        for row, log_type in enumerate(self.log_types.keys):
+            if not log_type:
+                continue
+            for minute, count in zip(minutes.tolist(), anomaly_counts[row].tolist()):
+                if count:
+                    minute_buckets.setdefault(minute, {})[log_type] = count
+        return minute_buckets
+
+    def insights_buckets(self, first_minute, end_minute):
+        # Number of logs of each anomaly level by (namespace, pod) and by component, as a single bucket like those of fetch_insights_buckets.
+        _, slots = self.minute_slots(first_minute, end_minute)
+        return {first_minute: {"Pods": self.pods.totals(slots), "Components": self.components.totals(slots)}}
+
+    def stats(self):
+        return {
+            "counting": self.counted_since is not None,
+            "counted": self.counted,
+            "dropped": self.dropped,
+            "pods": len(self.pods.keys),
+            "components": len(self.components.keys),
+            "bytes": int(self.minute_starts.nbytes + self.pods.counts.nbytes + self.components.counts.nbytes + self.log_types.counts.nbytes),
+        }
+
+
+def parse_inferred_logs(payload):
+    """
+    Return the list of logs of a payload of inferred log results. The payload is JSON of either a list of logs, a single
+    log or a DataFrame serialized with to_json, which maps each column to a dictionary of row index to value.
+    """
+    logs = json.loads(payload)
+    if isinstance(logs, list):
+        return [log.get("_source", log) for log in logs if isinstance(log, dict)]
+    if not isinstance(logs, dict):
+        return []
+    if logs and all(isinstance(column, dict) for column in logs.values()):
+        rows = dict()
+        for column_name, column in logs.items():
+            for row_index, value in column.items():
+                rows.setdefault(row_index, {})[column_name] = value
+        return list(rows.values())
+    return [logs.get("_source", logs)]
+
+
+async def subscribe_live_counters(nats_wrapper, live_counters, nats_subjects):
+    """
+    Count the logs of every message published to nats_subjects through nats_wrapper, a connected NatsWrapper. No queue
+    group is used so that every worker process counts every log.
+    """
+    async def count_inferred_logs(msg):
+        try:
+            live_counters.record_payload(msg.data.decode())
+        except Exception as e:
+            logging.error(f"Unable to count the inferred logs published to {msg.subject}. {e}")
+
+    for nats_subject in nats_subjects:
+        await nats_wrapper.subscribe(nats_subject=nats_subject, subscribe_handler=count_inferred_logs)
+    live_counters.start()
@@ -4,32 +4,52 @@ import logging
 from typing import Optional
 
 # Third Party
+from admission_control import AdmissionRejected
+from compression_middleware import CompressionMiddleware
 from endpoint_functions import *
-from fastapi import FastAPI
+from endpoint_functions import admission_controller
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 
-app = FastAPI()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Results are returned as InsightsResponse objects, so FastAPI sends them as they are instead of first walking them with jsonable_encoder, and are serialized with orjson if it is installed.
+InsightsResponse = ORJSONResponse if orjson else JSONResponse
+
+app = FastAPI(default_response_class=InsightsResponse)
+if RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES, gzip_level=RESPONSE_GZIP_LEVEL, brotli_quality=RESPONSE_BROTLI_QUALITY)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(message)s")
 workload_monitoring = BackgroundFunction()
 
+class AdmittedStreamingResponse(StreamingResponse):
+    # StreamingResponse of a request which has already been admitted to endpoint. The request is released once the response has been sent or has failed, even if its body was never started.
+    def __init__(self, endpoint, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.endpoint = endpoint
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission_controller.release(self.endpoint)
+
 @app.get("/insights_breakdown")
-async def index_breakdown(start_ts: int, end_ts: int):
-    # This function handles get requests for fetching pod,namespace and workload breakdown insights.
+async def index_breakdown(start_ts: int, end_ts: int, sort_by: Optional[str] = None, limit: Optional[int] = None, offset: int = 0, namespace_names: Optional[str] = None):
+    # This function handles get requests for fetching pod,namespace and workload breakdown insights, optionally sorted by the count of an anomaly level, filtered by a comma separated list of namespace names and paged with offset and limit.
     logging.info(
         f"Received request to obtain pod insights between {start_ts} and {end_ts}"
     )
+    if sort_by is not None and sort_by not in insights_sort_levels:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(insights_sort_levels)}.")
     try:
-        pod_breakdown_dict, workload_breakdown_dict = await get_pod_aggregation(
-            start_ts, end_ts
-        )
-        namespace_breakdown_dict = await get_namespace_breakdown(start_ts, end_ts)
-        control_plane_breakdown_dict = await get_control_plane_components_breakdown(start_ts, end_ts)
-
-        return {
-            "Pods": pod_breakdown_dict["Pods"],
-            "Workloads": workload_breakdown_dict,
-            "Namespaces": namespace_breakdown_dict["Namespaces"],
-            "Control Plane": control_plane_breakdown_dict
-        }
+        result = await get_insights_breakdown(start_ts, end_ts)
+        return InsightsResponse(select_insights_breakdown(result, namespace_names.split(",") if namespace_names else None, sort_by, offset, limit))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
     except Exception as e:
         # Bad Request
         logging.error(e)
@@ -43,7 +63,9 @@ async def index_overall_breakdown(start_ts: int, end_ts: int, granularity_level:
     )
     try:
         result = await get_overall_breakdown(start_ts, end_ts, granularity_level)
-        return result
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
     except Exception as e:
         # Bad Request
         logging.error(e)
@@ -56,68 +78,128 @@ async def index_anomalies_breakdown(start_ts: int, end_ts: int):
     )
     try:
         result = await get_anomalies_breakdown(start_ts, end_ts)
-        return result
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
     except Exception as e:
         # Bad Request
         logging.error(e)
 
 
 @app.get("/logs_pod")
-async def index_logs_pod(start_ts: int, end_ts: int, anomaly_level: str, pod_name: str, namespace_name: str, scroll_id: Optional[str] = None):
-    # This function handles get requests for fetching logs for a particular pod within a specific namespace with a specified anomaly level between start_ts and end_ts and a scroll_id which is an optional parameter.
+async def index_logs_pod(start_ts: int, end_ts: int, anomaly_level: str, pod_name: str, namespace_name: str, cursor: Optional[str] = None, page_size: int = LOGS_PAGE_SIZE, scroll_id: Optional[str] = None):
+    # This function handles get requests for fetching logs for a particular pod within a specific namespace with a specified anomaly level between start_ts and end_ts and an optional cursor and page size. scroll_id is accepted in place of cursor for existing clients.
     logging.info(
         f"Received request to obtain logs between {start_ts} and {end_ts} for the pod {pod_name} which is in the {namespace_name} namespace which were marked as {anomaly_level}"
     )
     try:
         query_parameters = {"anomaly_level": anomaly_level,"type": "pod", "pod_name": pod_name, "namespace_name": namespace_name}
-        result = await get_logs(start_ts, end_ts, query_parameters, scroll_id)
-        return result
+        result = await get_logs(start_ts, end_ts, query_parameters, cursor or scroll_id, page_size)
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    except InvalidLogsCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Bad Request
         logging.error(e)
 
 @app.get("/logs_namespace")
-async def index_logs_namespace(start_ts: int, end_ts: int, anomaly_level: str, namespace_name: str, scroll_id: Optional[str] = None):
-    # This function handles get requests for fetching logs for a particular namespace name with a specified anomaly level between start_ts and end_ts and a scroll_id which is an optional parameter.
+async def index_logs_namespace(start_ts: int, end_ts: int, anomaly_level: str, namespace_name: str, cursor: Optional[str] = None, page_size: int = LOGS_PAGE_SIZE, scroll_id: Optional[str] = None):
+    # This function handles get requests for fetching logs for a particular namespace name with a specified anomaly level between start_ts and end_ts and an optional cursor and page size. scroll_id is accepted in place of cursor for existing clients.
     logging.info(
         f"Received request to obtain logs between {start_ts} and {end_ts} within {namespace_name} namespace which were marked as {anomaly_level}"
     )
     try:
         query_parameters = {"anomaly_level": anomaly_level,"type": "namespace", "namespace_name": namespace_name}
-        result = await get_logs(start_ts, end_ts, query_parameters, scroll_id)
-        return result
+        result = await get_logs(start_ts, end_ts, query_parameters, cursor or scroll_id, page_size)
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    except InvalidLogsCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Bad Request
         logging.error(e)
 
 @app.get("/logs_workload")
-async def index_logs_workload(start_ts: int, end_ts: int, anomaly_level: str, namespace_name: str, workload_type: str, workload_name: str, scroll_id: Optional[str] = None):
-    # This function handles get requests for fetching logs for a particular workload within a specified namespace with a specified anomaly level between start_ts and end_ts and a scroll_id which is an optional parameter.
+async def index_logs_workload(start_ts: int, end_ts: int, anomaly_level: str, namespace_name: str, workload_type: str, workload_name: str, cursor: Optional[str] = None, page_size: int = LOGS_PAGE_SIZE, scroll_id: Optional[str] = None):
+    # This function handles get requests for fetching logs for a particular workload within a specified namespace with a specified anomaly level between start_ts and end_ts and an optional cursor and page size. scroll_id is accepted in place of cursor for existing clients.
     logging.info(
         f"Received request to obtain logs between {start_ts} and {end_ts} for the workload {workload_name} which is in the {namespace_name} namespace which were marked as {anomaly_level}"
     )
     try:
         query_parameters = {"anomaly_level": anomaly_level,"type": "workload", "namespace_name": namespace_name, "workload_type": workload_type, "workload_name": workload_name}
-        result = await get_logs(start_ts, end_ts, query_parameters, scroll_id)
-        return result
+        result = await get_logs(start_ts, end_ts, query_parameters, cursor or scroll_id, page_size)
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    except InvalidLogsCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Bad Request
         logging.error(e)
 
 @app.get("/logs_control_plane")
-async def index_logs_control_plane(start_ts: int, end_ts: int, anomaly_level: str,control_plane_component: str, scroll_id: Optional[str] = None):
-    # This function handles get requests for fetching logs for a specified control_plane_component with a specified anomaly level between start_ts and end_ts and a scroll_id which is an optional parameter.
+async def index_logs_control_plane(start_ts: int, end_ts: int, anomaly_level: str,control_plane_component: str, cursor: Optional[str] = None, page_size: int = LOGS_PAGE_SIZE, scroll_id: Optional[str] = None):
+    # This function handles get requests for fetching logs for a specified control_plane_component with a specified anomaly level between start_ts and end_ts and an optional cursor and page size. scroll_id is accepted in place of cursor for existing clients.
     logging.info(
         f"Received request to obtain all suspicious and anomalous logs between {start_ts} and {end_ts}"
     )
     try:
         query_parameters = {"anomaly_level": anomaly_level,"type": "control_plane", "control_plane_component": control_plane_component}
-        result = await get_logs(start_ts, end_ts, query_parameters, scroll_id)
-        return result
+        result = await get_logs(start_ts, end_ts, query_parameters, cursor or scroll_id, page_size)
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    except InvalidLogsCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Bad Request
         logging.error(e)
 
+@app.get("/logs_export")
+async def index_logs_export(
+    start_ts: int,
+    end_ts: int,
+    anomaly_level: str,
+    type: str,
+    namespace_name: Optional[str] = None,
+    pod_name: Optional[str] = None,
+    workload_type: Optional[str] = None,
+    workload_name: Optional[str] = None,
+    control_plane_component: Optional[str] = None,
+    compress: bool = False,
+):
+    # This function handles get requests for exporting every log of a pod, namespace, workload or control plane component with a specified anomaly level between start_ts and end_ts as newline delimited JSON, which is gzip compressed if compress is true.
+    logging.info(
+        f"Received request to export {type} logs between {start_ts} and {end_ts} which were marked as {anomaly_level}"
+    )
+    query_parameters = {
+        "anomaly_level": anomaly_level,
+        "type": type,
+        "namespace_name": namespace_name,
+        "pod_name": pod_name,
+        "workload_type": workload_type,
+        "workload_name": workload_name,
+        "control_plane_component": control_plane_component,
+    }
+    # The request is rejected before the response starts, as an error can't be reported once logs are being streamed.
+    query_error = validate_logs_query_parameters(query_parameters)
+    if query_error:
+        raise HTTPException(status_code=400, detail=query_error)
+    query_body = get_logs_query_body(start_ts, end_ts, query_parameters)
+    if query_body is None:
+        raise HTTPException(status_code=400, detail=f"No {type} matches the provided parameters.")
+    try:
+        await admission_controller.acquire("logs_export", end_ts - start_ts)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
+    log_chunks = export_logs(start_ts, end_ts, query_body, compress=compress)
+    if compress:
+        return AdmittedStreamingResponse("logs_export", log_chunks, media_type="application/gzip", headers={"Content-Disposition": "attachment; filename=logs.ndjson.gz"})
+    return AdmittedStreamingResponse("logs_export", log_chunks, media_type="application/x-ndjson")
+
 @app.get("/areas_of_interest")
 async def index_areas_of_interest(start_ts: int, end_ts: int):
     # This function handles get requests for fetching areas of interest between start_ts and end_ts.
@@ -126,7 +208,9 @@ async def index_areas_of_interest(start_ts: int, end_ts: int):
     )
     try:
         result = await get_areas_of_interest(start_ts, end_ts)
-        return result
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
     except Exception as e:
         # Bad Request
         logging.error(e)
@@ -139,11 +223,39 @@ async def index_peaks(start_ts: int, end_ts: int):
     )
     try:
         result = await get_peaks(start_ts, end_ts)
-        return result
+        return InsightsResponse(result)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.reason)
     except Exception as e:
         # Bad Request
         logging.error(e)
 
+@app.get("/stats")
+async def index_stats():
+    # This function handles get requests for fetching statistics about the caches kept by the service and the requests it has coalesced.
+    return InsightsResponse({
+        "Aggregation Cache": aggregation_cache.stats(),
+        "Anomaly Series": anomaly_series_store.stats(),
+        "Workload Topology": get_topology_stats(),
+        "Request Coalescing": request_coalescer.stats(),
+        "Elasticsearch Batching": es_instance.stats() if isinstance(es_instance, MsearchBatcher) else {},
+        "Admission Control": admission_controller.stats(),
+        "Live Counters": live_counters.stats(),
+        "Index Routing": index_router.stats() if index_router else {},
+    })
+
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(workload_monitoring.monitor_workloads())
+    if WORKLOAD_TOPOLOGY_SHARED and WORKLOAD_SNAPSHOT_PATH:
+        asyncio.create_task(workload_monitoring.share_workloads())
+    else:
+        workload_monitoring.start_monitoring()
+    if LIVE_COUNTERS_ENABLED:
+        asyncio.create_task(count_live_logs())
+    if index_router:
+        asyncio.create_task(refresh_logs_indices())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if workload_monitoring.monitoring and WORKLOAD_SNAPSHOT_PATH:
+        workload_monitoring.save_topology_snapshot()
@@ -0,0 +1,91 @@
+# Standard Library
+import asyncio
+import logging
+
+# Third Party
+from elasticsearch.exceptions import TransportError
+
+
+class MsearchBatcher:
+    """
+    This class wraps an AsyncElasticsearch client. Searches on an index which are issued within window_ms of each other
+    are sent to Elasticsearch as a single _msearch request, which is sent as soon as max_searches searches are waiting,
+    and each caller receives its own response or the error of its own search. request_cache is sent in the header of the
+    search within the _msearch request. Searches with any other arguments, such as searches of a point in time, and every
+    other method are passed through to the client.
+    """
+
+    def __init__(self, client, window_ms=2, max_searches=50):
+        self.client = client
+        self.window_ms = window_ms
+        self.max_searches = max_searches
+        self.pending_searches = []
+        self.flush_handle = None
+        self.batches = 0
+        self.searches = 0
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def search(self, index=None, body=None, size=None, request_cache=None, **kwargs):
+        if index is None or kwargs:
+            return await self.client.search(index=index, body=body, size=size, request_cache=request_cache, **kwargs)
+        search_body = dict(body or {})
+        if size is not None:
+            search_body["size"] = size
+        header = {"index": index}
+        if request_cache is not None:
+            header["request_cache"] = request_cache
+        response_future = asyncio.get_event_loop().create_future()
+        self.pending_searches.append((header, search_body, response_future))
+        if len(self.pending_searches) >= self.max_searches:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_event_loop().call_later(self.window_ms / 1000, self.flush)
+        return await response_future
+
+    def flush(self):
+        # Send every waiting search as one _msearch request.
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending_searches = self.pending_searches, []
+        if batch:
+            asyncio.ensure_future(self.send_batch(batch))
+
+    async def send_batch(self, batch):
+        self.batches += 1
+        self.searches += len(batch)
+        if len(batch) == 1:
+            header, search_body, response_future = batch[0]
+            try:
+                response = await self.client.search(body=search_body, **header)
+            except Exception as e:
+                if not response_future.done():
+                    response_future.set_exception(e)
+                return
+            if not response_future.done():
+                response_future.set_result(response)
+            return
+        msearch_body = []
+        for header, search_body, _ in batch:
+            msearch_body.extend((header, search_body))
+        try:
+            responses = (await self.client.msearch(body=msearch_body))["responses"]
+        except Exception as e:
+            logging.debug(f"Unable to send a batch of {len(batch)} searches to Elasticsearch. {e}")
+            for _, _, response_future in batch:
+                if not response_future.done():
+                    response_future.set_exception(e)
+            return
+        for (_, _, response_future), response in zip(batch, responses):
+            if response_future.done():
+                continue
+            if "error" in response:
+                error = response["error"]
+                response_future.set_exception(TransportError(response.get("status", "N/A"), error.get("type", "error") if isinstance(error, dict) else error, error))
+            else:
+                response_future.set_result(response)
+
+    def stats(self):
+        return {"batches": self.batches, "searches": self.searches}
@@ -0,0 +1,49 @@
+# Standard Library
+import asyncio
+import functools
+
+
+class RequestCoalescer:
+    """
+    This class lets concurrent identical calls of a coroutine function share a single execution. The first call starts the
+    coroutine as a task and every call with the same key made while that task is running waits for the same result. The
+    task is shielded, so one caller being cancelled does not cancel the call for the others. The number of executed and
+    coalesced calls is counted per function.
+    """
+
+    def __init__(self):
+        self.in_flight = dict()
+        self.executed = dict()
+        self.coalesced = dict()
+
+    def coalesce(self, normalize_arguments=None):
+        # Decorator for coroutine functions. normalize_arguments maps the arguments of a call to a tuple of equivalent arguments, which identifies identical calls and is what the shared call is made with, so every caller gets the same result.
+        def decorator(function):
+            function_name = function.__name__
+            self.executed[function_name] = 0
+            self.coalesced[function_name] = 0
+
+            @functools.wraps(function)
+            async def coalesced_function(*args):
+                if normalize_arguments:
+                    args = normalize_arguments(*args)
+                call_key = (function_name, args)
+                task = self.in_flight.get(call_key)
+                if task is None:
+                    task = asyncio.ensure_future(function(*args))
+                    self.in_flight[call_key] = task
+                    task.add_done_callback(lambda _: self.in_flight.pop(call_key, None))
+                    self.executed[function_name] += 1
+                else:
+                    self.coalesced[function_name] += 1
+                return await asyncio.shield(task)
+
+            return coalesced_function
+
+        return decorator
+
+    def stats(self):
+        return {
+            function_name: {"executed": self.executed[function_name], "coalesced": self.coalesced[function_name]}
+            for function_name in self.executed
+        }
@@ -0,0 +1,75 @@
+# Standard Library
+import logging
+import threading
+import time
+
+# Third Party
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+HTTP_STATUS_GONE = 410
+
+
+class ResourceInformer:
+    """
+    This class keeps track of a single Kubernetes resource type. It does one initial LIST of the resource and then
+    consumes WATCH events starting from the resourceVersion returned by that LIST. Every resync_period seconds, or when
+    the resourceVersion has expired on the API server (410 Gone), the resource is listed again. The full list is handed to
+    on_sync and every watch event is handed to on_event. The watch_factory argument allows a fake event stream to be
+    used in place of kubernetes.watch.Watch.
+    """
+
+    def __init__(self, kind, list_function, on_sync, on_event, resync_period=600, watch_timeout=300, watch_factory=watch.Watch):
+        self.kind = kind
+        self.list_function = list_function
+        self.on_sync = on_sync
+        self.on_event = on_event
+        self.resync_period = resync_period
+        self.watch_timeout = watch_timeout
+        self.watch_factory = watch_factory
+        self.resource_version = None
+        self.synced = threading.Event()
+        self.stopped = threading.Event()
+
+    def list_resources(self):
+        # List every object of this resource type and remember the resourceVersion to resume watching from.
+        resource_list = self.list_function()
+        self.resource_version = resource_list.metadata.resource_version
+        self.on_sync(self.kind, resource_list.items)
+        self.synced.set()
+
+    def watch_resources(self, deadline):
+        # Consume watch events until the deadline is reached or the resourceVersion has expired, after which run will list again.
+        while not self.stopped.is_set() and time.monotonic() < deadline:
+            timeout_seconds = max(1, min(self.watch_timeout, int(deadline - time.monotonic())))
+            resource_watch = self.watch_factory()
+            try:
+                for event in resource_watch.stream(self.list_function, resource_version=self.resource_version, timeout_seconds=timeout_seconds):
+                    if event["type"] == "ERROR":
+                        if event["raw_object"].get("code") == HTTP_STATUS_GONE:
+                            return
+                        logging.error(f"Received error event while watching {self.kind}. {event['raw_object']}")
+                        continue
+                    resource_object = event["object"]
+                    self.resource_version = resource_object.metadata.resource_version
+                    self.on_event(self.kind, event["type"], resource_object)
+                    if self.stopped.is_set():
+                        resource_watch.stop()
+                        break
+            except ApiException as e:
+                if e.status == HTTP_STATUS_GONE:
+                    return
+                raise
+
+    def run(self):
+        # This function blocks for as long as the informer runs and is meant to be run within its own thread.
+        while not self.stopped.is_set():
+            try:
+                self.list_resources()
+                self.watch_resources(time.monotonic() + self.resync_period)
+            except Exception as e:
+                logging.error(f"Unable to watch Kubernetes {self.kind} objects. {e}")
+                self.stopped.wait(5)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,217 @@
+# Standard Library
+import os
+import sqlite3
+import sys
+import time
+
+
+class WorkloadTopology:
+    """
+    This class keeps track of the workload of every pod which has been seen. pod_workloads maps (namespace, pod name) to the
+    (namespace, kind, workload name) key of its workload, workload_pods maps that key to the set of pod names of the
+    workload and pod_last_seen maps (namespace, pod name) to the time in seconds at which the pod was last seen. Strings
+    are interned and every pod of a workload refers to the same key tuple, so each name is only kept in memory once. Pods
+    which have not been seen for longer than the retention period are removed through evict. The topology can be saved
+    to and loaded from a SQLite snapshot so it survives restarts.
+    """
+
+    def __init__(self):
+        self.pod_workloads = dict()
+        self.workload_pods = dict()
+        self.pod_last_seen = dict()
+
+    def copy(self):
+        topology = WorkloadTopology()
+        topology.pod_workloads = dict(self.pod_workloads)
+        topology.workload_pods = {workload_key: set(pod_names) for workload_key, pod_names in self.workload_pods.items()}
+        topology.pod_last_seen = dict(self.pod_last_seen)
+        return topology
+
+    def swap(self, topology):
+        # Take over the contents of topology, so every module which has imported this object sees the new topology.
+        self.pod_workloads, self.workload_pods, self.pod_last_seen = topology.pod_workloads, topology.workload_pods, topology.pod_last_seen
+
+    def record_pod(self, namespace_name, pod_name, kind, workload_name, seen_at=None, keep_workload=False):
+        """
+        Record that a pod of the workload has been seen at seen_at. A pod which was recorded with another workload is moved
+        to this one, as its owners may only have been resolved partially before, unless keep_workload is set because the
+        workload could not be fully resolved this time either. Workloads left without pods are removed.
+        """
+        pod_key = (sys.intern(namespace_name), sys.intern(pod_name))
+        workload_key = self.pod_workloads.get(pod_key)
+        new_workload_key = (pod_key[0], kind, workload_name)
+        if workload_key is None or (workload_key != new_workload_key and not keep_workload):
+            if workload_key is not None:
+                pod_names = self.workload_pods[workload_key]
+                pod_names.discard(pod_key[1])
+                if not pod_names:
+                    del self.workload_pods[workload_key]
+            workload_key = (pod_key[0], sys.intern(kind), sys.intern(workload_name))
+            pod_names = self.workload_pods.get(workload_key)
+            if pod_names:
+                # Refer to the key tuple which is already used by the other pods of the workload.
+                workload_key = self.pod_workloads[(pod_key[0], next(iter(pod_names)))]
+            self.pod_workloads[pod_key] = workload_key
+        self.workload_pods.setdefault(workload_key, set()).add(pod_key[1])
+        self.pod_last_seen[pod_key] = int(time.time()) if seen_at is None else seen_at
+
+    def get_workload(self, namespace_name, pod_name):
+        # Return the (kind, workload name) of a pod or None if the pod has never been seen.
+        workload_key = self.pod_workloads.get((namespace_name, pod_name))
+        return workload_key[1:] if workload_key else None
+
+    def get_workloads(self, pod_keys):
+        # Return a dictionary of (namespace, pod name) to the (kind, workload name) of every pod of pod_keys which has been seen.
+        return {pod_key: self.pod_workloads[pod_key][1:] for pod_key in pod_keys if pod_key in self.pod_workloads}
+
+    def get_workload_pods(self, namespace_name, kind, workload_name):
+        # Return the set of pod names of a workload. KeyError is raised if the workload has never been seen.
+        return self.workload_pods[(namespace_name, kind, workload_name)]
+
+    def evict(self, seen_before):
+        # Remove every pod which has not been seen since seen_before, together with the workloads left without pods.
+        evicted_pods = [pod_key for pod_key, last_seen in self.pod_last_seen.items() if last_seen < seen_before]
+        for pod_key in evicted_pods:
+            del self.pod_last_seen[pod_key]
+            workload_key = self.pod_workloads.pop(pod_key)
+            pod_names = self.workload_pods[workload_key]
+            pod_names.discard(pod_key[1])
+            if not pod_names:
+                del self.workload_pods[workload_key]
+        return len(evicted_pods)
+
+    def stats(self):
+        # Approximate number of bytes used by the containers of the topology. Interned strings are shared with the rest of the process and not counted.
+        container_bytes = sys.getsizeof(self.pod_workloads) + sys.getsizeof(self.workload_pods) + sys.getsizeof(self.pod_last_seen)
+        container_bytes += sum(sys.getsizeof(pod_key) for pod_key in self.pod_last_seen)
+        container_bytes += sum(sys.getsizeof(workload_key) + sys.getsizeof(pod_names) for workload_key, pod_names in self.workload_pods.items())
+        return {"pods": len(self.pod_workloads), "workloads": len(self.workload_pods), "bytes": container_bytes}
+
+    def snapshot_state(self):
+        # Shallow copies of the pod dictionaries for write_snapshot, which are cheap enough to take on the event loop.
+        return dict(self.pod_workloads), dict(self.pod_last_seen)
+
+    @staticmethod
+    def write_snapshot(path, state):
+        # Write the state to a new SQLite database which then replaces the snapshot at path, so a partially written snapshot is never loaded.
+        pod_workloads, pod_last_seen = state
+        workload_ids = dict()
+        for workload_key in pod_workloads.values():
+            if workload_key not in workload_ids:
+                workload_ids[workload_key] = len(workload_ids)
+        temporary_path = path + ".tmp"
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        connection = sqlite3.connect(temporary_path)
+        try:
+            # The file only replaces the snapshot once it is complete, so it does not need a journal.
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("CREATE TABLE workloads (workload_id INTEGER PRIMARY KEY, namespace_name TEXT, kind TEXT, workload_name TEXT)")
+            connection.execute("CREATE TABLE pods (workload_id INTEGER, pod_name TEXT, last_seen INTEGER)")
+            connection.executemany("INSERT INTO workloads VALUES (?, ?, ?, ?)", ((workload_id,) + workload_key for workload_key, workload_id in workload_ids.items()))
+            connection.executemany(
+                "INSERT INTO pods VALUES (?, ?, ?)",
+                ((workload_ids[workload_key], pod_key[1], pod_last_seen[pod_key]) for pod_key, workload_key in pod_workloads.items()),
+            )
+            # Indexes used by TopologySnapshotReader to look up pods and workloads without loading the snapshot.
+            connection.execute("CREATE UNIQUE INDEX workloads_by_name ON workloads (namespace_name, kind, workload_name)")
+            connection.execute("CREATE INDEX pods_by_name ON pods (pod_name)")
+            connection.execute("CREATE INDEX pods_by_workload ON pods (workload_id)")
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temporary_path, path)
+
+    def load_snapshot(self, path):
+        # Load every pod of the snapshot at path into this empty topology and return the number of pods loaded.
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            workload_keys = {
+                workload_id: (sys.intern(namespace_name), sys.intern(kind), sys.intern(workload_name))
+                for workload_id, namespace_name, kind, workload_name in connection.execute("SELECT workload_id, namespace_name, kind, workload_name FROM workloads")
+            }
+            pod_rows = connection.execute("SELECT workload_id, pod_name, last_seen FROM pods").fetchall()
+        finally:
+            connection.close()
+        for workload_key in workload_keys.values():
+            self.workload_pods[workload_key] = set()
+        for workload_id, pod_name, last_seen in pod_rows:
+            workload_key = workload_keys[workload_id]
+            pod_key = (workload_key[0], sys.intern(pod_name))
+            self.pod_workloads[pod_key] = workload_key
+            self.pod_last_seen[pod_key] = last_seen
+            self.workload_pods[workload_key].add(pod_key[1])
+        return len(pod_rows)
+
+
+class TopologySnapshotReader:
+    """
+    This class answers the same lookups as WorkloadTopology straight from a snapshot written by another process. The
+    snapshot is opened read-only and memory mapped, so every worker reading the same snapshot shares its pages through
+    the page cache instead of keeping its own copy of the topology. refresh reopens the snapshot once it has been replaced.
+    """
+
+    def __init__(self, path, mmap_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.mmap_bytes = mmap_bytes
+        self.connection = None
+        self.snapshot_inode = None
+
+    def refresh(self):
+        try:
+            snapshot_inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if snapshot_inode == self.snapshot_inode:
+            return
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        connection.execute(f"PRAGMA mmap_size = {self.mmap_bytes}")
+        self.close()
+        self.connection, self.snapshot_inode = connection, snapshot_inode
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+        self.connection, self.snapshot_inode = None, None
+
+    def get_workload(self, namespace_name, pod_name):
+        if self.connection is None:
+            return None
+        return self.connection.execute(
+            "SELECT kind, workload_name FROM pods JOIN workloads USING (workload_id) WHERE pod_name = ? AND namespace_name = ?", (pod_name, namespace_name)
+        ).fetchone()
+
+    def get_workloads(self, pod_keys, batch_size=500):
+        # Look up the workloads of many pods with one query per batch_size pod names, which stays below the limit SQLite puts on the number of parameters of a query.
+        pod_workloads = dict()
+        if self.connection is None:
+            return pod_workloads
+        pod_keys = set(pod_keys)
+        pod_names = sorted({pod_name for _, pod_name in pod_keys})
+        for batch_start in range(0, len(pod_names), batch_size):
+            batch = pod_names[batch_start : batch_start + batch_size]
+            workload_rows = self.connection.execute(
+                f"SELECT namespace_name, pod_name, kind, workload_name FROM pods JOIN workloads USING (workload_id) WHERE pod_name IN ({','.join('?' * len(batch))})", batch
+            )
+            for namespace_name, pod_name, kind, workload_name in workload_rows:
+                if (namespace_name, pod_name) in pod_keys:
+                    pod_workloads[(namespace_name, pod_name)] = (kind, workload_name)
+        return pod_workloads
+
+    def get_workload_pods(self, namespace_name, kind, workload_name):
+        workload_row = None
+        if self.connection:
+            workload_row = self.connection.execute(
+                "SELECT workload_id FROM workloads WHERE namespace_name = ? AND kind = ? AND workload_name = ?", (namespace_name, kind, workload_name)
+            ).fetchone()
+        if workload_row is None:
+            raise KeyError((namespace_name, kind, workload_name))
+        return {pod_name for (pod_name,) in self.connection.execute("SELECT pod_name FROM pods WHERE workload_id = ?", workload_row)}
+
+    def stats(self):
+        if self.connection is None:
+            return {"pods": 0, "workloads": 0, "bytes": 0}
+        pod_count = self.connection.execute("SELECT COUNT(*) FROM pods").fetchone()[0]
+        workload_count = self.connection.execute("SELECT COUNT(*) FROM workloads").fetchone()[0]
+        return {"pods": pod_count, "workloads": workload_count, "bytes": os.path.getsize(self.path)}
@@ -0,0 +1,69 @@
+"""
+Benchmark of the peak detection run by get_peaks over a 30 day range of anomaly counts per minute. It compares the
+previous path, which fed one value at a time from DataFrame.iterrows into the list based detector, with detect_peaks and
+with detect_peaks_batch. Run it from the opni-insights-service directory with python benchmarks/bench_peak_detection.py.
+"""
+# Standard Library
+import os
+import sys
+import time
+
+# Third Party
+import numpy as np
+
+sys.path[:0] = [os.path.join(os.path.dirname(__file__), "..", "app"), os.path.join(os.path.dirname(__file__), "..", "tests")]
+from PeakDetecion import PeakDetection
+from test_peak_detection import ReferencePeakDetection, random_series
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+WINDOW, THRESHOLD, INFLUENCE = 60, 3.0, 0.5
+MINUTES = 30 * 24 * 60
+
+
+def best_time(function, repeat):
+    # Smallest wall clock time of repeat runs of function in milliseconds, together with its result.
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    return min(timings), result
+
+
+def iterrows_path(timestamps, anomaly_counts):
+    # The way get_peaks used to walk the minute histogram.
+    detector = ReferencePeakDetection(WINDOW, THRESHOLD, INFLUENCE)
+    df = pd.DataFrame({"timestamp": timestamps, "anomaly_count": anomaly_counts})
+    return np.array([detector.detect_peaks(row["anomaly_count"]) for _, row in df.iterrows()])
+
+
+def per_value_path(anomaly_counts):
+    detector = PeakDetection(WINDOW, THRESHOLD, INFLUENCE)
+    return np.array([detector.detect_peaks(value) for value in anomaly_counts])
+
+
+def batch_path(anomaly_counts):
+    return PeakDetection(WINDOW, THRESHOLD, INFLUENCE).detect_peaks_batch(anomaly_counts)
+
+
+def main():
+    anomaly_counts = random_series(0, length=MINUTES)
+    timestamps = np.arange(MINUTES, dtype=np.int64) * 60000
+    batch_ms, batch_signals = best_time(lambda: batch_path(anomaly_counts), 20)
+    per_value_ms, per_value_signals = best_time(lambda: per_value_path(anomaly_counts), 3)
+    assert np.array_equal(batch_signals, per_value_signals)
+    print(f"{MINUTES} minutes, {int(batch_signals.sum())} peaks")
+    if pd is not None:
+        iterrows_ms, iterrows_signals = best_time(lambda: iterrows_path(timestamps, anomaly_counts), 1)
+        assert np.array_equal(batch_signals, iterrows_signals)
+        print(f"iterrows with the list based detector: {iterrows_ms:10.1f} ms")
+    print(f"detect_peaks one value at a time:      {per_value_ms:10.1f} ms")
+    print(f"detect_peaks_batch:                    {batch_ms:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
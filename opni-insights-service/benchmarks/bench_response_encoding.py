@@ -0,0 +1,110 @@
+"""
+Benchmark of the CPU time and the bytes sent for the responses of the insights endpoints. It compares rendering them with
+JSONResponse and ORJSONResponse, and sending them through CompressionMiddleware uncompressed, gzip compressed and brotli
+compressed at several levels. The identity row is the cost of sending a body through the middleware without compressing
+it. Run it from the opni-insights-service directory with python benchmarks/bench_response_encoding.py.
+"""
+# Standard Library
+import asyncio
+import os
+import sys
+import time
+
+# Third Party
+import numpy as np
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+sys.path[:0] = [os.path.join(os.path.dirname(__file__), "..", "app")]
+from compression_middleware import CompressionMiddleware, brotli
+
+MINUTE = 60000
+ANOMALY_LEVELS = ("Normal", "Suspicious", "Anomaly")
+
+
+def insights(generator):
+    return dict(zip(ANOMALY_LEVELS, generator.integers(0, 100000, 3).tolist()))
+
+
+def insights_breakdown(pod_count):
+    # Response of /insights_breakdown for a cluster of pod_count pods, 10 per workload and 50 workloads per namespace.
+    generator = np.random.default_rng(0)
+    pods = [{"Name": f"web-{index // 10}-5d4f8b7c9-{index:05d}", "Namespace": f"namespace-{index // 500}", "Insights": insights(generator)} for index in range(pod_count)]
+    workloads = {kind: [] for kind in ("ReplicaSet", "StatefulSet", "Deployment", "Job", "DaemonSet", "CustomResource", "Independent")}
+    workloads["Deployment"] = [{"Name": f"web-{index}", "Namespace": f"namespace-{index // 50}", "Insights": insights(generator)} for index in range(pod_count // 10)]
+    namespaces = [{"Name": f"namespace-{index}", "Insights": insights(generator)} for index in range(pod_count // 500 + 1)]
+    components = [{"Name": component, "Insights": insights(generator)} for component in ("kubelet", "kube-apiserver", "etcd", "kube-scheduler", "kube-controller-manager")]
+    return {"Pods": pods, "Workloads": workloads, "Namespaces": namespaces, "Control Plane": {"Components": components}}
+
+
+def overall_breakdown(minutes):
+    # Response of /overall_insights_breakdown at a granularity of one minute.
+    generator = np.random.default_rng(1)
+    buckets = [dict(time_start=1620000000000 + index * MINUTE, **insights(generator)) for index in range(minutes)]
+    return {"Insights": buckets, "granularity_level": "1m"}
+
+
+def logs_page(log_count):
+    # Response of /logs with a page of log_count logs.
+    generator = np.random.default_rng(2)
+    logs = [
+        {
+            "timestamp": 1620000000000 + index,
+            "log": f"level=info ts=2021-05-03T00:00:{index % 60:02d}Z caller=handler.go:{generator.integers(1, 900)} msg=\"request served\" duration_ms={generator.integers(1, 5000)}",
+            "anomaly_level": ANOMALY_LEVELS[generator.integers(0, 3)],
+            "pod_name": f"web-{generator.integers(0, 100)}-5d4f8b7c9-x2k4p",
+            "namespace_name": "default",
+        }
+        for index in range(log_count)
+    ]
+    return {"Logs": logs, "Cursor": "WzE2MjAwMDAwMDAwMDAsIjEyMyJd"}
+
+
+def best_cpu_time(function, repeat):
+    # Smallest CPU time of repeat runs of function in milliseconds, together with its result.
+    timings = []
+    for _ in range(repeat):
+        start_time = time.process_time()
+        result = function()
+        timings.append((time.process_time() - start_time) * 1000)
+    return min(timings), result
+
+
+def send_through_middleware(body, accept_encoding, **middleware_settings):
+    # Send a rendered JSON body through CompressionMiddleware as a raw ASGI app and return the bytes of the response body.
+    app = CompressionMiddleware(Response(body, media_type="application/json"), **middleware_settings)
+    sent_body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent_body.append(message.get("body", b""))
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []}
+    asyncio.run(app(scope, receive, send))
+    return b"".join(sent_body)
+
+
+def main():
+    payloads = [
+        ("insights breakdown, 5000 pods", insights_breakdown(5000)),
+        ("overall breakdown, 1440 minutes", overall_breakdown(1440)),
+        ("logs, 1000 logs", logs_page(1000)),
+    ]
+    encodings = [("identity", "", {}), ("gzip 1", "gzip", {"gzip_level": 1}), ("gzip 6", "gzip", {"gzip_level": 6})]
+    if brotli:
+        encodings.extend(("br " + str(quality), "br", {"brotli_quality": quality}) for quality in (1, 4, 11))
+    for name, payload in payloads:
+        print(name)
+        json_ms, json_body = best_cpu_time(lambda: JSONResponse(payload).body, 10)
+        orjson_ms, orjson_body = best_cpu_time(lambda: ORJSONResponse(payload).body, 10)
+        print(f"  JSONResponse   {json_ms:8.2f} ms {len(json_body):10d} bytes")
+        print(f"  ORJSONResponse {orjson_ms:8.2f} ms {len(orjson_body):10d} bytes")
+        for encoding_name, accept_encoding, middleware_settings in encodings:
+            encoding_ms, sent_body = best_cpu_time(lambda: send_through_middleware(orjson_body, accept_encoding, **middleware_settings), 5)
+            print(f"  {encoding_name:14s} {encoding_ms:8.2f} ms {len(sent_body):10d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# Standard Library
+import os
+import sys
+
+# Third Party
+from kubernetes import config
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+# endpoint_functions reads its Elasticsearch settings and loads the in-cluster Kubernetes configuration when it is imported.
+# No request is sent to either of them until a test does, and every test which does replaces the client with a fake.
+os.environ.setdefault("ES_ENDPOINT", "localhost")
+os.environ.setdefault("ES_USERNAME", "admin")
+os.environ.setdefault("ES_PASSWORD", "admin")
+config.load_incluster_config = lambda: None
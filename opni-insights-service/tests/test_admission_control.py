@@ -0,0 +1,63 @@
+# Standard Library
+import asyncio
+
+# Third Party
+import main
+import pytest
+from admission_control import AdmissionController, AdmissionRejected
+from fastapi.responses import StreamingResponse
+
+
+async def log_chunks():
+    yield b"log\n"
+
+
+def send_response(response, send):
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    asyncio.run(response({"type": "http"}, receive, send))
+
+
+async def stream_response(response, scope, receive, send):
+    # The part of StreamingResponse.__call__ which matters here, as the pinned Starlette can't stream on every Python version the tests run on.
+    await send({"type": "http.response.start", "status": response.status_code, "headers": response.raw_headers})
+    async for chunk in response.body_iterator:
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+@pytest.fixture
+def admission_controller(monkeypatch):
+    monkeypatch.setattr(StreamingResponse, "__call__", stream_response)
+    controller = AdmissionController(1, {}, 1, 0)
+    monkeypatch.setattr(main, "admission_controller", controller)
+    asyncio.run(controller.acquire("logs_export", 0))
+    return controller
+
+
+def test_a_streamed_response_releases_its_request_once_sent(admission_controller):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    send_response(main.AdmittedStreamingResponse("logs_export", log_chunks()), send)
+    assert [message["type"] for message in messages] == ["http.response.start", "http.response.body", "http.response.body"]
+    assert admission_controller.running == 0
+
+
+def test_a_streamed_response_which_never_starts_releases_its_request(admission_controller):
+    async def send(message):
+        raise ConnectionResetError()
+
+    with pytest.raises(ConnectionResetError):
+        send_response(main.AdmittedStreamingResponse("logs_export", log_chunks()), send)
+    assert admission_controller.running == 0
+    # The released slot can be acquired again instead of rejecting every later export.
+    asyncio.run(admission_controller.acquire("logs_export", 0))
+
+
+def test_requests_beyond_the_limit_are_rejected_once_nothing_can_wait(admission_controller):
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(admission_controller.acquire("logs_export", 0))
@@ -0,0 +1,115 @@
+# Standard Library
+import asyncio
+import random
+
+# Third Party
+import aggregation_cache
+import pytest
+from aggregation_cache import AggregationCache
+
+MINUTE = 60000
+HOUR = 60 * MINUTE
+NOW = 444445 * HOUR
+
+
+class FakeLogs:
+    # Logs at random timestamps of the last two days, counted per bucket like a date_histogram aggregation.
+    def __init__(self, bucket_ms=MINUTE, count=20000, seed=0):
+        generator = random.Random(seed)
+        self.bucket_ms = bucket_ms
+        self.timestamps = [NOW - generator.randrange(48 * HOUR) for _ in range(count)]
+        self.fetches = []
+
+    def count(self, gte, lte):
+        buckets = dict()
+        for timestamp in self.timestamps:
+            if gte <= timestamp <= lte:
+                bucket_start = timestamp // self.bucket_ms * self.bucket_ms
+                buckets[bucket_start] = buckets.get(bucket_start, 0) + 1
+        return buckets
+
+    async def fetch_buckets(self, gte, lte):
+        self.fetches.append((gte, lte))
+        return self.count(gte, lte)
+
+
+@pytest.fixture(autouse=True)
+def fixed_time(monkeypatch):
+    monkeypatch.setattr(aggregation_cache.time, "time", lambda: NOW / 1000)
+
+
+def get_buckets(cache, logs, start_ts, end_ts, max_fetch_buckets=100):
+    return asyncio.run(cache.get_buckets("overall", start_ts, end_ts, logs.bucket_ms, logs.fetch_buckets, max_fetch_buckets))
+
+
+def test_buckets_match_a_single_aggregation():
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    logs = FakeLogs()
+    for start_ts, end_ts in [(NOW - 6 * HOUR + 1234, NOW + MINUTE), (NOW - 20 * HOUR, NOW - 2 * HOUR - 1), (NOW - 7 * HOUR - 5, NOW - 61)]:
+        # Repeated requests answer the settled buckets from the cache.
+        for _ in range(2):
+            assert get_buckets(cache, logs, start_ts, end_ts) == logs.count(start_ts, end_ts)
+
+
+def test_missing_ranges_are_fetched_in_chunks_of_at_most_max_fetch_buckets():
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    logs = FakeLogs()
+    get_buckets(cache, logs, NOW - 24 * HOUR, NOW, max_fetch_buckets=100)
+    settled_fetches = sorted(logs.fetches)[:-1]
+    assert all(gte // (100 * MINUTE) == lte // (100 * MINUTE) for gte, lte in settled_fetches)
+    assert settled_fetches[0][0] == NOW - 24 * HOUR and settled_fetches[-1][1] == NOW - 5 * MINUTE - 1
+    assert sorted(logs.fetches)[-1] == (NOW - 5 * MINUTE, NOW)
+
+
+def test_only_the_unsettled_end_is_fetched_again():
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    logs = FakeLogs()
+    get_buckets(cache, logs, NOW - 6 * HOUR, NOW)
+    logs.fetches.clear()
+    get_buckets(cache, logs, NOW - 3 * HOUR, NOW)
+    assert logs.fetches == [(NOW - 5 * MINUTE, NOW)]
+    assert cache.stats()["hits"] > 0
+
+
+def test_buckets_without_logs_are_cached_without_entries():
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    logs = FakeLogs(count=0)
+    assert get_buckets(cache, logs, NOW - 24 * HOUR, NOW - HOUR - 1, max_fetch_buckets=24 * 60) == {}
+    assert cache.stats()["entries"] > 0
+    logs.fetches.clear()
+    get_buckets(cache, logs, NOW - 12 * HOUR, NOW - HOUR - 1)
+    assert logs.fetches == []
+
+
+def test_ranges_before_the_horizon_are_fetched_but_not_cached():
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    logs = FakeLogs()
+    assert not cache.is_cacheable(NOW - 30 * HOUR)
+    assert get_buckets(cache, logs, NOW - 30 * HOUR, NOW - 25 * HOUR) == logs.count(NOW - 30 * HOUR, NOW - 25 * HOUR)
+    assert all(lte - gte < 100 * MINUTE for gte, lte in logs.fetches)
+    assert cache.stats()["entries"] == 0
+
+
+def test_segments_are_evicted_to_fit_the_memory_budget():
+    logs = FakeLogs()
+    cache = AggregationCache(5 * MINUTE, 20000, 24 * HOUR)
+    get_buckets(cache, logs, NOW - 24 * HOUR, NOW)
+    assert 0 < cache.stats()["bytes"] <= 20000
+    assert cache.stats()["evictions"] > 0
+    assert get_buckets(cache, logs, NOW - 24 * HOUR, NOW) == logs.count(NOW - 24 * HOUR, NOW)
+
+
+def test_segments_larger_than_the_memory_budget_are_not_stored():
+    logs = FakeLogs()
+    cache = AggregationCache(5 * MINUTE, 100, 24 * HOUR)
+    get_buckets(cache, logs, NOW - 24 * HOUR, NOW)
+    assert cache.stats()["entries"] == 0
+
+
+def test_segments_which_leave_the_horizon_are_dropped(monkeypatch):
+    logs = FakeLogs()
+    cache = AggregationCache(5 * MINUTE, 1 << 30, 24 * HOUR)
+    get_buckets(cache, logs, NOW - 24 * HOUR, NOW - 12 * HOUR - 1)
+    monkeypatch.setattr(aggregation_cache.time, "time", lambda: (NOW + 12 * HOUR) / 1000)
+    get_buckets(cache, logs, NOW + 11 * HOUR, NOW + 12 * HOUR)
+    assert all(segment_start >= NOW - 12 * HOUR for _, segment_start in cache.entries)
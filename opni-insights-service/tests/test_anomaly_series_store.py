@@ -0,0 +1,79 @@
+# Standard Library
+import asyncio
+import random
+
+# Third Party
+import anomaly_series_store
+import pytest
+from anomaly_series_store import MinuteSeriesStore
+
+MINUTE = 60000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+NOW = 444445 * HOUR
+
+
+class FakeAnomalies:
+    # Anomalies at random timestamps of the last two days, counted per minute like a date_histogram aggregation.
+    def __init__(self, count=5000, seed=0):
+        generator = random.Random(seed)
+        self.timestamps = [NOW - generator.randrange(2 * DAY) for _ in range(count)]
+        self.fetches = []
+
+    def count(self, gte, lte):
+        minute_counts = dict()
+        for timestamp in self.timestamps:
+            if gte <= timestamp <= lte:
+                minute_counts[timestamp // MINUTE * MINUTE] = minute_counts.get(timestamp // MINUTE * MINUTE, 0) + 1
+        return minute_counts
+
+    async def fetch_minute_counts(self, gte, lte):
+        self.fetches.append((gte, lte))
+        return self.count(gte, lte)
+
+
+@pytest.fixture(autouse=True)
+def fixed_time(monkeypatch):
+    monkeypatch.setattr(anomaly_series_store.time, "time", lambda: NOW / 1000)
+
+
+def get_series(store, anomalies, start_ts, end_ts, max_fetch_minutes=10000):
+    return asyncio.run(store.get_series(start_ts, end_ts, anomalies.fetch_minute_counts, max_fetch_minutes))
+
+
+def test_series_matches_a_single_aggregation():
+    store = MinuteSeriesStore(5 * MINUTE, 7 * DAY)
+    anomalies = FakeAnomalies()
+    for start_ts, end_ts in [(NOW - 6 * HOUR + 1234, NOW), (NOW - 2 * DAY, NOW - HOUR - 1), (NOW - 7 * HOUR - 5, NOW - 61)]:
+        # Repeated requests answer the settled minutes from the store.
+        for _ in range(2):
+            minute_starts, minute_counts = get_series(store, anomalies, start_ts, end_ts)
+            expected = anomalies.count(start_ts, end_ts)
+            assert dict(zip(minute_starts[minute_counts > 0].tolist(), minute_counts[minute_counts > 0].tolist())) == expected
+            assert minute_starts[0] == min(expected) and minute_starts[-1] == max(expected)
+
+
+def test_ranges_before_the_retention_horizon_are_rejected_before_fetching():
+    store = MinuteSeriesStore(5 * MINUTE, 7 * DAY)
+    anomalies = FakeAnomalies()
+    assert not store.covers(0)
+    with pytest.raises(ValueError):
+        get_series(store, anomalies, 0, NOW)
+    assert anomalies.fetches == []
+
+
+def test_the_range_is_cut_off_at_the_present():
+    store = MinuteSeriesStore(5 * MINUTE, 7 * DAY)
+    anomalies = FakeAnomalies()
+    minute_starts, _ = get_series(store, anomalies, NOW - HOUR, NOW + 365 * DAY)
+    assert minute_starts[-1] <= NOW
+    assert max(lte for _, lte in anomalies.fetches) == NOW
+    assert get_series(store, anomalies, NOW + DAY, NOW + 2 * DAY)[0].size == 0
+
+
+def test_missing_minutes_are_fetched_in_chunks_of_at_most_max_fetch_minutes():
+    store = MinuteSeriesStore(5 * MINUTE, 7 * DAY)
+    anomalies = FakeAnomalies()
+    get_series(store, anomalies, NOW - 2 * DAY, NOW, max_fetch_minutes=100)
+    assert len(anomalies.fetches) > 1
+    assert all(lte - gte < 100 * MINUTE for gte, lte in anomalies.fetches)
@@ -0,0 +1,86 @@
+# Third Party
+import numpy as np
+import pytest
+from endpoint_functions import AOI_MINUTES_THRESHOLD, MILLISECONDS_MINUTE, get_areas_of_interest_from_series
+from test_peak_detection import random_series
+
+START_TS = 1600000020000
+
+
+def reference_areas_of_interest(timestamps, anomaly_counts):
+    # The DataFrame loop get_areas_of_interest_from_series replaced, one row at a time. The rolling mean of the previous 60
+    # minutes is missing for the first 60 minutes, so they are never areas of interest. The old loop closed the final group only
+    # when the index label of a row equalled the number of area of interest rows minus one, which dropped it in most series;
+    # here the final group is closed at the last area of interest row, which is the intended behaviour.
+    aoi_rows = [
+        (index, timestamps[index])
+        for index in range(60, len(anomaly_counts))
+        if anomaly_counts[index] > sum(anomaly_counts[index - 60 : index]) / 60 * 1.3
+    ]
+    areas_of_interest = []
+    current_aoi_start = prev_segment_start = aoi_start_ts = -1
+    current_interval_areas = []
+    for position, (index, key) in enumerate(aoi_rows):
+        if current_aoi_start == -1:
+            current_aoi_start = aoi_start_ts = key
+        if position > 0 and key - aoi_rows[position - 1][1] != MILLISECONDS_MINUTE:
+            current_interval_areas.append({"start_ts": current_aoi_start, "end_ts": prev_segment_start + MILLISECONDS_MINUTE})
+            if key - prev_segment_start > (AOI_MINUTES_THRESHOLD + 1) * MILLISECONDS_MINUTE:
+                areas_of_interest.append({"start_ts": aoi_start_ts, "end_ts": prev_segment_start + MILLISECONDS_MINUTE, "areas_of_interest": current_interval_areas})
+                aoi_start_ts = key
+                current_interval_areas = []
+            current_aoi_start = key
+        prev_segment_start = key
+        if position == len(aoi_rows) - 1:
+            current_interval_areas.append({"start_ts": current_aoi_start, "end_ts": prev_segment_start + MILLISECONDS_MINUTE})
+            areas_of_interest.append({"start_ts": aoi_start_ts, "end_ts": prev_segment_start + MILLISECONDS_MINUTE, "areas_of_interest": current_interval_areas})
+    return areas_of_interest
+
+
+def minute_timestamps(length):
+    return START_TS + np.arange(length, dtype=np.int64) * MILLISECONDS_MINUTE
+
+
+def minute(offset):
+    return START_TS + offset * MILLISECONDS_MINUTE
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_areas_of_interest_match_the_reference_implementation(seed):
+    # get_areas_of_interest halves the anomaly counts before segmenting them.
+    anomaly_counts = random_series(seed, length=1500) / 2
+    timestamps = minute_timestamps(len(anomaly_counts))
+    assert get_areas_of_interest_from_series(timestamps, anomaly_counts) == reference_areas_of_interest(timestamps, anomaly_counts.tolist())
+
+
+def test_bursts_within_the_threshold_are_grouped():
+    anomaly_counts = np.full(200, 10.0)
+    anomaly_counts[[100, 101, 102]] = 50
+    anomaly_counts[102 + AOI_MINUTES_THRESHOLD] = 50
+    anomaly_counts[150] = 50
+    timestamps = minute_timestamps(len(anomaly_counts))
+    assert get_areas_of_interest_from_series(timestamps, anomaly_counts) == [
+        {
+            "start_ts": minute(100),
+            "end_ts": minute(103 + AOI_MINUTES_THRESHOLD),
+            "areas_of_interest": [
+                {"start_ts": minute(100), "end_ts": minute(103)},
+                {"start_ts": minute(102 + AOI_MINUTES_THRESHOLD), "end_ts": minute(103 + AOI_MINUTES_THRESHOLD)},
+            ],
+        },
+        {"start_ts": minute(150), "end_ts": minute(151), "areas_of_interest": [{"start_ts": minute(150), "end_ts": minute(151)}]},
+    ]
+
+
+def test_an_area_of_interest_at_the_end_of_the_range_is_closed():
+    anomaly_counts = np.full(100, 10.0)
+    anomaly_counts[97:] = 50
+    timestamps = minute_timestamps(len(anomaly_counts))
+    assert get_areas_of_interest_from_series(timestamps, anomaly_counts) == [
+        {"start_ts": minute(97), "end_ts": minute(100), "areas_of_interest": [{"start_ts": minute(97), "end_ts": minute(100)}]}
+    ]
+
+
+@pytest.mark.parametrize("anomaly_counts", [np.zeros(0), np.full(60, 10.0), np.full(500, 10.0), np.zeros(500)])
+def test_series_without_areas_of_interest(anomaly_counts):
+    assert get_areas_of_interest_from_series(minute_timestamps(len(anomaly_counts)), anomaly_counts) == []
@@ -0,0 +1,82 @@
+# Standard Library
+import asyncio
+import gzip
+import zlib
+
+# Third Party
+import brotli
+import pytest
+from compression_middleware import CompressionMiddleware, choose_encoding
+
+BODY = b'{"Insights": [' + b",".join(b'{"time_start": %d, "Normal": 5, "Suspicious": 0, "Anomaly": 1}' % index for index in range(200)) + b"]}"
+
+
+def body_app(chunks, media_type="application/json", headers=()):
+    # ASGI app which sends chunks as the body of its response, with a Content-Length if it is a single chunk.
+    async def app(scope, receive, send):
+        response_headers = [(b"content-type", media_type.encode())] + list(headers)
+        if len(chunks) == 1:
+            response_headers.append((b"content-length", str(len(chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    return app
+
+
+def send_request(app, accept_encoding="gzip, br", **middleware_settings):
+    # Send a request through CompressionMiddleware and return the response headers and the body chunks it sent.
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, **middleware_settings)(scope, receive, send))
+    headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return headers, [message["body"] for message in messages[1:]]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,encoding",
+    [("gzip, br", "br"), ("gzip", "gzip"), ("br;q=0.5, gzip", "gzip"), ("*", "br"), ("br;q=0, gzip;q=0", None), ("identity", None), ("", None)],
+)
+def test_the_encoding_preferred_by_the_client_is_chosen(accept_encoding, encoding):
+    assert choose_encoding(accept_encoding) == encoding
+
+
+@pytest.mark.parametrize("accept_encoding,decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_responses_are_compressed(accept_encoding, decompress):
+    headers, chunks = send_request(body_app([BODY]), accept_encoding)
+    assert headers["content-encoding"] == accept_encoding
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(chunks[0]) < len(BODY)
+    assert decompress(chunks[0]) == BODY
+
+
+@pytest.mark.parametrize(
+    "body,media_type,headers",
+    [
+        (BODY[:100], "application/json", []),
+        (BODY, "application/gzip", []),
+        (BODY, "application/json", [(b"content-encoding", b"identity")]),
+    ],
+)
+def test_small_and_already_compressed_responses_are_sent_unchanged(body, media_type, headers):
+    response_headers, chunks = send_request(body_app([body], media_type, headers))
+    assert response_headers.get("content-encoding", "identity") == "identity"
+    assert chunks == [body]
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk():
+    body_chunks = [BODY[index : index + 1000] for index in range(0, len(BODY), 1000)]
+    headers, chunks = send_request(body_app(body_chunks), "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert len(chunks) == len(body_chunks)
+    # Every chunk is flushed, so the body received so far can be decompressed before the response ends.
+    assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(chunks[0]) == body_chunks[0]
+    assert gzip.decompress(b"".join(chunks)) == BODY
@@ -0,0 +1,90 @@
+# Standard Library
+import asyncio
+
+# Third Party
+import index_router
+import pytest
+from index_router import IndexRouter
+
+HOUR = 3600000
+DAY = 24 * HOUR
+NOW = 20000 * DAY
+
+
+class FakeElasticsearch:
+    # Daily indices with the earliest and latest timestamp of their logs, recording the indices whose time range is searched.
+    def __init__(self, index_ranges, failing_indices=()):
+        self.index_ranges = dict(index_ranges)
+        self.failing_indices = set(failing_indices)
+        self.searched_indices = []
+
+    async def field_caps(self, index, fields):
+        return {"indices": sorted(self.index_ranges), "fields": {}}
+
+    async def msearch(self, body):
+        responses = []
+        for header in body[::2]:
+            self.searched_indices.append(header["index"])
+            if header["index"] in self.failing_indices:
+                responses.append({"error": {"type": "index_not_found_exception"}, "status": 404})
+                continue
+            first_log, last_log = self.index_ranges[header["index"]] or (None, None)
+            responses.append({"aggregations": {"first_log": {"value": first_log}, "last_log": {"value": last_log}}})
+        return {"responses": responses}
+
+
+def daily_indices(days):
+    return {f"logs-{day:05d}": ((NOW // DAY - days + day) * DAY, (NOW // DAY - days + day + 1) * DAY - 1) for day in range(days)}
+
+
+@pytest.fixture(autouse=True)
+def fixed_time(monkeypatch):
+    monkeypatch.setattr(index_router.time, "time", lambda: NOW / 1000)
+
+
+def refreshed_router(client, **kwargs):
+    router = IndexRouter("logs-*", HOUR, **kwargs)
+    asyncio.run(router.refresh(client))
+    return router
+
+
+def test_ranges_which_ended_are_sent_to_the_overlapping_indices():
+    router = refreshed_router(FakeElasticsearch(daily_indices(30)))
+    assert router.resolve(NOW - 10 * DAY, NOW - 9 * DAY - 1) == "logs-00020"
+    assert router.resolve(NOW - 10 * DAY + HOUR, NOW - 7 * DAY - HOUR) == "logs-00020,logs-00021,logs-00022"
+
+
+def test_recent_ranges_exclude_the_indices_outside_of_them():
+    router = refreshed_router(FakeElasticsearch(daily_indices(5)))
+    assert router.resolve(NOW - 2 * DAY, NOW) == "logs-*,-logs-00000,-logs-00001,-logs-00002"
+
+
+def test_index_expressions_are_kept_within_the_request_line():
+    router = refreshed_router(FakeElasticsearch(daily_indices(1000)), max_expression_length=200)
+    assert router.resolve(NOW - 2 * DAY, NOW) == "logs-*"
+    # Too many indices overlap the range to list them, but few enough are outside of it to exclude them.
+    assert router.resolve(0, NOW - 2 * DAY) == "logs-*,-logs-00999"
+    assert router.resolve(NOW - 10 * DAY, NOW - 9 * DAY - 1) == "logs-00990"
+
+
+def test_ranges_without_logs_are_sent_to_a_single_index():
+    router = refreshed_router(FakeElasticsearch(daily_indices(5)))
+    assert router.resolve(0, HOUR) == "logs-00004"
+
+
+def test_only_new_empty_and_active_indices_are_refreshed():
+    client = FakeElasticsearch(dict(daily_indices(5), **{"logs-empty": None}))
+    router = refreshed_router(client)
+    client.searched_indices.clear()
+    del client.index_ranges["logs-00000"]
+    client.index_ranges["logs-00005"] = (NOW, NOW)
+    asyncio.run(router.refresh(client))
+    assert sorted(client.searched_indices) == ["logs-00004", "logs-00005", "logs-empty"]
+    assert "logs-00000" not in router.index_ranges and "logs-00005" in router.index_ranges
+
+
+def test_indices_without_a_known_time_range_are_never_left_out():
+    client = FakeElasticsearch(daily_indices(5), failing_indices={"logs-00002"})
+    router = refreshed_router(client)
+    assert router.resolve(NOW - 4 * DAY, NOW - 4 * DAY + HOUR) == "logs-*,-logs-00000,-logs-00003,-logs-00004"
+    assert router.resolve(0, HOUR) == "logs-*,-logs-00000,-logs-00001,-logs-00003,-logs-00004"
@@ -0,0 +1,85 @@
+# Standard Library
+import asyncio
+import copy
+
+# Third Party
+import main
+import numpy as np
+import pytest
+from endpoint_functions import select_insights_breakdown
+from fastapi import HTTPException
+
+ANOMALY_LEVELS = ["Normal", "Suspicious", "Anomaly"]
+
+
+def insights_breakdown(seed, pod_count=200):
+    # Breakdown with few distinct counts, so many entries are tied on the level they are sorted by.
+    generator = np.random.default_rng(seed)
+
+    def insights():
+        return dict(zip(ANOMALY_LEVELS, generator.integers(0, 5, 3).tolist()))
+
+    return {
+        "Pods": [{"Name": f"pod-{index}", "Namespace": f"ns-{index % 4}", "Insights": insights()} for index in range(pod_count)],
+        "Workloads": {
+            "Deployment": [{"Name": f"web-{index}", "Namespace": f"ns-{index % 4}", "Insights": insights()} for index in range(pod_count // 4)],
+            "Job": [],
+        },
+        "Namespaces": [{"Name": f"ns-{index}", "Insights": insights()} for index in range(4)],
+        "Control Plane": {"Components": [{"Name": f"component-{index}", "Insights": insights()} for index in range(6)]},
+    }
+
+
+def sorted_page(entries, sort_by, offset, limit):
+    return sorted(entries, key=lambda entry: entry["Insights"][sort_by], reverse=True)[offset : offset + limit]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("sort_by", ANOMALY_LEVELS)
+@pytest.mark.parametrize("offset,limit", [(0, 10), (7, 25), (190, 50), (0, 0)])
+def test_pages_picked_with_a_heap_match_sorting_everything(seed, sort_by, offset, limit):
+    breakdown = insights_breakdown(seed)
+    selected = select_insights_breakdown(breakdown, sort_by=sort_by, offset=offset, limit=limit)
+    assert selected["Pods"] == sorted_page(breakdown["Pods"], sort_by, offset, limit)
+    assert selected["Workloads"]["Deployment"] == sorted_page(breakdown["Workloads"]["Deployment"], sort_by, offset, limit)
+    assert selected["Namespaces"] == sorted_page(breakdown["Namespaces"], sort_by, offset, limit)
+    # Control plane components are sorted but never paged.
+    assert selected["Control Plane"]["Components"] == sorted_page(breakdown["Control Plane"]["Components"], sort_by, 0, 6)
+
+
+def test_namespace_filter_applies_to_pods_workloads_and_namespaces():
+    breakdown = insights_breakdown(0)
+    original_breakdown = copy.deepcopy(breakdown)
+    selected = select_insights_breakdown(breakdown, namespace_names=["ns-1", "ns-3"], sort_by="Anomaly", limit=20)
+    assert {pod["Namespace"] for pod in selected["Pods"]} == {"ns-1", "ns-3"}
+    assert {workload["Namespace"] for workload in selected["Workloads"]["Deployment"]} == {"ns-1", "ns-3"}
+    assert {namespace["Name"] for namespace in selected["Namespaces"]} == {"ns-1", "ns-3"}
+    assert len(selected["Control Plane"]["Components"]) == 6
+    # Totals count the entries left after filtering, before paging.
+    assert selected["Total"] == {"Pods": 100, "Workloads": {"Deployment": 25, "Job": 0}, "Namespaces": 2}
+    assert breakdown == original_breakdown
+
+
+@pytest.mark.parametrize("offset,limit,expected_names", [(-5, 2, ["pod-0", "pod-1"]), (3, -1, []), (199, 10, ["pod-199"]), (500, 10, [])])
+def test_offset_and_limit_are_clamped(offset, limit, expected_names):
+    selected = select_insights_breakdown(insights_breakdown(0), offset=offset, limit=limit)
+    assert [pod["Name"] for pod in selected["Pods"]] == expected_names
+    assert selected["Total"]["Pods"] == 200
+
+
+def test_unpaged_selection_has_no_total():
+    breakdown = insights_breakdown(0)
+    assert select_insights_breakdown(breakdown) == breakdown
+
+
+def test_an_unknown_sort_by_is_rejected(monkeypatch):
+    with pytest.raises(ValueError):
+        select_insights_breakdown(insights_breakdown(0), sort_by="Critical")
+
+    async def get_insights_breakdown(start_ts, end_ts):
+        raise AssertionError("The breakdown is not fetched for an invalid request.")
+
+    monkeypatch.setattr(main, "get_insights_breakdown", get_insights_breakdown)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.index_breakdown(0, 1, sort_by="Critical"))
+    assert error.value.status_code == 400
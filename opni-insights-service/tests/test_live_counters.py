@@ -0,0 +1,216 @@
+# Standard Library
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+# Third Party
+import endpoint_functions
+import numpy as np
+import pytest
+from endpoint_functions import get_overall_breakdown, parse_interval_ms
+from live_counters import KeyedRing, LiveCounters, parse_inferred_logs, subscribe_live_counters
+
+MINUTE = 60000
+NOW = 27000000 * MINUTE + 37123
+COUNTING_START = NOW - 25 * MINUTE + 4000
+ANOMALY_LEVELS = ["Normal", "Suspicious", "Anomaly"]
+
+
+class LocalNatsWrapper:
+    # Stand-in for NatsWrapper which delivers every message published through it to the handlers subscribed within the same process.
+    def __init__(self):
+        self.subscribe_handlers = dict()
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def subscribe(self, nats_subject, payload_queue=None, nats_queue="", subscribe_handler=None):
+        self.subscribe_handlers.setdefault(nats_subject, []).append(subscribe_handler)
+
+    async def publish(self, nats_subject, payload):
+        msg = SimpleNamespace(subject=nats_subject, reply="", data=payload if isinstance(payload, bytes) else payload.encode())
+        for subscribe_handler in self.subscribe_handlers.get(nats_subject, []):
+            await subscribe_handler(msg)
+
+
+class FakeElasticsearch:
+    # Answers the date histogram of the overall breakdown over the indexed logs, recording the time range of every search.
+    def __init__(self, logs):
+        self.logs = logs
+        self.searched_ranges = []
+
+    async def search(self, index, body, size=None, request_cache=None):
+        time_range = body["query"]["bool"]["filter"][0]["range"]["timestamp"]
+        self.searched_ranges.append((time_range["gte"], time_range["lte"]))
+        interval_ms = parse_interval_ms(body["aggs"]["granularity_results"]["date_histogram"]["fixed_interval"])
+        interval_counts = dict()
+        for log in self.logs:
+            if time_range["gte"] <= log["timestamp"] <= time_range["lte"]:
+                anomaly_level_counts = interval_counts.setdefault(log["timestamp"] // interval_ms * interval_ms, {})
+                anomaly_level_counts[log["anomaly_level"]] = anomaly_level_counts.get(log["anomaly_level"], 0) + 1
+        buckets = [
+            {
+                "key": interval_start,
+                "doc_count": sum(interval_counts.get(interval_start, {}).values()),
+                "anomaly_level": {"buckets": [{"key": key, "doc_count": count} for key, count in interval_counts.get(interval_start, {}).items()]},
+            }
+            for interval_start in (range(min(interval_counts), max(interval_counts) + interval_ms, interval_ms) if interval_counts else [])
+        ]
+        return {"aggregations": {"granularity_results": {"buckets": buckets}}}
+
+
+def make_logs(seed, count=3000):
+    # Inferred logs of the last 30 minutes of workload pods and control plane components.
+    generator = np.random.default_rng(seed)
+    logs = []
+    for timestamp in sorted(generator.integers(NOW - 30 * MINUTE, NOW + 1, count).tolist()):
+        log = {"timestamp": timestamp, "anomaly_level": ANOMALY_LEVELS[generator.integers(0, 3)], "is_control_plane_log": bool(generator.integers(0, 2))}
+        if log["is_control_plane_log"]:
+            log["kubernetes_component"] = f"component-{generator.integers(0, 3)}"
+        else:
+            log["kubernetes"] = {"namespace_name": f"ns-{generator.integers(0, 3)}", "pod_name": f"pod-{generator.integers(0, 5)}"}
+        logs.append(log)
+    return logs
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now_ms=NOW)
+    monkeypatch.setattr(time, "time", lambda: clock.now_ms / 1000)
+    return clock
+
+
+def publish_logs(logs, clock, counters, batch_size=50):
+    # Start counting at COUNTING_START and publish the logs since then in batches, each a little after its last log.
+    nats_wrapper = LocalNatsWrapper()
+
+    async def publish():
+        clock.now_ms = COUNTING_START
+        await subscribe_live_counters(nats_wrapper, counters, ["inferred_logs"])
+        published_logs = [log for log in logs if log["timestamp"] >= COUNTING_START]
+        for batch_start in range(0, len(published_logs), batch_size):
+            batch = published_logs[batch_start : batch_start + batch_size]
+            clock.now_ms = min(NOW, max(clock.now_ms, batch[-1]["timestamp"] + 1500))
+            await nats_wrapper.publish("inferred_logs", json.dumps(batch))
+        clock.now_ms = NOW
+
+    asyncio.run(publish())
+
+
+@pytest.mark.parametrize(
+    "start_ts,end_ts,granularity_level",
+    [
+        (COUNTING_START + MINUTE, NOW, "1m"),
+        (COUNTING_START + MINUTE + 17000, NOW - 5 * MINUTE - 12345, "1m"),
+        (NOW // MINUTE * MINUTE - 20 * MINUTE, NOW // MINUTE * MINUTE - MINUTE - 1, "1m"),
+        (COUNTING_START + MINUTE + 17000, NOW, "5m"),
+    ],
+)
+def test_overall_breakdown_from_live_counters_matches_elasticsearch(monkeypatch, clock, start_ts, end_ts, granularity_level):
+    logs = make_logs(0)
+    client = FakeElasticsearch(logs)
+    counters = LiveCounters(60)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    monkeypatch.setattr(endpoint_functions, "live_counters", counters)
+    monkeypatch.setattr(endpoint_functions, "AGGREGATION_CACHE_ENABLED", False)
+    publish_logs(logs, clock, counters)
+
+    live_breakdown = asyncio.run(get_overall_breakdown(start_ts, end_ts, granularity_level))
+    # Only the partial minutes at the edges of the range were fetched from Elasticsearch.
+    assert all(lte - gte < MINUTE for gte, lte in client.searched_ranges)
+    counters.stop()
+    assert live_breakdown == asyncio.run(get_overall_breakdown(start_ts, end_ts, granularity_level))
+    assert live_breakdown["Insights"]
+
+
+def test_ranges_starting_before_counting_started_are_left_to_elasticsearch(monkeypatch, clock):
+    logs = make_logs(1)
+    client = FakeElasticsearch(logs)
+    counters = LiveCounters(60)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    monkeypatch.setattr(endpoint_functions, "live_counters", counters)
+    monkeypatch.setattr(endpoint_functions, "AGGREGATION_CACHE_ENABLED", False)
+    publish_logs(logs, clock, counters)
+    asyncio.run(get_overall_breakdown(COUNTING_START, NOW, "1m"))
+    assert client.searched_ranges == [(COUNTING_START, NOW)]
+
+
+def test_minutes_leaving_the_ring_are_cleared_and_old_logs_dropped():
+    counters = LiveCounters(3)
+    now_ms = 100 * MINUTE
+    counters.record(now_ms - MINUTE, "Anomaly", "Workload", ("ns", "pod"), now_ms=now_ms)
+    counters.record(now_ms + 10, "Normal", "Workload", ("ns", "pod"), now_ms=now_ms + 10)
+    # The slot of the minute three minutes before the newest one is reused, and logs of that minute arriving late are dropped.
+    later_ms = now_ms + 2 * MINUTE
+    counters.record(later_ms, "Suspicious", "Workload", ("ns", "pod"), now_ms=later_ms)
+    counters.record(now_ms - MINUTE + 5, "Anomaly", "Workload", ("ns", "pod"), now_ms=later_ms)
+    counters.record(later_ms + MINUTE, "Anomaly", "Workload", ("ns", "pod"), now_ms=later_ms)
+    counters.record(later_ms, "Unknown", "Workload", ("ns", "pod"), now_ms=later_ms)
+    assert counters.overall_minute_buckets(now_ms - MINUTE, later_ms + MINUTE) == {now_ms: {"Normal": 1}, later_ms: {"Suspicious": 1}}
+    assert (counters.counted, counters.dropped) == (3, 3)
+
+
+def test_rows_of_keys_without_logs_are_reused():
+    ring = KeyedRing(2, initial_rows=2)
+    ring.add("a", 0, 0)
+    ring.add("b", 1, 2)
+    ring.clear(0)
+    ring.add("c", 0, 1)
+    assert len(ring.counts) == 2
+    assert ring.totals([0, 1]) == {"b": {"Normal": 0, "Suspicious": 0, "Anomaly": 1}, "c": {"Normal": 0, "Suspicious": 1, "Anomaly": 0}}
+    ring.add("d", 0, 0)
+    assert len(ring.counts) == 4
+
+
+def test_insights_buckets_count_pods_and_components(clock):
+    counters = LiveCounters(60)
+    now_ms = clock.now_ms = 100 * MINUTE
+    counters.record_payload(
+        json.dumps(
+            [
+                {"timestamp": now_ms - 30000, "anomaly_level": "Anomaly", "is_control_plane_log": False, "kubernetes": {"namespace_name": "ns", "pod_name": "pod"}},
+                {"_source": {"timestamp": now_ms - 20000, "anomaly_level": "Normal", "is_control_plane_log": "false", "kubernetes.namespace_name": "ns", "kubernetes.pod_name": "pod"}},
+                {"timestamp": now_ms - 10000, "anomaly_level": "Suspicious", "is_control_plane_log": True, "kubernetes_component": "kubelet"},
+                {"anomaly_level": "Normal"},
+            ]
+        )
+    )
+    assert counters.insights_buckets(now_ms - MINUTE, now_ms) == {
+        now_ms - MINUTE: {
+            "Pods": {("ns", "pod"): {"Normal": 1, "Suspicious": 0, "Anomaly": 1}},
+            "Components": {"kubelet": {"Normal": 0, "Suspicious": 1, "Anomaly": 0}},
+        }
+    }
+    assert counters.anomalies_minute_buckets(now_ms - MINUTE, now_ms) == {now_ms - MINUTE: {"Workload": 1}}
+    assert counters.dropped == 1
+
+
+@pytest.mark.parametrize(
+    "payload,expected_logs",
+    [
+        ('[{"timestamp": 1}, {"_source": {"timestamp": 2}}, 3]', [{"timestamp": 1}, {"timestamp": 2}]),
+        ('{"_id": "a", "_source": {"timestamp": 1}}', [{"timestamp": 1}]),
+        ('{"timestamp": {"0": 1, "1": 2}, "anomaly_level": {"0": "Normal", "1": "Anomaly"}}', [{"timestamp": 1, "anomaly_level": "Normal"}, {"timestamp": 2, "anomaly_level": "Anomaly"}]),
+        ("3", []),
+    ],
+)
+def test_inferred_logs_are_parsed_from_every_payload_format(payload, expected_logs):
+    assert parse_inferred_logs(payload) == expected_logs
+
+
+def test_a_payload_which_cannot_be_counted_does_not_stop_counting(clock):
+    counters = LiveCounters(60)
+    nats_wrapper = LocalNatsWrapper()
+
+    async def publish():
+        await subscribe_live_counters(nats_wrapper, counters, ["inferred_logs"])
+        await nats_wrapper.publish("inferred_logs", "not json")
+        await nats_wrapper.publish("inferred_logs", json.dumps({"timestamp": NOW, "anomaly_level": "Normal"}))
+
+    asyncio.run(publish())
+    assert counters.counted == 1
+    assert counters.covered_start(NOW) == (NOW // MINUTE + 1) * MINUTE
@@ -0,0 +1,79 @@
+# Standard Library
+import asyncio
+import json
+
+# Third Party
+import endpoint_functions
+import pytest
+from elasticsearch.exceptions import ConnectionError
+from endpoint_functions import export_logs, get_logs_query_body, validate_logs_query_parameters
+
+
+class FakeElasticsearch:
+    # Returns pages of logs from a point in time reader and fails the search of page number fail_at_page.
+    def __init__(self, log_count, fail_at_page=None):
+        self.logs = [{"timestamp": timestamp, "log": f"log {timestamp}"} for timestamp in range(log_count)]
+        self.fail_at_page = fail_at_page
+        self.pages = 0
+        self.closed = False
+
+    async def open_point_in_time(self, index, keep_alive):
+        return {"id": "pit"}
+
+    async def search(self, body, size):
+        self.pages += 1
+        if self.pages == self.fail_at_page:
+            raise ConnectionError("N/A", "connection reset", None)
+        search_after = body.get("search_after", [-1])[0]
+        logs = [log for log in self.logs if log["timestamp"] > search_after][:size]
+        return {"hits": {"hits": [{"_source": log, "sort": [log["timestamp"]]} for log in logs]}}
+
+    async def close_point_in_time(self, body):
+        self.closed = True
+
+
+def collect(chunks):
+    async def collect_all():
+        return b"".join([chunk async for chunk in chunks])
+
+    return asyncio.run(collect_all())
+
+
+@pytest.mark.parametrize(
+    "query_parameters",
+    [
+        {"type": "everything", "anomaly_level": "Anomaly"},
+        {"anomaly_level": "Anomaly"},
+        {"type": "pod", "anomaly_level": "Anomaly", "namespace_name": "default"},
+        {"type": "workload", "anomaly_level": "Anomaly", "namespace_name": "default", "workload_type": "Deployment", "workload_name": None},
+        {"type": "control_plane", "control_plane_component": "etcd"},
+    ],
+)
+def test_unknown_types_and_missing_parameters_are_reported(query_parameters):
+    assert validate_logs_query_parameters(query_parameters)
+
+
+def test_complete_parameters_are_valid():
+    assert validate_logs_query_parameters({"type": "namespace", "anomaly_level": "Anomaly", "namespace_name": "default"}) is None
+
+
+def test_no_query_is_built_for_an_unknown_type():
+    assert get_logs_query_body(0, 1, {"type": "everything", "anomaly_level": "Anomaly"}) is None
+
+
+def test_every_log_is_exported(monkeypatch):
+    client = FakeElasticsearch(2 * endpoint_functions.LOGS_EXPORT_PAGE_SIZE + 5)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    query_body = get_logs_query_body(0, 100, {"type": "namespace", "anomaly_level": "Anomaly", "namespace_name": "default"})
+    exported_logs = [json.loads(line) for line in collect(export_logs(0, 100, query_body)).splitlines()]
+    assert exported_logs == client.logs
+    assert client.closed
+
+
+def test_an_error_while_streaming_aborts_the_export(monkeypatch):
+    client = FakeElasticsearch(2 * endpoint_functions.LOGS_EXPORT_PAGE_SIZE + 5, fail_at_page=2)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    query_body = get_logs_query_body(0, 100, {"type": "namespace", "anomaly_level": "Anomaly", "namespace_name": "default"})
+    with pytest.raises(ConnectionError):
+        collect(export_logs(0, 100, query_body, compress=True))
+    assert client.closed
@@ -0,0 +1,114 @@
+# Standard Library
+import asyncio
+import base64
+import json
+
+# Third Party
+import endpoint_functions
+import main
+import pytest
+from elasticsearch.exceptions import ConnectionError
+from endpoint_functions import InvalidLogsCursor, decode_logs_cursor, encode_logs_cursor, get_logs
+from fastapi import HTTPException
+
+QUERY_PARAMETERS = {"type": "namespace", "anomaly_level": "Anomaly", "namespace_name": "default"}
+
+
+class FakeElasticsearch:
+    # Pages through logs with search_after from point in time readers, recording every search and the readers which are open.
+    def __init__(self, log_count, fail_search=False):
+        self.logs = [{"timestamp": timestamp, "log": f"log {timestamp}"} for timestamp in range(log_count)]
+        self.fail_search = fail_search
+        self.searched_bodies = []
+        self.open_pits = set()
+        self.opened = 0
+
+    async def open_point_in_time(self, index, keep_alive):
+        self.opened += 1
+        self.open_pits.add(f"pit-{self.opened}")
+        return {"id": f"pit-{self.opened}"}
+
+    async def search(self, body, size):
+        self.searched_bodies.append(body)
+        if self.fail_search:
+            raise ConnectionError("N/A", "connection reset", None)
+        assert body["pit"]["id"] in self.open_pits
+        search_after = body.get("search_after", [-1])[0]
+        matching_logs = [log for log in self.logs if log["timestamp"] > search_after]
+        hits = {"hits": [{"_source": log, "sort": [log["timestamp"]]} for log in matching_logs[:size]]}
+        if body["track_total_hits"]:
+            hits["total"] = {"value": len(self.logs), "relation": "eq"}
+        # Elasticsearch may hand back a new id for the point in time with every page.
+        return {"hits": hits, "pit_id": body["pit"]["id"]}
+
+    async def close_point_in_time(self, body):
+        self.open_pits.remove(body["id"])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeElasticsearch(25)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    return client
+
+
+def test_logs_are_paged_from_a_point_in_time(client):
+    first_page = asyncio.run(get_logs(0, 100, QUERY_PARAMETERS, None, 10))
+    assert first_page["Logs"] == client.logs[:10]
+    assert first_page["total_logs_count"] == 25
+    assert client.open_pits == {"pit-1"}
+    assert decode_logs_cursor(first_page["cursor"])["total_logs_count"] == 25
+
+    second_page = asyncio.run(get_logs(0, 100, QUERY_PARAMETERS, first_page["cursor"], 10))
+    assert second_page["Logs"] == client.logs[10:20]
+    assert client.searched_bodies[-1]["search_after"] == [9]
+    assert client.searched_bodies[-1]["pit"]["id"] == "pit-1"
+    assert client.searched_bodies[-1]["track_total_hits"] is False
+    # The total is carried within the cursor instead of being counted again.
+    assert second_page["total_logs_count"] == 25
+
+    last_page = asyncio.run(get_logs(0, 100, QUERY_PARAMETERS, second_page["cursor"], 10))
+    assert last_page["Logs"] == client.logs[20:]
+    assert last_page["cursor"] is None
+    assert not client.open_pits
+
+
+def tampered(cursor):
+    payload, signature = cursor.split(".")
+    cursor_state = json.loads(base64.urlsafe_b64decode(payload))
+    cursor_state["search_after"] = [0]
+    return base64.urlsafe_b64encode(json.dumps(cursor_state).encode()).decode() + "." + signature
+
+
+@pytest.mark.parametrize(
+    "make_cursor,query_parameters",
+    [
+        (tampered, QUERY_PARAMETERS),
+        (lambda cursor: cursor, dict(QUERY_PARAMETERS, namespace_name="kube-system")),
+        (lambda cursor: "FGluY2x1ZGVfY29udGV4dF91dWlkDXF1ZXJ5QW5kRmV0Y2gBFkxWV3U2M2RwUU5P", QUERY_PARAMETERS),
+        (lambda cursor: "not.a-cursor", QUERY_PARAMETERS),
+    ],
+)
+def test_cursors_which_were_not_handed_out_for_the_query_are_rejected(client, make_cursor, query_parameters):
+    first_page = asyncio.run(get_logs(0, 100, QUERY_PARAMETERS, None, 10))
+    cursor = make_cursor(first_page["cursor"])
+    with pytest.raises(InvalidLogsCursor):
+        asyncio.run(get_logs(0, 100, query_parameters, cursor, 10))
+    assert len(client.searched_bodies) == 1
+
+
+def test_an_invalid_cursor_is_a_bad_request(client):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.index_logs_namespace(0, 100, "Anomaly", "default", cursor=encode_logs_cursor({"signature": "other"})))
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.index_logs_pod(0, 100, "Anomaly", "pod", "default", scroll_id="FGluY2x1ZGVfY29udGV4dF91dWlk"))
+    assert error.value.status_code == 400
+
+
+def test_the_point_in_time_of_a_failed_first_page_is_closed(monkeypatch):
+    client = FakeElasticsearch(25, fail_search=True)
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    assert asyncio.run(get_logs(0, 100, QUERY_PARAMETERS, None, 10)) == {"Logs": []}
+    assert client.opened == 1
+    assert not client.open_pits
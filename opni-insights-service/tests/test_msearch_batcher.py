@@ -0,0 +1,102 @@
+# Standard Library
+import asyncio
+
+# Third Party
+from elasticsearch.exceptions import TransportError
+from msearch_batcher import MsearchBatcher
+
+
+class FakeElasticsearch:
+    # Answers every search with its own body and fails the searches of failing_indices, recording each request it receives.
+    def __init__(self, failing_indices=()):
+        self.failing_indices = set(failing_indices)
+        self.requests = []
+
+    def respond(self, index, body):
+        if index in self.failing_indices:
+            return {"error": {"type": "search_phase_execution_exception"}, "status": 400}
+        return {"index": index, "body": body}
+
+    async def search(self, index=None, body=None, **kwargs):
+        self.requests.append(("search", index, body, kwargs))
+        response = self.respond(index, body)
+        if "error" in response:
+            raise TransportError(response["status"], response["error"]["type"])
+        return response
+
+    async def msearch(self, body):
+        self.requests.append(("msearch", None, body, {}))
+        return {"responses": [self.respond(header["index"], search_body) for header, search_body in zip(body[::2], body[1::2])]}
+
+    async def close_point_in_time(self, body):
+        self.requests.append(("close_point_in_time", None, body, {}))
+
+
+def run_searches(batcher, searches):
+    async def search_all():
+        return await asyncio.gather(*(batcher.search(**search) for search in searches), return_exceptions=True)
+
+    return asyncio.run(search_all())
+
+
+def test_concurrent_searches_are_sent_as_one_msearch():
+    client = FakeElasticsearch()
+    batcher = MsearchBatcher(client, window_ms=5)
+    responses = run_searches(batcher, [{"index": "logs", "body": {"query": {"term": {"n": n}}}, "size": 0} for n in range(5)])
+    assert [request[0] for request in client.requests] == ["msearch"]
+    assert [response["body"]["query"]["term"]["n"] for response in responses] == list(range(5))
+    assert all(response["body"]["size"] == 0 for response in responses)
+    assert batcher.stats() == {"batches": 1, "searches": 5}
+
+
+def test_batches_are_sent_once_max_searches_are_waiting():
+    client = FakeElasticsearch()
+    batcher = MsearchBatcher(client, window_ms=1000, max_searches=2)
+    responses = run_searches(batcher, [{"index": "logs", "body": {"n": n}} for n in range(4)])
+    assert [request[0] for request in client.requests] == ["msearch", "msearch"]
+    assert [response["body"]["n"] for response in responses] == list(range(4))
+
+
+def test_an_error_only_fails_its_own_search():
+    client = FakeElasticsearch(failing_indices={"missing"})
+    batcher = MsearchBatcher(client, window_ms=5)
+    responses = run_searches(batcher, [{"index": "logs", "body": {}}, {"index": "missing", "body": {}}, {"index": "logs", "body": {}}])
+    assert isinstance(responses[1], TransportError)
+    assert responses[0]["index"] == responses[2]["index"] == "logs"
+
+
+def test_a_single_search_is_sent_as_a_search_with_its_request_cache():
+    client = FakeElasticsearch()
+    batcher = MsearchBatcher(client, window_ms=1)
+    run_searches(batcher, [{"index": "logs", "body": {}, "request_cache": True}])
+    assert client.requests == [("search", "logs", {}, {"request_cache": True})]
+
+
+def test_request_cache_is_sent_within_the_msearch_header():
+    client = FakeElasticsearch()
+    batcher = MsearchBatcher(client, window_ms=5)
+    run_searches(batcher, [{"index": "logs", "body": {}, "request_cache": True}, {"index": "logs", "body": {}}])
+    _, _, msearch_body, _ = client.requests[0]
+    assert msearch_body[0] == {"index": "logs", "request_cache": True}
+    assert msearch_body[2] == {"index": "logs"}
+
+
+def test_other_searches_and_methods_are_passed_through():
+    client = FakeElasticsearch()
+    batcher = MsearchBatcher(client, window_ms=5)
+    run_searches(batcher, [{"body": {"pit": {"id": "pit"}}, "size": 10}])
+    asyncio.run(batcher.close_point_in_time(body={"id": "pit"}))
+    assert [request[0] for request in client.requests] == ["search", "close_point_in_time"]
+    assert batcher.stats() == {"batches": 0, "searches": 0}
+
+
+def test_a_failed_msearch_fails_every_search():
+    client = FakeElasticsearch()
+
+    async def failing_msearch(body):
+        raise TransportError(503, "unavailable")
+
+    client.msearch = failing_msearch
+    batcher = MsearchBatcher(client, window_ms=5)
+    responses = run_searches(batcher, [{"index": "logs", "body": {}}, {"index": "logs", "body": {}}])
+    assert all(isinstance(response, TransportError) for response in responses)
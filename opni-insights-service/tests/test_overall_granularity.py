@@ -0,0 +1,60 @@
+# Third Party
+import endpoint_functions
+import pytest
+from endpoint_functions import choose_overall_granularity, overall_granularity_levels, parse_interval_ms
+
+MINUTE = 60000
+DAY = 1440 * MINUTE
+
+
+@pytest.fixture(autouse=True)
+def bucket_limits(monkeypatch):
+    monkeypatch.setattr(endpoint_functions, "OVERALL_MAX_BUCKETS", 1000)
+    monkeypatch.setattr(endpoint_functions, "OVERALL_AUTO_BUCKETS", 100)
+
+
+def bucket_count(start_ts, end_ts, granularity_level):
+    return (end_ts - start_ts) // parse_interval_ms(granularity_level) + 1
+
+
+@pytest.mark.parametrize(
+    "granularity_level,range_ms,expected_level",
+    [("1s", DAY, "5m"), ("1m", DAY, "5m"), ("1s", 3 * MINUTE, "1s"), ("30s", 30 * DAY, "1h"), ("2m", 7 * DAY, "15m")],
+)
+def test_a_fine_interval_is_coarsened_to_the_first_level_which_fits(granularity_level, range_ms, expected_level):
+    start_ts = 1630000000000
+    chosen_level = choose_overall_granularity(start_ts, start_ts + range_ms, granularity_level)
+    assert chosen_level == expected_level
+    assert bucket_count(start_ts, start_ts + range_ms, chosen_level) <= 1000
+    # No finer level at least as coarse as the requested interval fits.
+    finer_levels = overall_granularity_levels[: overall_granularity_levels.index(chosen_level)]
+    assert all(
+        bucket_count(start_ts, start_ts + range_ms, level) > 1000 or parse_interval_ms(level) < parse_interval_ms(granularity_level) for level in finer_levels
+    )
+
+
+@pytest.mark.parametrize("granularity_level", ["10m", "1h", "7m", "1d"])
+def test_an_interval_which_fits_is_kept(granularity_level):
+    assert choose_overall_granularity(0, DAY, granularity_level) == granularity_level
+
+
+@pytest.mark.parametrize("range_ms,expected_level", [(DAY, "15m"), (MINUTE, "1s"), (30 * DAY, "12h"), (365 * DAY, "7d")])
+def test_auto_picks_the_finest_level_with_at_most_the_auto_bucket_count(range_ms, expected_level):
+    chosen_level = choose_overall_granularity(0, range_ms, "auto")
+    assert chosen_level == expected_level
+    assert bucket_count(0, range_ms, chosen_level) <= 100
+
+
+@pytest.mark.parametrize("granularity_level", ["1M", "1w", "fast", ""])
+def test_an_unparseable_interval_is_passed_on(granularity_level):
+    assert choose_overall_granularity(0, 365 * DAY, granularity_level) == granularity_level
+
+
+@pytest.mark.parametrize(
+    "granularity_level,range_ms,expected_level",
+    [("1m", 20000 * DAY, "21d"), ("1d", 7000 * DAY, "8d"), ("auto", 1000 * DAY, "11d")],
+)
+def test_very_long_ranges_fall_back_to_whole_days(granularity_level, range_ms, expected_level):
+    chosen_level = choose_overall_granularity(0, range_ms, granularity_level)
+    assert chosen_level == expected_level
+    assert bucket_count(0, range_ms, chosen_level) <= (100 if granularity_level == "auto" else 1000)
@@ -0,0 +1,89 @@
+# Standard Library
+import asyncio
+
+# Third Party
+import endpoint_functions
+import pytest
+from elasticsearch.exceptions import TransportError
+from endpoint_functions import get_partition_query_body, get_pod_breakdown, get_pod_query_body, iterate_partitioned_aggregated_data
+
+PARTITION_FIELD = "kubernetes.namespace_name.keyword"
+
+
+class FakeElasticsearch:
+    # Aggregates logs by namespace, pod and anomaly level within the partitions of a query, failing the partitions of failing_namespaces.
+    def __init__(self, logs, max_partitions, failing_namespaces=()):
+        self.logs = logs
+        self.max_partitions = max_partitions
+        self.failing_namespaces = set(failing_namespaces)
+
+    def in_partition(self, log, partition_filters):
+        for partition_filter in partition_filters:
+            if "term" in partition_filter and log.get("namespace_name") != partition_filter["term"][PARTITION_FIELD]:
+                return False
+            if "bool" in partition_filter and log.get("namespace_name") in partition_filter["bool"]["must_not"][0]["terms"][PARTITION_FIELD]:
+                return False
+        return True
+
+    def partitions(self):
+        namespace_counts = dict()
+        for log in self.logs:
+            if "namespace_name" in log:
+                namespace_counts[log["namespace_name"]] = namespace_counts.get(log["namespace_name"], 0) + 1
+        largest_namespaces = sorted(namespace_counts, key=lambda namespace_name: -namespace_counts[namespace_name])[: self.max_partitions]
+        return {"aggregations": {"partitions": {"buckets": [{"key": namespace_name} for namespace_name in largest_namespaces]}}}
+
+    async def search(self, index, body, request_cache=None):
+        await asyncio.sleep(0)
+        partition_filters = body["query"]["bool"]["filter"][1:]
+        if any(partition_filter.get("term", {}).get(PARTITION_FIELD) in self.failing_namespaces for partition_filter in partition_filters):
+            raise TransportError(500, "search_phase_execution_exception")
+        counts = dict()
+        for log in self.logs:
+            if self.in_partition(log, partition_filters):
+                key = (log.get("namespace_name", ""), log["pod_name"], log["anomaly_level"])
+                counts[key] = counts.get(key, 0) + 1
+        buckets = [
+            {"key": {"namespace_name": namespace_name, "pod_name": pod_name, "anomaly_level": anomaly_level}, "doc_count": count}
+            for (namespace_name, pod_name, anomaly_level), count in sorted(counts.items())
+        ]
+        return {"aggregations": {"bucket": {"buckets": buckets}}}
+
+
+def make_logs():
+    logs = []
+    for namespace_index in range(6):
+        for pod_index in range(namespace_index + 1):
+            for anomaly_level in ["Normal", "Anomaly"]:
+                logs.extend({"namespace_name": f"ns-{namespace_index}", "pod_name": f"pod-{pod_index}", "anomaly_level": anomaly_level} for _ in range(pod_index + 1))
+    return logs
+
+
+def get_partitioned_pod_breakdown(client):
+    pod_query_body = get_pod_query_body(0, 1)
+    assert get_partition_query_body(pod_query_body, PARTITION_FIELD)["aggs"]["partitions"]["terms"]["field"] == PARTITION_FIELD
+    pod_aggregation_batches = iterate_partitioned_aggregated_data("logs", pod_query_body, PARTITION_FIELD, client.partitions(), concurrency=2)
+    return asyncio.run(get_pod_breakdown(pod_aggregation_batches))
+
+
+def sorted_pods(pod_breakdown):
+    return sorted(pod_breakdown["Pods"], key=lambda pod: (pod["Namespace"], pod["Name"]))
+
+
+def test_values_beyond_the_largest_partitions_are_still_fetched(monkeypatch):
+    logs = make_logs()
+    complete_client = FakeElasticsearch(logs, max_partitions=100)
+    monkeypatch.setattr(endpoint_functions, "es_instance", complete_client)
+    expected_pods = sorted_pods(get_partitioned_pod_breakdown(complete_client))
+    assert len(expected_pods) == 21
+
+    truncated_client = FakeElasticsearch(logs, max_partitions=2)
+    monkeypatch.setattr(endpoint_functions, "es_instance", truncated_client)
+    assert sorted_pods(get_partitioned_pod_breakdown(truncated_client)) == expected_pods
+
+
+def test_an_error_of_a_partition_is_raised(monkeypatch):
+    client = FakeElasticsearch(make_logs(), max_partitions=100, failing_namespaces={"ns-3"})
+    monkeypatch.setattr(endpoint_functions, "es_instance", client)
+    with pytest.raises(TransportError):
+        get_partitioned_pod_breakdown(client)
@@ -0,0 +1,110 @@
+# Third Party
+import numpy as np
+import pytest
+from PeakDetecion import PeakDetection
+
+
+class ReferencePeakDetection:
+    # The list based implementation PeakDetection replaced, which recomputes the mean and standard deviation of the window for every value.
+    def __init__(self, window, threshold, influence):
+        self.y = []
+        self.window = window
+        self.threshold = threshold
+        self.influence = influence
+
+    def detect_peaks(self, new_value):
+        self.y.append(new_value)
+        i = len(self.y) - 1
+        if i < self.window:
+            return 0
+        elif i == self.window:
+            self.signals = [0] * len(self.y)
+            self.filteredY = np.array(self.y).tolist()
+            self.avgFilter = [0] * len(self.y)
+            self.stdFilter = [0] * len(self.y)
+            self.avgFilter[self.window] = np.mean(self.y[0 : self.window]).tolist()
+            self.stdFilter[self.window] = np.std(self.y[0 : self.window]).tolist()
+            return 0
+
+        if self.y[i] > self.avgFilter[i - 1] and ((self.y[i] - self.avgFilter[i - 1]) > (self.threshold * self.stdFilter[i - 1])):
+            self.signals.append(1)
+            self.filteredY.append(self.influence * self.y[i] + (1 - self.influence) * self.filteredY[i - 1])
+        else:
+            self.signals.append(0)
+            self.filteredY.append(self.y[i])
+        self.avgFilter.append(np.mean(self.filteredY[(i - self.window) : i]))
+        self.stdFilter.append(np.std(self.filteredY[(i - self.window) : i]))
+        return self.signals[i]
+
+
+def random_series(seed, length=2000):
+    # Minute counts of anomalies with a varying base rate, bursts, plateaus and gaps, like those /peaks runs over.
+    generator = np.random.default_rng(seed)
+    base_rate = generator.uniform(0, 50) * (1 + np.sin(np.arange(length) / generator.uniform(20, 500)))
+    values = generator.poisson(base_rate)
+    for _ in range(generator.integers(0, 20)):
+        burst_start = generator.integers(0, length)
+        values[burst_start : burst_start + generator.integers(1, 30)] += generator.integers(10, 1000)
+    for _ in range(generator.integers(0, 5)):
+        plateau_start = generator.integers(0, length)
+        values[plateau_start : plateau_start + generator.integers(30, 200)] = generator.integers(0, 3)
+    return values
+
+
+def reference_signals(window, threshold, influence, values):
+    detector = ReferencePeakDetection(window, threshold, influence)
+    return np.array([detector.detect_peaks(value) for value in values])
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("window,threshold,influence", [(60, 3.0, 0.5), (10, 2.0, 0.0), (30, 5.0, 1.0)])
+def test_signals_match_the_reference_implementation(seed, window, threshold, influence):
+    values = random_series(seed)
+    detector = PeakDetection(window, threshold, influence)
+    signals = np.array([detector.detect_peaks(value) for value in values])
+    np.testing.assert_array_equal(signals, reference_signals(window, threshold, influence, values))
+
+
+@pytest.mark.parametrize("values", [[], [5] * 100, [0] * 80 + [1] + [0] * 80, list(range(200)), [7] * 61 + [100] + [7] * 50])
+def test_edge_cases_match_the_reference_implementation(values):
+    detector = PeakDetection(60, 3.0, 0.5)
+    signals = np.array([detector.detect_peaks(value) for value in values], dtype=int)
+    np.testing.assert_array_equal(signals, reference_signals(60, 3.0, 0.5, values).astype(int))
+
+
+def test_memory_does_not_grow_with_the_number_of_values():
+    detector = PeakDetection(60, 3.0, 0.5)
+    for value in random_series(0, length=10000):
+        detector.detect_peaks(value)
+    assert detector.filtered_window.shape == (60,)
+    assert detector.length == 10000
+
+
+def test_detection_resumes_from_a_saved_state():
+    values = random_series(1)
+    detector = PeakDetection(60, 3.0, 0.5)
+    first_signals = [detector.detect_peaks(value) for value in values[:1000]]
+    resumed_detector = PeakDetection.from_state(detector.get_state())
+    resumed_signals = [resumed_detector.detect_peaks(value) for value in values[1000:]]
+    np.testing.assert_array_equal(first_signals + resumed_signals, reference_signals(60, 3.0, 0.5, values))
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("window,threshold,influence", [(60, 3.0, 0.5), (10, 2.0, 0.0), (30, 5.0, 1.0)])
+def test_batch_signals_match_detecting_one_value_at_a_time(seed, window, threshold, influence):
+    values = random_series(seed)
+    detector = PeakDetection(window, threshold, influence)
+    signals = np.array([detector.detect_peaks(value) for value in values])
+    np.testing.assert_array_equal(PeakDetection(window, threshold, influence).detect_peaks_batch(values), signals)
+
+
+@pytest.mark.parametrize("split", [0, 1, 60, 61, 500, 1999])
+def test_batch_detection_resumes_from_a_saved_state(split):
+    values = random_series(2)
+    detector = PeakDetection(60, 3.0, 0.5)
+    first_signals = detector.detect_peaks_batch(values[:split])
+    resumed_detector = PeakDetection.from_state(detector.get_state())
+    resumed_signals = resumed_detector.detect_peaks_batch(values[split:])
+    np.testing.assert_array_equal(np.concatenate((first_signals, resumed_signals)), reference_signals(60, 3.0, 0.5, values))
+    # Per value detection continues from the state the batch left behind.
+    assert resumed_detector.detect_peaks(10000) == reference_signals(60, 3.0, 0.5, np.append(values, 10000))[-1]
@@ -0,0 +1,122 @@
+# Standard Library
+import asyncio
+
+# Third Party
+import endpoint_functions
+import pytest
+from endpoint_functions import get_overall_breakdown, normalize_interval
+from request_coalescer import RequestCoalescer
+
+
+class SlowFunction:
+    # Coroutine function which records its calls and returns their arguments once released, or raises error if it is set.
+    def __init__(self, error=None):
+        self.calls = []
+        self.released = None
+        self.error = error
+
+    async def __call__(self, *args):
+        self.calls.append(args)
+        await self.released.wait()
+        if self.error:
+            raise self.error
+        return args
+
+
+def coalesced(coalescer, slow_function, normalize_arguments=None):
+    @coalescer.coalesce(normalize_arguments)
+    async def fetch(*args):
+        return await slow_function(*args)
+
+    return fetch
+
+
+async def released_after_start(slow_function, *calls):
+    # Start the calls, release slow_function once they are all waiting and return their results or exceptions.
+    slow_function.released = asyncio.Event()
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    await asyncio.sleep(0)
+    slow_function.released.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_identical_calls_are_executed_once():
+    coalescer, slow_function = RequestCoalescer(), SlowFunction()
+    fetch = coalesced(coalescer, slow_function)
+    results = asyncio.run(released_after_start(slow_function, *(fetch(1, 2) for _ in range(5))))
+    assert results == [(1, 2)] * 5
+    assert slow_function.calls == [(1, 2)]
+    assert coalescer.stats() == {"fetch": {"executed": 1, "coalesced": 4}}
+    assert not coalescer.in_flight
+
+
+def test_calls_with_different_arguments_are_executed_separately():
+    coalescer, slow_function = RequestCoalescer(), SlowFunction()
+    fetch = coalesced(coalescer, slow_function)
+    results = asyncio.run(released_after_start(slow_function, fetch(1, 2), fetch(1, 3), fetch(1, 2)))
+    assert results == [(1, 2), (1, 3), (1, 2)]
+    assert sorted(slow_function.calls) == [(1, 2), (1, 3)]
+    assert coalescer.stats() == {"fetch": {"executed": 2, "coalesced": 1}}
+
+
+def test_calls_are_coalesced_with_their_normalized_arguments():
+    coalescer, slow_function = RequestCoalescer(), SlowFunction()
+    fetch = coalesced(coalescer, slow_function, lambda number: (abs(number),))
+    results = asyncio.run(released_after_start(slow_function, fetch(-4), fetch(4)))
+    assert results == [(4,), (4,)]
+    assert slow_function.calls == [(4,)]
+
+
+def test_a_cancelled_caller_does_not_cancel_the_shared_call():
+    coalescer, slow_function = RequestCoalescer(), SlowFunction()
+    fetch = coalesced(coalescer, slow_function)
+
+    async def cancel_one_caller():
+        slow_function.released = asyncio.Event()
+        cancelled_task, waiting_task = asyncio.ensure_future(fetch(1)), asyncio.ensure_future(fetch(1))
+        await asyncio.sleep(0)
+        cancelled_task.cancel()
+        await asyncio.sleep(0)
+        slow_function.released.set()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled_task
+        return await waiting_task
+
+    assert asyncio.run(cancel_one_caller()) == (1,)
+    assert slow_function.calls == [(1,)]
+
+
+def test_an_error_reaches_every_caller_and_the_call_can_be_made_again():
+    coalescer, slow_function = RequestCoalescer(), SlowFunction(error=ValueError("unavailable"))
+    fetch = coalesced(coalescer, slow_function)
+    results = asyncio.run(released_after_start(slow_function, fetch(1), fetch(1), fetch(1)))
+    assert all(isinstance(result, ValueError) for result in results)
+    assert not coalescer.in_flight
+    slow_function.error = None
+    assert asyncio.run(released_after_start(slow_function, fetch(1))) == [(1,)]
+    assert coalescer.stats() == {"fetch": {"executed": 2, "coalesced": 2}}
+
+
+@pytest.mark.parametrize("interval,normalized_interval", [("60m", "1h"), ("1h", "1h"), ("90s", "90s"), ("1440m", "1d"), ("500ms", "500ms"), ("auto", "auto")])
+def test_intervals_are_normalized(interval, normalized_interval):
+    assert normalize_interval(interval) == normalized_interval
+
+
+def test_overall_breakdowns_of_equivalent_granularity_levels_are_the_same_call(monkeypatch):
+    searched_bodies = []
+
+    class FakeElasticsearch:
+        async def search(self, index, body, size=None, request_cache=None):
+            searched_bodies.append(body)
+            await asyncio.sleep(0)
+            return {"aggregations": {"granularity_results": {"buckets": []}}}
+
+    monkeypatch.setattr(endpoint_functions, "es_instance", FakeElasticsearch())
+    monkeypatch.setattr(endpoint_functions, "AGGREGATION_CACHE_ENABLED", False)
+
+    async def request_both():
+        return await asyncio.gather(get_overall_breakdown(0, 3600000 * 5, "60m"), get_overall_breakdown(0, 3600000 * 5, "1h"))
+
+    first_breakdown, second_breakdown = asyncio.run(request_both())
+    assert first_breakdown == second_breakdown == {"Insights": [], "granularity_level": "1h"}
+    assert len(searched_bodies) == 1
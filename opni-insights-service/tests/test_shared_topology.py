@@ -0,0 +1,90 @@
+# Standard Library
+import asyncio
+
+# Third Party
+import endpoint_functions
+import pytest
+from endpoint_functions import BackgroundFunction, get_topology_stats, get_workload_breakdown
+from workload_topology import TopologySnapshotReader, WorkloadTopology
+
+
+def topology_of(pods):
+    topology = WorkloadTopology()
+    for namespace_name, pod_name, kind, workload_name in pods:
+        topology.record_pod(namespace_name, pod_name, kind, workload_name, seen_at=100)
+    return topology
+
+
+def write_snapshot(path, pods):
+    WorkloadTopology.write_snapshot(path, topology_of(pods).snapshot_state())
+
+
+def test_the_reader_answers_from_the_snapshot_and_follows_its_replacement(tmp_path):
+    snapshot_path = str(tmp_path / "topology.db")
+    reader = TopologySnapshotReader(snapshot_path)
+    reader.refresh()
+    assert reader.get_workload("default", "web-1") is None
+    assert reader.stats() == {"pods": 0, "workloads": 0, "bytes": 0}
+
+    write_snapshot(snapshot_path, [("default", "web-1", "Deployment", "web"), ("default", "web-2", "Deployment", "web")])
+    reader.refresh()
+    assert reader.get_workload("default", "web-1") == ("Deployment", "web")
+    assert reader.get_workload_pods("default", "Deployment", "web") == {"web-1", "web-2"}
+
+    write_snapshot(snapshot_path, [("default", "web-3", "Deployment", "web"), ("kube-system", "web-1", "DaemonSet", "proxy")])
+    # The snapshot which was open is read until the reader is refreshed.
+    assert reader.get_workload("default", "web-1") == ("Deployment", "web")
+    reader.refresh()
+    assert reader.get_workload("default", "web-1") is None
+    assert reader.get_workload_pods("default", "Deployment", "web") == {"web-3"}
+    assert reader.stats()["pods"] == 2
+    with pytest.raises(KeyError):
+        reader.get_workload_pods("default", "ReplicaSet", "web")
+    reader.close()
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 500])
+def test_workloads_of_many_pods_are_looked_up_in_batches(tmp_path, batch_size):
+    pods = [("default", "web-1", "Deployment", "web"), ("default", "web-2", "Deployment", "web"), ("kube-system", "web-1", "DaemonSet", "proxy")]
+    snapshot_path = str(tmp_path / "topology.db")
+    write_snapshot(snapshot_path, pods)
+    reader = TopologySnapshotReader(snapshot_path)
+    reader.refresh()
+    pod_keys = [("default", "web-1"), ("kube-system", "web-1"), ("default", "web-3"), ("other", "web-2")]
+    expected_workloads = {("default", "web-1"): ("Deployment", "web"), ("kube-system", "web-1"): ("DaemonSet", "proxy")}
+    assert reader.get_workloads(pod_keys, batch_size) == expected_workloads
+    assert topology_of(pods).get_workloads(pod_keys) == expected_workloads
+    reader.close()
+
+
+def test_one_worker_keeps_track_of_workloads_and_the_others_read_its_snapshot(tmp_path, monkeypatch):
+    snapshot_path = str(tmp_path / "topology.db")
+    write_snapshot(snapshot_path, [("default", "web-1", "Deployment", "web")])
+    monkeypatch.setattr(endpoint_functions, "WORKLOAD_SNAPSHOT_PATH", snapshot_path)
+    monkeypatch.setattr(endpoint_functions, "WORKLOAD_SNAPSHOT_REFRESH_SECONDS", 0.01)
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology_of([("default", "api-1", "Deployment", "api")]))
+    monkeypatch.setattr(endpoint_functions, "topology_view", endpoint_functions.topology_view)
+    monitoring_workers = []
+    first_worker, second_worker = BackgroundFunction(), BackgroundFunction()
+    for worker in (first_worker, second_worker):
+        monkeypatch.setattr(worker, "start_monitoring", lambda worker=worker: monitoring_workers.append(worker))
+    pod_breakdown = {"Pods": [{"Name": "web-1", "Namespace": "default", "Insights": {"Normal": 1, "Suspicious": 0, "Anomaly": 2}}]}
+
+    async def share():
+        await first_worker.share_workloads()
+        assert monitoring_workers == [first_worker]
+        second_task = asyncio.ensure_future(second_worker.share_workloads())
+        await asyncio.sleep(0.05)
+        # The second worker waits for the lock and answers requests from the snapshot of the first one.
+        assert monitoring_workers == [first_worker]
+        assert isinstance(endpoint_functions.topology_view, TopologySnapshotReader)
+        assert get_topology_stats()["pods"] == 1
+        assert get_workload_breakdown(pod_breakdown)["Deployment"] == [{"Name": "web", "Namespace": "default", "Insights": {"Normal": 1, "Suspicious": 0, "Anomaly": 2}}]
+        # Once the first worker exits, its lock is released and the second worker takes over.
+        first_worker.lock_file.close()
+        await asyncio.wait_for(second_task, 1)
+        assert monitoring_workers == [first_worker, second_worker]
+        assert endpoint_functions.topology_view is endpoint_functions.workload_topology
+
+    asyncio.run(share())
+    second_worker.lock_file.close()
@@ -0,0 +1,87 @@
+# Standard Library
+import asyncio
+import time
+from types import SimpleNamespace
+
+# Third Party
+import endpoint_functions
+import pytest
+from endpoint_functions import BackgroundFunction, get_topology_stats, get_workload_breakdown
+from workload_topology import WorkloadTopology
+
+API_LATENCY_SECONDS = 0.1
+POD_COUNT = 2000
+
+
+def resource(name, owner_kind, owner_name, namespace="default"):
+    return SimpleNamespace(metadata=SimpleNamespace(name=name, namespace=namespace, owner_references=[SimpleNamespace(kind=owner_kind, name=owner_name)]))
+
+
+def slow_list_function(items):
+    # A Kubernetes list call which blocks its thread for API_LATENCY_SECONDS like a slow API server.
+    def list_function(watch=False):
+        time.sleep(API_LATENCY_SECONDS)
+        return SimpleNamespace(items=items)
+
+    return list_function
+
+
+@pytest.fixture
+def slow_kubernetes_api(monkeypatch):
+    replica_sets = [resource(f"web-{index}-5d4f", "Deployment", f"web-{index}") for index in range(POD_COUNT // 10)]
+    deployments = [SimpleNamespace(metadata=SimpleNamespace(name=f"web-{index}", namespace="default", owner_references=None)) for index in range(POD_COUNT // 10)]
+    pods = [resource(f"web-{index // 10}-5d4f-{index}", "ReplicaSet", f"web-{index // 10}-5d4f") for index in range(POD_COUNT)]
+    for kind in endpoint_functions.owner_list_functions:
+        monkeypatch.setitem(endpoint_functions.owner_list_functions, kind, slow_list_function({"ReplicaSet": replica_sets, "Deployment": deployments}.get(kind, [])))
+    monkeypatch.setattr(endpoint_functions, "core_api_instance", SimpleNamespace(list_pod_for_all_namespaces=slow_list_function(pods)))
+    topology = WorkloadTopology()
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology)
+    monkeypatch.setattr(endpoint_functions, "topology_view", topology)
+    return topology
+
+
+def pod_breakdown():
+    pods = [{"Name": f"web-{index // 10}-5d4f-{index}", "Namespace": "default", "Insights": {"Normal": 1, "Suspicious": 0, "Anomaly": 1}} for index in range(0, POD_COUNT, 20)]
+    return {"Pods": pods}
+
+
+async def measure_request_latencies(refresh):
+    # Answer workload requests on the event loop while refresh runs and return the slowest of them.
+    latencies = []
+    refresh_task = asyncio.create_task(refresh())
+    while not latencies or not refresh_task.done():
+        start_time = time.perf_counter()
+        await asyncio.sleep(0.005)
+        get_workload_breakdown(pod_breakdown())
+        get_topology_stats()
+        latencies.append(time.perf_counter() - start_time)
+    refresh_task.result()
+    return max(latencies)
+
+
+def test_requests_are_answered_while_the_topology_is_refreshed(slow_kubernetes_api):
+    background_function = BackgroundFunction()
+
+    async def refresh():
+        monitor_task = asyncio.create_task(background_function.monitor_workloads())
+        while not slow_kubernetes_api.workload_pods:
+            await asyncio.sleep(0.01)
+        monitor_task.cancel()
+
+    refresh_start_time = time.perf_counter()
+    slowest_request = asyncio.run(measure_request_latencies(refresh))
+    # Every list call of the refresh blocked a thread of kubernetes_executor, but the event loop kept answering requests.
+    assert time.perf_counter() - refresh_start_time >= (len(endpoint_functions.owner_list_functions) + 1) * API_LATENCY_SECONDS
+    assert slowest_request < API_LATENCY_SECONDS
+    assert slow_kubernetes_api.get_workload("default", "web-3-5d4f-30") == ("ReplicaSet", "web-3")
+    assert len(slow_kubernetes_api.get_workload_pods("default", "ReplicaSet", "web-3")) == 10
+
+
+def test_a_refresh_on_the_event_loop_would_delay_requests(slow_kubernetes_api):
+    # The latency measured above is low because the refresh runs within kubernetes_executor, not because the fake API is fast.
+    background_function = BackgroundFunction()
+
+    async def refresh():
+        background_function.swap_topology(background_function.refresh_topology())
+
+    assert asyncio.run(measure_request_latencies(refresh)) >= len(endpoint_functions.owner_list_functions) * API_LATENCY_SECONDS
@@ -0,0 +1,176 @@
+# Standard Library
+import asyncio
+import functools
+import threading
+from types import SimpleNamespace
+
+# Third Party
+import endpoint_functions
+from endpoint_functions import BackgroundFunction
+from kubernetes.client.rest import ApiException
+from workload_informer import ResourceInformer
+from workload_topology import WorkloadTopology
+
+
+def resource(name, resource_version, owner_kind=None, owner_name=None, namespace="default"):
+    owner_references = [SimpleNamespace(kind=owner_kind, name=owner_name)] if owner_kind else None
+    return SimpleNamespace(metadata=SimpleNamespace(name=name, namespace=namespace, owner_references=owner_references, resource_version=resource_version))
+
+
+def list_function(resource_version, items=()):
+    def list_resources(**kwargs):
+        return SimpleNamespace(metadata=SimpleNamespace(resource_version=resource_version), items=list(items))
+
+    return list_resources
+
+
+def event(event_type, resource_object):
+    return {"type": event_type, "object": resource_object, "raw_object": {}}
+
+
+GONE = {"type": "ERROR", "object": None, "raw_object": {"code": 410, "reason": "Expired"}}
+
+
+class FakeWatch:
+    # Stand-in for kubernetes.watch.Watch which replays the scripted streams one after the other, recording the resourceVersion each watch resumed from.
+    def __init__(self, streams, resource_versions):
+        self.streams = streams
+        self.resource_versions = resource_versions
+
+    def stream(self, list_function, resource_version=None, timeout_seconds=None):
+        self.resource_versions.append(resource_version)
+        stream = self.streams.pop(0)
+        if isinstance(stream, Exception):
+            raise stream
+        yield from stream
+
+    def stop(self):
+        pass
+
+
+def run_informer(list_functions, streams, resync_period=600):
+    # Run an informer until it has listed once for every list function and return the syncs, the events and the resourceVersions watched from.
+    syncs, events, resource_versions = [], [], []
+    informer = None
+
+    def on_sync(kind, items):
+        syncs.append([item.metadata.name for item in items])
+        if len(syncs) == len(list_functions):
+            informer.stop()
+
+    def on_event(kind, event_type, resource_object):
+        events.append((event_type, resource_object.metadata.name))
+
+    def list_resources(**kwargs):
+        return list_functions[len(syncs)](**kwargs)
+
+    informer = ResourceInformer("Pod", list_resources, on_sync, on_event, resync_period, watch_factory=lambda: FakeWatch(streams, resource_versions))
+    informer.run()
+    return syncs, events, resource_versions
+
+
+def test_events_are_watched_from_the_listed_resource_version_and_relisted_when_it_expired():
+    streams = [
+        [event("ADDED", resource("web-1", "11")), event("MODIFIED", resource("web-1", "12"))],
+        [event("DELETED", resource("web-1", "13")), event("ADDED", resource("web-5d4f", "14")), GONE],
+    ]
+    syncs, events, resource_versions = run_informer([list_function("10", [resource("web-0", "9")]), list_function("20")], streams)
+    assert syncs == [["web-0"], []]
+    assert events == [("ADDED", "web-1"), ("MODIFIED", "web-1"), ("DELETED", "web-1"), ("ADDED", "web-5d4f")]
+    # The second watch resumed after the last event of the first, and the expired resourceVersion led to a new list.
+    assert resource_versions == ["10", "12"]
+    assert not streams
+
+
+def test_a_gone_api_exception_leads_to_a_new_list():
+    streams = [ApiException(status=410, reason="Gone")]
+    syncs, events, resource_versions = run_informer([list_function("10"), list_function("20")], streams)
+    assert (len(syncs), events, resource_versions) == (2, [], ["10"])
+
+
+def test_other_error_events_are_skipped():
+    streams = [[{"type": "ERROR", "object": None, "raw_object": {"code": 500}}, event("ADDED", resource("web-1", "11")), GONE]]
+    syncs, events, resource_versions = run_informer([list_function("10"), list_function("20")], streams)
+    assert events == [("ADDED", "web-1")]
+
+
+def test_resources_are_relisted_once_the_resync_period_has_passed():
+    syncs, events, resource_versions = run_informer([list_function("10"), list_function("20")], [], resync_period=0)
+    assert (len(syncs), resource_versions) == (2, [])
+
+
+class ScriptedWatch:
+    # Watch of watch_workloads which blocks until released, then replays the events scripted for its kind and blocks until finished.
+    def __init__(self, kind_events, released, finished):
+        self.kind_events = kind_events
+        self.released = released
+        self.finished = finished
+
+    def stream(self, list_function, resource_version=None, timeout_seconds=None):
+        self.released.wait(5)
+        yield from self.kind_events.pop(list_function, [])
+        self.finished.wait(5)
+
+    def stop(self):
+        pass
+
+
+def test_watched_pods_move_to_their_deployment_once_their_replica_set_is_known(monkeypatch):
+    topology = WorkloadTopology()
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology)
+    list_functions = {kind: list_function("1") for kind in endpoint_functions.owner_list_functions}
+    list_functions["Deployment"] = list_function("1", [resource("web", "1")])
+    list_pods = list_function("1", [resource("web-5d4f-x2", "1", "ReplicaSet", "web-5d4f"), resource("web-5d4f-y7", "1", "ReplicaSet", "web-5d4f")])
+    for kind, kind_list_function in list_functions.items():
+        monkeypatch.setitem(endpoint_functions.owner_list_functions, kind, kind_list_function)
+    monkeypatch.setattr(endpoint_functions, "core_api_instance", SimpleNamespace(list_pod_for_all_namespaces=list_pods))
+    kind_events = {
+        list_functions["ReplicaSet"]: [event("ADDED", resource("web-5d4f", "2", "Deployment", "web")), event("MODIFIED", resource("web-5d4f", "3", "Deployment", "web"))],
+        list_pods: [event("MODIFIED", resource("web-5d4f-x2", "2", "ReplicaSet", "web-5d4f")), event("DELETED", resource("web-5d4f-y7", "3", "ReplicaSet", "web-5d4f"))],
+    }
+    released, finished = threading.Event(), threading.Event()
+    monkeypatch.setattr(endpoint_functions, "ResourceInformer", functools.partial(ResourceInformer, watch_factory=lambda: ScriptedWatch(kind_events, released, finished)))
+    background_function = BackgroundFunction()
+
+    async def watch():
+        await background_function.watch_workloads()
+        while len(topology.pod_workloads) < 2:
+            await asyncio.sleep(0.01)
+        # Both pods were listed before their ReplicaSet was known.
+        assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web-5d4f")
+        released.set()
+        for _ in range(500):
+            if not kind_events and topology.get_workload("default", "web-5d4f-y7") == ("ReplicaSet", "web"):
+                break
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(watch())
+    finally:
+        for informer in background_function.informers:
+            informer.stop()
+        released.set()
+        finished.set()
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+    # Deleted pods are kept within the historic data.
+    assert topology.get_workload_pods("default", "ReplicaSet", "web") == {"web-5d4f-x2", "web-5d4f-y7"}
+    assert ("default", "ReplicaSet", "web-5d4f") not in topology.workload_pods
+
+
+def test_owner_events_handled_while_pods_are_relisted_are_not_lost(monkeypatch):
+    topology = WorkloadTopology()
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology)
+    background_function = BackgroundFunction()
+    background_function.owner_index = {"ReplicaSet": {}, "Deployment": {("default", "web"): resource("web", "1").metadata}}
+    pod = resource("web-5d4f-x2", "1", "ReplicaSet", "web-5d4f")
+
+    async def relist():
+        copied_topology, owner_index = await background_function.copy_watched_state()
+        # The ReplicaSet event arrives while the topology is being built from the copies within the informer thread.
+        background_function.handle_event("ReplicaSet", "ADDED", resource("web-5d4f", "2", "Deployment", "web"))
+        assert ("default", "web-5d4f") not in owner_index["ReplicaSet"]
+        background_function.swap_watched_topology(background_function.build_topology([pod], owner_index, copied_topology))
+
+    asyncio.run(relist())
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+
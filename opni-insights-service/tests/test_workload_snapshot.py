@@ -0,0 +1,64 @@
+# Standard Library
+import sys
+
+# Third Party
+import endpoint_functions
+from endpoint_functions import BackgroundFunction
+from workload_topology import WorkloadTopology
+
+
+def recorded_topology():
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-5d4f-x2", "ReplicaSet", "web", seen_at=100)
+    topology.record_pod("default", "web-5d4f-y7", "ReplicaSet", "web", seen_at=200)
+    topology.record_pod("kube-system", "coredns-1", "Deployment", "coredns", seen_at=300)
+    topology.record_pod("default", "backup-27-a", "Job", "backup-27", seen_at=400)
+    # A pod whose owners could not be resolved this time keeps the workload it was recorded with.
+    topology.record_pod("default", "web-5d4f-x2", "ReplicaSet", "web-5d4f", seen_at=500, keep_workload=True)
+    return topology
+
+
+def test_a_snapshot_loads_the_topology_it_was_written_from(tmp_path):
+    topology = recorded_topology()
+    snapshot_path = str(tmp_path / "topology.db")
+    WorkloadTopology.write_snapshot(snapshot_path, topology.snapshot_state())
+    loaded_topology = WorkloadTopology()
+    assert loaded_topology.load_snapshot(snapshot_path) == 4
+    assert loaded_topology.pod_workloads == topology.pod_workloads
+    assert loaded_topology.workload_pods == topology.workload_pods
+    assert loaded_topology.pod_last_seen == topology.pod_last_seen
+    assert loaded_topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+    assert loaded_topology.pod_last_seen[("default", "web-5d4f-x2")] == 500
+
+
+def test_loaded_names_are_interned_and_workload_keys_shared(tmp_path):
+    snapshot_path = str(tmp_path / "topology.db")
+    WorkloadTopology.write_snapshot(snapshot_path, recorded_topology().snapshot_state())
+    loaded_topology = WorkloadTopology()
+    loaded_topology.load_snapshot(snapshot_path)
+    assert loaded_topology.pod_workloads[("default", "web-5d4f-x2")] is loaded_topology.pod_workloads[("default", "web-5d4f-y7")]
+    for pod_key, workload_key in loaded_topology.pod_workloads.items():
+        assert all(sys.intern(name) is name for name in pod_key + workload_key)
+
+
+def test_a_snapshot_replaces_the_previous_one(tmp_path):
+    snapshot_path = str(tmp_path / "topology.db")
+    WorkloadTopology.write_snapshot(snapshot_path, recorded_topology().snapshot_state())
+    topology = WorkloadTopology()
+    topology.record_pod("default", "api-1", "Deployment", "api", seen_at=600)
+    WorkloadTopology.write_snapshot(snapshot_path, topology.snapshot_state())
+    loaded_topology = WorkloadTopology()
+    assert loaded_topology.load_snapshot(snapshot_path) == 1
+    assert loaded_topology.workload_pods == {("default", "Deployment", "api"): {"api-1"}}
+    assert not (tmp_path / "topology.db.tmp").exists()
+
+
+def test_the_service_saves_and_loads_its_topology(tmp_path, monkeypatch):
+    snapshot_path = str(tmp_path / "topology.db")
+    monkeypatch.setattr(endpoint_functions, "WORKLOAD_SNAPSHOT_PATH", snapshot_path)
+    monkeypatch.setattr(endpoint_functions, "workload_topology", recorded_topology())
+    BackgroundFunction().save_topology_snapshot()
+    restarted_topology = WorkloadTopology()
+    monkeypatch.setattr(endpoint_functions, "workload_topology", restarted_topology)
+    BackgroundFunction().load_topology_snapshot()
+    assert restarted_topology.pod_workloads == recorded_topology().pod_workloads
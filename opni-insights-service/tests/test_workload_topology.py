@@ -0,0 +1,126 @@
+# Standard Library
+import logging
+import sys
+import uuid
+from types import SimpleNamespace
+
+# Third Party
+import endpoint_functions
+from endpoint_functions import BackgroundFunction
+from workload_topology import WorkloadTopology
+
+
+def metadata(name, owner_kind=None, owner_name=None, namespace="default"):
+    owner_references = [SimpleNamespace(kind=owner_kind, name=owner_name)] if owner_kind else None
+    return SimpleNamespace(name=name, namespace=namespace, owner_references=owner_references)
+
+
+def test_a_pod_moves_to_its_resolved_workload():
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-1", "ReplicaSet", "web-5d4f")
+    topology.record_pod("default", "web-2", "ReplicaSet", "web-5d4f")
+    topology.record_pod("default", "web-1", "ReplicaSet", "web")
+    assert topology.get_workload("default", "web-1") == ("ReplicaSet", "web")
+    assert topology.get_workload_pods("default", "ReplicaSet", "web-5d4f") == {"web-2"}
+    topology.record_pod("default", "web-2", "ReplicaSet", "web")
+    assert topology.get_workload_pods("default", "ReplicaSet", "web") == {"web-1", "web-2"}
+    assert ("default", "ReplicaSet", "web-5d4f") not in topology.workload_pods
+
+
+def test_a_pod_keeps_its_workload_when_asked_to():
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-1", "ReplicaSet", "web")
+    topology.record_pod("default", "web-1", "ReplicaSet", "web-5d4f", seen_at=5, keep_workload=True)
+    assert topology.get_workload("default", "web-1") == ("ReplicaSet", "web")
+    assert topology.pod_last_seen[("default", "web-1")] == 5
+
+
+def test_a_pod_seen_before_its_replica_set_is_resolved_once_the_replica_set_is_known():
+    background_function = BackgroundFunction()
+    topology = WorkloadTopology()
+    pod_metadata = metadata("web-5d4f-x2", "ReplicaSet", "web-5d4f")
+    owner_index = {"ReplicaSet": {}, "Deployment": {("default", "web"): metadata("web")}}
+    background_function.record_pod(pod_metadata, owner_index, topology)
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web-5d4f")
+
+    owner_index["ReplicaSet"][("default", "web-5d4f")] = metadata("web-5d4f", "Deployment", "web")
+    background_function.record_pod(pod_metadata, owner_index, topology)
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+    assert topology.get_workload_pods("default", "ReplicaSet", "web") == {"web-5d4f-x2"}
+
+    # An event which arrives while the ReplicaSet is missing again does not undo the resolution.
+    del owner_index["ReplicaSet"][("default", "web-5d4f")]
+    background_function.record_pod(pod_metadata, owner_index, topology)
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+
+
+def test_owners_of_kinds_which_are_not_tracked_are_resolved():
+    background_function = BackgroundFunction()
+    assert background_function.get_workload_name(metadata("backup-1", "Job", "backup-27"), {"Job": {("default", "backup-27"): metadata("backup-27", "CronJob", "backup")}}) == ("backup", True)
+    assert background_function.get_workload_name(metadata("backup-1", "Job", "backup-27"), {"Job": {}}) == ("backup-27", False)
+
+
+def test_pods_are_resolved_when_the_event_of_their_replica_set_arrives(monkeypatch):
+    topology = WorkloadTopology()
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology)
+    background_function = BackgroundFunction()
+    background_function.owner_index = {"ReplicaSet": {}, "Deployment": {("default", "web"): metadata("web")}}
+    background_function.handle_event("Pod", "ADDED", SimpleNamespace(metadata=metadata("web-5d4f-x2", "ReplicaSet", "web-5d4f")))
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web-5d4f")
+    background_function.handle_event("ReplicaSet", "ADDED", SimpleNamespace(metadata=metadata("web-5d4f", "Deployment", "web")))
+    assert topology.get_workload("default", "web-5d4f-x2") == ("ReplicaSet", "web")
+
+
+def test_pods_which_have_not_been_seen_since_the_cutoff_are_evicted():
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-1", "ReplicaSet", "web", seen_at=100)
+    topology.record_pod("default", "web-2", "ReplicaSet", "web", seen_at=300)
+    topology.record_pod("default", "backup-1", "Job", "backup", seen_at=100)
+    assert topology.evict(200) == 2
+    assert topology.pod_last_seen == {("default", "web-2"): 300}
+    assert topology.pod_workloads == {("default", "web-2"): ("default", "ReplicaSet", "web")}
+    # The workload left without pods is removed, the other one keeps its remaining pod.
+    assert topology.workload_pods == {("default", "ReplicaSet", "web"): {"web-2"}}
+    assert topology.stats()["pods"] == 1 and topology.stats()["workloads"] == 1
+    assert topology.evict(200) == 0
+
+
+def test_a_pod_kept_with_its_workload_is_evicted_by_when_it_was_last_seen():
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-1", "ReplicaSet", "web", seen_at=100)
+    topology.record_pod("default", "web-1", "ReplicaSet", "web-5d4f", seen_at=300, keep_workload=True)
+    assert topology.evict(200) == 0
+    assert topology.get_workload("default", "web-1") == ("ReplicaSet", "web")
+    assert ("default", "ReplicaSet", "web-5d4f") not in topology.workload_pods
+    assert topology.evict(400) == 1
+    assert not topology.workload_pods and not topology.pod_workloads
+
+
+def test_the_names_of_evicted_pods_are_released():
+    # Names which have not been interned before, so the only references to them are held by this test and the topology.
+    namespace_name, pod_name, workload_name = (f"{name}-{uuid.uuid4().hex}" for name in ("team", "api-1", "api"))
+    reference_counts = [sys.getrefcount(name) for name in (namespace_name, pod_name, workload_name)]
+    topology = WorkloadTopology()
+    topology.record_pod(namespace_name, pod_name, "Deployment", workload_name, seen_at=100)
+    assert sys.intern(pod_name) is pod_name
+    assert [sys.getrefcount(name) for name in (namespace_name, pod_name, workload_name)] > reference_counts
+    empty_bytes = WorkloadTopology().stats()["bytes"]
+    assert topology.stats()["bytes"] > empty_bytes
+    topology.evict(200)
+    assert [sys.getrefcount(name) for name in (namespace_name, pod_name, workload_name)] == reference_counts
+    assert topology.stats()["pods"] == topology.stats()["workloads"] == 0
+
+
+def test_rebuilding_the_topology_reports_the_evicted_pods(monkeypatch, caplog):
+    topology = WorkloadTopology()
+    topology.record_pod("default", "web-1", "ReplicaSet", "web", seen_at=100)
+    topology.record_pod("default", "web-2", "ReplicaSet", "web", seen_at=100)
+    monkeypatch.setattr(endpoint_functions, "workload_topology", topology)
+    monkeypatch.setattr(endpoint_functions, "WORKLOAD_RETENTION_DAYS", 1)
+    owner_index = {"ReplicaSet": {}, "Deployment": {}}
+    with caplog.at_level(logging.INFO):
+        rebuilt_topology = BackgroundFunction().build_topology([SimpleNamespace(metadata=metadata("web-3", "ReplicaSet", "web"))], owner_index)
+    assert "Evicted 2 pods" in caplog.text
+    assert rebuilt_topology.get_workload_pods("default", "ReplicaSet", "web") == {"web-3"}
+    # The topology requests are answered from is left alone until the rebuilt one is swapped in.
+    assert topology.stats()["pods"] == 2